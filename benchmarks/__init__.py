@@ -0,0 +1,3 @@
+"""
+Reproducible benchmarks on synthetic encounter corpora; run with python -m benchmarks.run.
+"""
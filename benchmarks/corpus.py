@@ -0,0 +1,214 @@
+"""
+Deterministic synthetic encounter corpora: transcripts built from the template_test narrative
+generators and the SOAP templates, and speech-like audio clips.
+"""
+import ast
+import json
+import random
+from pathlib import Path
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Approximate words per transcript for each corpus size
+SIZES = {"short": 150, "medium": 600, "long": 2500}
+
+NAMES = ["Brenda Carr", "Carlos Sisneros", "Bryan Diaz", "Edis Sinsor", "Ivan Reitzenstein", "Maria Lopez"]
+DESCRIPTIONS = ["Dull", "Sharp", "Aching", "Throbbing", "Burning", "Stabbing", "Radiating"]
+FREQUENCIES = ["Occasional(25%)", "Intermittent(50%)", "Frequent(75%)", "Constant(100%)"]
+COMPARISONS = ["Same", "Better", "Worse"]
+MEDICATIONS = ["ibuprofen 400 mg twice daily", "acetaminophen 500 mg as needed", "lisinopril 10 mg daily",
+               "metformin 500 mg twice daily", "cyclobenzaprine 10 mg at night"]
+CLINICAL = [
+    "Blood pressure is {systolic}/{diastolic} and pulse is {pulse}.",
+    "Temperature is 98.{tenths} degrees and respiratory rate is {rate}.",
+    "The patient takes {medication}.",
+    "The patient denies fever, chills or recent weight change.",
+    "On examination there is tenderness with {keyword} noted on palpation.",
+    "The patient reports {keyword} that started {days} days ago.",
+    "We discussed {keyword} and the patient agrees with the plan.",
+    "Follow up in {weeks} weeks or sooner if symptoms worsen.",
+]
+
+def load_generator(path):
+    """
+    Load the narrative functions from a template_test script without running its Tk window.
+    
+    Args:
+        path (Path): Script defining generate_narrative(data, ...)
+        
+    Returns:
+        callable: The script's generate_narrative
+    """
+    tree = ast.parse(Path(path).read_text(encoding='utf-8'))
+    # Keep imports and function definitions; module-level code builds the GUI
+    body = [
+        node for node in tree.body
+        if isinstance(node, ast.FunctionDef)
+        or (isinstance(node, (ast.Import, ast.ImportFrom)) and "tkinter" not in ast.dump(node))
+    ]
+    namespace = {}
+    exec(compile(ast.Module(body=body, type_ignores=[]), str(path), "exec"), namespace)
+    return namespace["generate_narrative"]
+
+def load_templates(templates_dir=None):
+    """SOAP templates in a stable order."""
+    templates_dir = Path(templates_dir or ROOT / "data" / "templates")
+    templates = []
+    for path in sorted(templates_dir.glob("*.json")):
+        with open(path, 'r', encoding='utf-8') as f:
+            templates.append(json.load(f))
+    return templates
+
+class CorpusBuilder:
+    def __init__(self, seed=0, templates_dir=None):
+        self.seed = seed
+        self.templates = load_templates(templates_dir)
+        generators = ROOT / "template_test"
+        self.pain_narrative = load_generator(generators / "template.py")
+        self.intake_narrative = load_generator(generators / "np_template.py")
+        self.accident_narrative = load_generator(generators / "autoq_temp.py")
+        
+    def transcripts(self, sizes=None, per_size=5):
+        """
+        Build the transcript corpus.
+        
+        Args:
+            sizes (list, optional): Size names from SIZES; all sizes by default
+            per_size (int): Transcripts per size
+            
+        Returns:
+            list: Dicts with id, size, template_id, keywords and text
+        """
+        corpus = []
+        for size in sizes or SIZES:
+            for index in range(per_size):
+                # Each transcript has its own generator so subsets of the corpus are identical too
+                rng = random.Random(f"{self.seed}-{size}-{index}")
+                template = self.templates[index % len(self.templates)]
+                corpus.append(dict(self._transcript(rng, template, SIZES[size]), id=f"{size}-{index}", size=size))
+        return corpus
+        
+    def _transcript(self, rng, template, words):
+        keywords = template.get("keywords", [])
+        name = rng.choice(NAMES)
+        paragraphs = []
+        count = 0
+        while count < words:
+            kind = rng.random()
+            if kind < 0.35:
+                text = self.pain_narrative(self._pain_data(rng, keywords), name, rng.randrange(3))
+            elif kind < 0.5:
+                text = self.intake_narrative(self._intake_data(rng, name, keywords))
+            elif kind < 0.6:
+                text = self.accident_narrative(self._accident_data(rng))
+            else:
+                text = " ".join(self._clinical_sentence(rng, keywords) for _ in range(rng.randint(3, 6)))
+            paragraphs.append(text)
+            count += len(text.split())
+        return {"template_id": template.get("id"), "keywords": list(keywords), "text": "\n\n".join(paragraphs)}
+        
+    @staticmethod
+    def _pain_data(rng, keywords):
+        areas = rng.sample(keywords, min(len(keywords), rng.randint(1, 3))) if keywords else ["back"]
+        return {"pain_data": {
+            area: {
+                "scale": f"{rng.randint(1, 10)}/10",
+                "descriptiveTerms": rng.sample(DESCRIPTIONS, rng.randint(1, 3)),
+                "frequency": rng.choice(FREQUENCIES),
+                "comparison": rng.choice(COMPARISONS)
+            }
+            for area in areas
+        }}
+        
+    @staticmethod
+    def _intake_data(rng, name, keywords):
+        yes_no = lambda: rng.choice(["Yes", "No"])
+        return {
+            "Legal_Name": name,
+            "Date_of_Visit": f"{rng.randint(1, 12)}/{rng.randint(1, 28)}/2024",
+            "Date_of_Injury": f"{rng.randint(1, 12)}/{rng.randint(1, 28)}/2024",
+            "Previous_Symptoms": yes_no(),
+            "Areas_of_Pain": rng.sample(keywords, min(len(keywords), 2)) if keywords else ["Neck"],
+            "Pain_Rating": rng.randint(1, 10),
+            "Symptoms_Descriptions": {"headache": yes_no(), "neck pain": yes_no(), "numbness": yes_no()},
+            "Activities_that_Increase_Pain": ["sitting", "lifting", "walking"][:rng.randint(1, 3)],
+            "Activities_that_Relieve_Pain": ["rest", "ice"][:rng.randint(1, 2)],
+            "MRI_or_XRay": yes_no(),
+            "Primary_Physician": f"Dr. {rng.choice(NAMES).split()[1]}",
+            "Pregnancy_Status": "No",
+            "Medications": rng.sample(MEDICATIONS, 2),
+            "Allergies": rng.choice(["None", "penicillin", "sulfa drugs"]),
+            "Previous_Surgeries": rng.choice(["no", "knee", "appendix"]),
+            "Metal_Implants": yes_no(),
+            "Personal_History": rng.sample(["diabetes", "hypertension", "asthma"], rng.randint(0, 2))
+        }
+        
+    @staticmethod
+    def _accident_data(rng):
+        choice = rng.choice
+        return {
+            "Date": f"{rng.randint(1, 12)}-{rng.randint(1, 28)}-2024",
+            "Brief Description of Accident": choice(["rear-ended at a stop light", "side impact in an intersection"]),
+            "Describe any Secondary Collisions": choice(["No other.", "Pushed into the car ahead."]),
+            "Do you recall striking anything inside the vehicle": choice(["Yes", "No"]),
+            "Type of Vehicle you were in": {"Make": choice(["Ford", "Toyota"]), "Model": choice(["F150", "Camry"]),
+                                            "Estimated Speed": f"{rng.randint(0, 45)}"},
+            "Type of Vehicle the Other Driver Was In": {"Model": choice(["Unknown", "Civic"]),
+                                                         "Estimated Speed": f"{rng.randint(10, 60)}"},
+            "Describe Damage to Vehicle": choice(["Light", "Moderate", "Heavy"]),
+            "After the Accident Vehicle Drivable": choice(["Yes", "No"]),
+            "Were you Driver or Passenger": choice(["Driver", "Passenger"]),
+            "Did Police Arrive": choice(["Yes", "No"]),
+            "ER/Urgent Care/Hospitalizations Related to Crash": choice(["Yes", "No"]),
+            "Visibility": choice(["Good", "Average", "Poor"]),
+            "Time of Day": choice(["Daylight", "Dusk", "Night"]),
+            "Road Conditions": choice(["Dry", "Wet", "Icy"]),
+            "Looking Direction at Time of Impact": choice(["Straight ahead", "Left", "Right"]),
+            "Was Your Foot on the Brake": choice(["Yes", "No"]),
+            "Were You Braced for Impact": choice(["Yes", "No"]),
+            "Wearing Seatbelt": choice(["Yes", "No"]),
+            "Did Your Airbag Deploy": choice(["Yes", "No"]),
+            "Headrest Adjustment": choice(["Adjusted properly", "Too low"])
+        }
+        
+    @staticmethod
+    def _clinical_sentence(rng, keywords):
+        return rng.choice(CLINICAL).format(
+            systolic=rng.randint(100, 160), diastolic=rng.randint(60, 100), pulse=rng.randint(55, 110),
+            tenths=rng.randint(0, 9), rate=rng.randint(12, 22), medication=rng.choice(MEDICATIONS),
+            keyword=rng.choice(keywords) if keywords else "pain", days=rng.randint(1, 30), weeks=rng.randint(1, 6)
+        )
+
+def synthetic_audio(seconds, seed=0, sample_rate=16000):
+    """
+    Speech-like audio: voiced bursts of harmonics separated by pauses, for ASR timing.
+    
+    Returns:
+        numpy.ndarray: float32 samples in [-1, 1]
+    """
+    rng = np.random.default_rng(seed)
+    samples = np.zeros(int(seconds * sample_rate), dtype=np.float32)
+    position = 0
+    while position < len(samples):
+        burst = int(rng.uniform(0.2, 1.2) * sample_rate)
+        t = np.arange(min(burst, len(samples) - position)) / sample_rate
+        pitch = rng.uniform(100, 220)
+        voiced = sum(np.sin(2 * np.pi * pitch * harmonic * t) / harmonic for harmonic in range(1, 6))
+        envelope = np.hanning(len(t)) if len(t) > 1 else np.ones(len(t))
+        samples[position:position + len(t)] = 0.3 * voiced * envelope
+        position += len(t) + int(rng.uniform(0.1, 0.6) * sample_rate)
+    samples += rng.normal(0, 0.005, len(samples)).astype(np.float32)
+    return np.clip(samples, -1, 1)
+
+def write_audio_corpus(output_dir, durations=(10, 30), seed=0, sample_rate=16000):
+    """Write one WAV file per duration; returns the paths."""
+    import scipy.io.wavfile as wav
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for duration in durations:
+        path = output_dir / f"synthetic_{duration}s.wav"
+        wav.write(path, sample_rate, synthetic_audio(duration, seed, sample_rate))
+        paths.append(path)
+    return paths
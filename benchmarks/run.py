@@ -0,0 +1,284 @@
+"""
+Benchmark each pipeline stage and the end-to-end run on the synthetic corpus.
+
+    python -m benchmarks.run --output benchmarks/results/baseline.json
+    python -m benchmarks.run --baseline benchmarks/results/baseline.json
+    python -m benchmarks.run --input current.json --baseline baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from .corpus import ROOT, SIZES, CorpusBuilder, write_audio_corpus
+
+STAGES = ("clean_text", "rules", "ner", "embedding", "matching", "filling", "storage", "end_to_end", "transcribe")
+
+# Audio clip lengths in seconds for the transcription benchmark
+AUDIO_DURATIONS = (10, 30)
+
+def summarize(durations):
+    """Latency statistics in seconds for a list of call durations."""
+    ordered = sorted(durations)
+    total = sum(ordered)
+    return {
+        "calls": len(ordered),
+        "median": statistics.median(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+        "mean": total / len(ordered),
+        "min": ordered[0],
+        "docs_per_sec": len(ordered) / total if total > 0 else 0.0
+    }
+
+def compare(current, baseline, threshold=0.1):
+    """
+    Compare median latencies of two result files.
+    
+    Args:
+        current (dict): Results being checked
+        baseline (dict): Reference results
+        threshold (float): Relative slowdown that counts as a regression
+        
+    Returns:
+        list: Dicts with benchmark, baseline, current, change and status for every benchmark;
+            a benchmark with a baseline that failed, was skipped or did not run now is "failed"
+    """
+    rows = []
+    names = list(baseline["results"]) + [name for name in current["results"] if name not in baseline["results"]]
+    for name in names:
+        before = baseline["results"].get(name, {}).get("median")
+        after = current["results"].get(name, {}).get("median")
+        if before is None or after is None:
+            if after is not None:
+                status = "new"
+            else:
+                status = "failed" if before is not None else "missing"
+            rows.append({"benchmark": name, "baseline": before, "current": after, "change": None, "status": status})
+            continue
+        change = (after - before) / before if before > 0 else 0.0
+        if change > threshold:
+            status = "regression"
+        elif change < -threshold:
+            status = "improvement"
+        else:
+            status = "ok"
+        rows.append({"benchmark": name, "baseline": before, "current": after, "change": change, "status": status})
+    return rows
+
+class BenchmarkSuite:
+    def __init__(self, config=None, seed=0, per_size=5, repeat=3, sizes=None):
+        self.seed = seed
+        self.per_size = per_size
+        self.repeat = repeat
+        self.sizes = sizes or list(SIZES)
+        self.workdir = Path(tempfile.mkdtemp(prefix="chiron-bench-"))
+        self.config = dict(config or {})
+        # Outputs go to a scratch directory and caches are off, so every call does the full work
+        self.config.update({
+            'SOAP_OUTPUT_DIR': str(self.workdir / "soap_notes"),
+            'PIPELINE_OUTPUT_DIR': str(self.workdir / "pipeline"),
+            'TRANSCRIPTION_OUTPUT_DIR': str(self.workdir / "transcriptions"),
+            'DB_CONNECTION_STRING': str(self.workdir / "chiron.db"),
+            'VECTOR_DB_PATH': str(self.workdir / "vector_db"),
+            'EMBEDDING_CACHE_SIZE': 0,
+            'LLM_CACHE_PATH': ''
+        })
+        self.builder = CorpusBuilder(seed)
+        self.templates = {template.get("id"): template for template in self.builder.templates}
+        self.setup_seconds = {}
+        self._components = {}
+        
+    def _component(self, name, factory):
+        """Build a component once; a failure is remembered and reported as a skipped stage."""
+        if name not in self._components:
+            started = time.perf_counter()
+            try:
+                self._components[name] = factory()
+            except Exception as e:
+                self._components[name] = e
+            self.setup_seconds[name] = time.perf_counter() - started
+        component = self._components[name]
+        if isinstance(component, Exception):
+            raise RuntimeError(f"{name} unavailable: {type(component).__name__}: {component}")
+        return component
+        
+    def _processor(self):
+        from src.asr.processor import TextProcessor
+        return self._component("processor", TextProcessor)
+        
+    def _pipeline(self):
+        # Model-backed stages share one pipeline, so each model loads once
+        def build():
+            from src.nlp.pipeline import NLPPipeline
+            return NLPPipeline(self.config)
+        return self._component("pipeline", build)
+        
+    def _database(self):
+        def build():
+            from src.storage.database import Database
+            return Database(self.config)
+        return self._component("database", build)
+        
+    def _transcriber(self):
+        def build():
+            from src.asr.transcriber import WhisperTranscriber
+            transcriber = WhisperTranscriber(self.config)
+            if getattr(transcriber, "model", None) is None:
+                transcriber.load_model()
+            return transcriber
+        return self._component("transcriber", build)
+        
+    def _stage(self, stage):
+        """Return fn(entry) for a stage; raises when the stage cannot run here."""
+        from_text = lambda fn: (lambda entry: fn(entry["text"]))
+        if stage == "clean_text":
+            return from_text(self._processor().clean_text)
+        if stage == "transcribe":
+            return lambda entry: self._transcriber().transcribe(entry["path"])
+            
+        pipeline = self._pipeline()
+        from src.nlp.document import Document
+        if stage == "rules":
+            return lambda entry: pipeline.keyword_extractor._extract_with_rules(Document(entry["text"]))
+        if stage == "ner":
+            if pipeline.keyword_extractor.ner_pipeline is None:
+                raise RuntimeError("NER model unavailable")
+            return from_text(pipeline.keyword_extractor._extract_with_ner)
+        if stage == "embedding":
+            return from_text(pipeline.template_matcher._get_embedding)
+        if stage == "matching":
+            return lambda entry: pipeline.template_matcher.find_matching_template(entry["keywords"])
+        if stage == "filling":
+            return lambda entry: pipeline.template_filler._fill_with_rules(
+                self.templates[entry["template_id"]].get("template", {}), Document(entry["text"]), entry["keywords"]
+            )
+        if stage == "storage":
+            database = self._database()
+            def store(entry):
+                note = self.templates[entry["template_id"]].get("template", {})
+                pipeline.template_filler.save_soap_note(note, entry["id"], "20240101")
+                database.save_soap_note(1, json.dumps(note))
+            return store
+        if stage == "end_to_end":
+            return lambda entry: pipeline.run_stages(entry["text"])
+        raise ValueError(f"Unknown stage: {stage}")
+        
+    def _inputs(self, stage):
+        """Corpus entries grouped by size."""
+        if stage == "transcribe":
+            paths = write_audio_corpus(self.workdir / "audio", AUDIO_DURATIONS, self.seed)
+            return {f"{duration}s": [{"path": path}] for duration, path in zip(AUDIO_DURATIONS, paths)}
+        corpus = self.builder.transcripts(self.sizes, self.per_size)
+        return {size: [entry for entry in corpus if entry["size"] == size] for size in self.sizes}
+        
+    def run(self, stages=None):
+        """
+        Time each stage on every corpus size.
+        
+        Args:
+            stages (list, optional): Stage names from STAGES; all stages by default
+            
+        Returns:
+            dict: Run metadata and results keyed "<stage>/<size>"
+        """
+        results = {}
+        for stage in stages or STAGES:
+            try:
+                fn = self._stage(stage)
+                groups = self._inputs(stage)
+            except Exception as e:
+                results[stage] = {"skipped": str(e)}
+                print(f"{stage:<12} skipped: {e}")
+                continue
+                
+            for size, entries in groups.items():
+                name = f"{stage}/{size}"
+                try:
+                    # One untimed call loads lazily initialized state
+                    fn(entries[0])
+                    durations = []
+                    for _ in range(self.repeat):
+                        for entry in entries:
+                            started = time.perf_counter()
+                            fn(entry)
+                            durations.append(time.perf_counter() - started)
+                    results[name] = summarize(durations)
+                    print(f"{name:<22} median {results[name]['median'] * 1000:9.2f} ms  "
+                          f"p95 {results[name]['p95'] * 1000:9.2f} ms")
+                except Exception as e:
+                    results[name] = {"skipped": f"{type(e).__name__}: {e}"}
+                    print(f"{name:<22} failed: {e}")
+        return {"meta": self.metadata(), "results": results}
+        
+    def metadata(self):
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=10
+            ).stdout.strip() or None
+        except Exception:
+            commit = None
+        return {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": self.seed,
+            "per_size": self.per_size,
+            "repeat": self.repeat,
+            "setup_seconds": dict(self.setup_seconds)
+        }
+
+def print_comparison(rows, threshold):
+    print(f"\n{'benchmark':<24}{'baseline ms':>14}{'current ms':>14}{'change':>10}  status")
+    for row in rows:
+        before = f"{row['baseline'] * 1000:.2f}" if row["baseline"] is not None else "-"
+        after = f"{row['current'] * 1000:.2f}" if row["current"] is not None else "-"
+        change = f"{row['change'] * 100:+.1f}%" if row["change"] is not None else "-"
+        print(f"{row['benchmark']:<24}{before:>14}{after:>14}{change:>10}  {row['status']}")
+    regressions = sum(1 for row in rows if row["status"] == "regression")
+    failed = sum(1 for row in rows if row["status"] == "failed")
+    print(f"\n{regressions} regressions (threshold {threshold * 100:.0f}%), {failed} failed or skipped")
+    return regressions + failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chiron benchmark suite")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, help="Stages to run (default: all)")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), help="Transcript sizes (default: all)")
+    parser.add_argument("--per-size", type=int, default=5, help="Transcripts per size")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes over the corpus")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus seed")
+    parser.add_argument("--output", help="Where to write the results JSON")
+    parser.add_argument("--input", help="Compare an existing results file instead of running")
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative slowdown flagged as a regression")
+    args = parser.parse_args(argv)
+    
+    if args.input:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            current = json.load(f)
+    else:
+        from src.utils.config import load_config
+        suite = BenchmarkSuite(load_config(), args.seed, args.per_size, args.repeat, args.sizes)
+        current = suite.run(args.stages)
+        output = Path(args.output or ROOT / "benchmarks" / "results" / f"{datetime.now():%Y%m%d_%H%M%S}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+        print(f"\nResults written to {output}")
+        
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if print_comparison(compare(current, baseline, args.threshold), args.threshold):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
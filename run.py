@@ -16,6 +16,10 @@ from src.nlp.llm_generator import LLMGenerator
 from src.ui.review_ui import ReviewUI
 from src.utils.logger import setup_logger
 from src.utils.config import load_config
+from src.utils.memory import configure_memory
+from src.utils.metrics import MetricsExporter
+from src.utils.profiler import configure_profiler, install_signal_trigger
+from src.utils.tracing import configure_tracing, encounter_span
 
 def run_ui():
     """Run the Streamlit UI."""
@@ -34,24 +38,26 @@ def run_cli():
     
     print("Running Chiron in CLI mode...")
     
-    # Record audio
-    recorder = AudioRecorder()
-    print("Starting audio recording. Speak clearly and wait for silence detection.")
-    audio_path = recorder.start_recording()
-    print(f"Recording saved to: {audio_path}")
-    
-    # Transcribe audio
-    transcriber = WhisperTranscriber()
-    print("Transcribing audio...")
-    transcription = transcriber.transcribe(audio_path)
-    print("\nTranscription:")
-    print(transcription)
-    
-    # Process transcription
-    pipeline = NLPPipeline()
-    print("\nGenerating SOAP note...")
-    soap_note = pipeline.process(transcription)
-    
+    # One trace per encounter: recording, transcription and note generation
+    with encounter_span(mode="cli"):
+        # Record audio
+        recorder = AudioRecorder()
+        print("Starting audio recording. Speak clearly and wait for silence detection.")
+        audio_path = recorder.start_recording()
+        print(f"Recording saved to: {audio_path}")
+        
+        # Transcribe audio
+        transcriber = WhisperTranscriber()
+        print("Transcribing audio...")
+        transcription = transcriber.transcribe(audio_path)
+        print("\nTranscription:")
+        print(transcription)
+        
+        # Process transcription
+        pipeline = NLPPipeline()
+        print("\nGenerating SOAP note...")
+        soap_note = pipeline.process(transcription)
+        
     # Display SOAP note
     print("\nSOAP Note:")
     for section, content in soap_note.items():
@@ -67,13 +73,36 @@ def main():
         default="ui",
         help="Run mode: ui (Streamlit interface) or cli (command line)"
     )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Write a sampling profile for every transcription and pipeline run, not only slow ones"
+    )
     
     args = parser.parse_args()
     
-    if args.mode == "ui":
-        run_ui()
-    else:
-        run_cli()
+    # Per-stage latency and throughput, if METRICS_PORT or METRICS_SNAPSHOT_PATH is set
+    config = load_config()
+    exporter = MetricsExporter(config).start()
+    # Per-encounter spans, if TRACE_DIR is set
+    configure_tracing(config)
+    
+    # Profiles of slow calls, and on demand with 'python -m src.utils.profiler <pid>'
+    if args.profile:
+        config['PROFILE_THRESHOLD_SECONDS'] = 0
+    configure_profiler(config)
+    install_signal_trigger()
+    
+    # Model sizes, per-stage memory and budgets that refuse new work
+    configure_memory(config)
+    
+    try:
+        if args.mode == "ui":
+            run_ui()
+        else:
+            run_cli()
+    finally:
+        exporter.stop()
 
 if __name__ == "__main__":
     main()
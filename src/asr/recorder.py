@@ -8,7 +8,11 @@ from pathlib import Path
 from datetime import datetime
 import threading
 import queue
+import time
 from ..utils.logger import get_logger
+from ..utils.memory import AUDIO_BUFFER_BYTES, check_budget, get_budget
+from ..utils.metrics import STAGE_SECONDS
+from ..utils.tracing import record_span, span
 
 logger = get_logger(__name__)
 
@@ -22,6 +26,8 @@ class AudioRecorder:
         self.recording = False
         self.audio_queue = queue.Queue()
         self.audio_data = []
+        # Bytes held in audio_data for the current recording
+        self.audio_bytes = 0
         self.silence_counter = 0
         self.output_dir = Path(config.get('AUDIO_OUTPUT_DIR', 'data/raw_audio'))
         self.output_dir.mkdir(parents=True, exist_ok=True)
@@ -49,8 +55,13 @@ class AudioRecorder:
         
         # Add audio data to queue
         if self.recording:
+            if get_budget().audio_exceeded(self.audio_bytes + indata.nbytes):
+                # Keep what was captured rather than growing past the budget
+                self.stop_recording()
+                return
             self.audio_queue.put(indata.copy())
             self.audio_data.append(indata.copy())
+            self.audio_bytes += indata.nbytes
         
     def start_recording(self):
         """Start recording audio with voice activation."""
@@ -58,9 +69,15 @@ class AudioRecorder:
             logger.warning("Recording already in progress")
             return
             
+        check_budget("asr.record")
         logger.info("Starting audio recording...")
         self.recording = True
+        self.started = time.perf_counter()
+        self.started_at = time.time()
         self.audio_data = []
+        self.audio_bytes = 0
+        # Nothing reads the queue between recordings, so it starts empty each time
+        self.audio_queue = queue.Queue()
         self.silence_counter = 0
         
         # Start audio stream
@@ -85,6 +102,10 @@ class AudioRecorder:
             return None
             
         self.recording = False
+        STAGE_SECONDS.observe(time.perf_counter() - self.started, component="asr", stage="record")
+        # Recording spans two calls, so its span is recorded once it ends
+        record_span("asr.record", self.started_at, time.perf_counter() - self.started, audio_bytes=self.audio_bytes)
+        AUDIO_BUFFER_BYTES.observe(self.audio_bytes)
         logger.info("Recording stopped")
         
         try:
@@ -96,7 +117,8 @@ class AudioRecorder:
                 
             # Process and save the recorded audio
             if self.audio_data:
-                audio_path = self._save_audio_data()
+                with STAGE_SECONDS.time(component="asr", stage="save_audio"), span("io.write", target="audio"):
+                    audio_path = self._save_audio_data()
                 logger.info(f"Audio saved to: {audio_path}")
                 return audio_path
             else:
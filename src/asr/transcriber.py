@@ -1,12 +1,15 @@
 """
 Speech-to-text transcription using Whisper ASR.
 """
-import whisper
-import torch
 import os
 from pathlib import Path
 from datetime import datetime
+from ..backends import get_backend
 from ..utils.logger import get_logger
+from ..utils.memory import check_budget, record_model_load, rss_bytes, track_stage
+from ..utils.metrics import STAGE_ERRORS, STAGE_SECONDS
+from ..utils.profiler import profiled
+from ..utils.tracing import span
 
 logger = get_logger(__name__)
 
@@ -14,7 +17,8 @@ class WhisperTranscriber:
     def __init__(self, config):
         self.model_size = config.get('WHISPER_MODEL_SIZE', 'base')
         self.model_path = config.get('WHISPER_MODEL_PATH')
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.backend = get_backend(config)
+        self.device = self.backend.device()
         self.model = None
         self.output_dir = Path(config.get('TRANSCRIPTION_OUTPUT_DIR', 'data/transcriptions'))
         self.output_dir.mkdir(parents=True, exist_ok=True)
@@ -24,41 +28,52 @@ class WhisperTranscriber:
         """Load the Whisper ASR model."""
         logger.info(f"Loading Whisper model '{self.model_size}' on {self.device}...")
         try:
-            # Check if we have a local model file
-            if self.model_path and os.path.exists(self.model_path):
-                logger.info(f"Loading model from local path: {self.model_path}")
-                self.model = whisper.load_model(self.model_path, device=self.device)
-            else:
-                # Download and load the model from the Whisper repository
-                logger.info(f"Downloading model '{self.model_size}' from Whisper repository")
-                self.model = whisper.load_model(self.model_size, device=self.device)
-                
+            rss_before = rss_bytes()
+            with span("asr.load_model", model=self.model_size, device=self.device):
+                # Check if we have a local model file
+                if self.model_path and os.path.exists(self.model_path):
+                    logger.info(f"Loading model from local path: {self.model_path}")
+                    self.model = self.backend.load_whisper(self.model_path, self.device)
+                else:
+                    # Download and load the model from the Whisper repository
+                    logger.info(f"Downloading model '{self.model_size}' from Whisper repository")
+                    self.model = self.backend.load_whisper(self.model_size, self.device)
+            record_model_load("whisper", self.model, rss_before)
+            
             logger.info("Whisper model loaded successfully")
         except Exception as e:
             logger.error(f"Error loading Whisper model: {str(e)}")
             raise
-        
+            
+    @profiled("asr.transcribe")
     def transcribe(self, audio_path):
         """Transcribe audio file to text."""
         logger.info(f"Transcribing audio file: {audio_path}")
         try:
             # Ensure audio_path is a string
             audio_path_str = str(audio_path)
+            check_budget("asr.transcribe")
             
             # Run transcription
-            result = self.model.transcribe(
-                audio_path_str,
-                fp16=torch.cuda.is_available(),
-                language="en",
-                task="transcribe"
-            )
-            
+            with STAGE_SECONDS.time(component="asr", stage="transcribe"), span("asr.transcribe") as traced, \
+                    track_stage("asr", "transcribe"):
+                result = self.model.transcribe(
+                    audio_path_str,
+                    fp16=self.device == "cuda",
+                    language="en",
+                    task="transcribe"
+                )
+                if traced is not None:
+                    traced.set(characters=len(result["text"]))
+                    
             # Save transcription to file
             transcription_text = result["text"]
-            self._save_transcription(audio_path, transcription_text)
-            
+            with span("io.write", target="transcription"):
+                self._save_transcription(audio_path, transcription_text)
+                
             return transcription_text
         except Exception as e:
+            STAGE_ERRORS.inc(component="asr", stage="transcribe")
             logger.error(f"Transcription error: {str(e)}")
             raise
             
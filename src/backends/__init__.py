@@ -0,0 +1,35 @@
+"""
+Model backends: where the transcriber, extractor, matcher and generator get their models.
+
+A backend provides:
+    name                                  Backend name, as set in MODEL_BACKEND
+    device()                              Preferred device, "cuda" or "cpu"
+    load_whisper(name_or_path, device)    Object with transcribe(audio, **options) -> {"text": ...}
+    load_ner(model_name, device)          Callable text -> entity dicts with entity_group, word, score, start, end
+    load_encoder(model_name, device)      Object with encode(text) -> (1, dim) array, plus model and tokenizer
+    load_tokenizer(model_path)            Hugging Face tokenizer for the generator
+    load_causal_lm(model_path, device, dtype)  Hugging Face causal LM for the generator
+"""
+
+BACKENDS = ("hf", "stub")
+
+def get_backend(config=None):
+    """
+    Return the backend selected by MODEL_BACKEND.
+    
+    Args:
+        config (dict, optional): Application config; "hf" is used when MODEL_BACKEND is unset
+        
+    Returns:
+        The backend instance
+    """
+    config = config or {}
+    name = (config.get('MODEL_BACKEND') or 'hf').lower()
+    # Imported on demand so the stub backend works without the pretrained-model libraries
+    if name == 'stub':
+        from .stub import StubBackend
+        return StubBackend(config)
+    if name == 'hf':
+        from .huggingface import HuggingFaceBackend
+        return HuggingFaceBackend(config)
+    raise ValueError(f"Unknown MODEL_BACKEND '{name}'; expected one of {', '.join(BACKENDS)}")
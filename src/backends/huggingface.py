@@ -0,0 +1,88 @@
+"""
+Pretrained Whisper and Hugging Face models, downloaded on first use.
+"""
+import torch
+from transformers import AutoModel, AutoModelForCausalLM, AutoTokenizer, pipeline
+from ..utils.tracing import span
+
+DTYPES = {
+    "bf16": torch.bfloat16,
+    "fp16": torch.float16,
+    "fp32": torch.float32
+}
+
+class TransformerEncoder:
+    """Mean-pooled embeddings from a Hugging Face encoder."""
+    def __init__(self, model_name, device):
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).to(device)
+        
+    def encode(self, text):
+        # Tokenize and get embedding
+        with span("nlp.tokenize"):
+            inputs = self.tokenizer(
+                text,
+                return_tensors="pt",
+                max_length=512,
+                truncation=True,
+                padding="max_length"
+            ).to(self.model.device)
+            
+        # Get embeddings without gradient calculation
+        with torch.no_grad(), span("nlp.embed"):
+            outputs = self.model(**inputs)
+            
+        # Use mean of last hidden state as embedding
+        return outputs.last_hidden_state.mean(dim=1).cpu().numpy()
+
+class HuggingFaceBackend:
+    name = "hf"
+    
+    def __init__(self, config=None):
+        self.config = config or {}
+        
+    def device(self):
+        return "cuda" if torch.cuda.is_available() else "cpu"
+        
+    def load_whisper(self, name_or_path, device):
+        # Only the transcriber needs Whisper, so NLP-only installs can do without it
+        import whisper
+        return whisper.load_model(name_or_path, device=device)
+        
+    def load_ner(self, model_name, device):
+        return pipeline(
+            "ner",
+            model=model_name,
+            tokenizer=model_name,
+            aggregation_strategy="simple",
+            device=0 if device == "cuda" else -1
+        )
+        
+    def load_encoder(self, model_name, device):
+        return TransformerEncoder(model_name, device)
+        
+    def load_tokenizer(self, model_path):
+        return AutoTokenizer.from_pretrained(model_path)
+        
+    def load_causal_lm(self, model_path, device, dtype):
+        """Load a causal LM with the given device and precision."""
+        if dtype == 'int8' and device == 'cuda':
+            # 8-bit weights on GPU through bitsandbytes
+            from transformers import BitsAndBytesConfig
+            model = AutoModelForCausalLM.from_pretrained(
+                model_path,
+                quantization_config=BitsAndBytesConfig(load_in_8bit=True),
+                device_map="auto"
+            )
+        else:
+            model = AutoModelForCausalLM.from_pretrained(
+                model_path,
+                torch_dtype=DTYPES.get(dtype, torch.float32),
+                low_cpu_mem_usage=True
+            )
+            if dtype == 'int8':
+                # Dynamic int8 quantization of the linear layers for CPU inference
+                model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            model.to(device)
+        model.eval()
+        return model
@@ -0,0 +1,158 @@
+"""
+Small deterministic stand-in models for CI and fast performance runs: nothing is downloaded,
+and results depend only on the input.
+"""
+import hashlib
+import itertools
+import json
+import re
+from pathlib import Path
+import numpy as np
+from ..utils.logger import get_logger
+from ..utils.tracing import span
+
+logger = get_logger(__name__)
+
+# Words a stub transcript is made of when there is no sidecar text for the audio
+FILLER = (
+    "patient reports lower back pain radiating to the left leg with mild swelling of the knee "
+    "and occasional headache pain is worse when sitting and better with rest and ice"
+).split()
+
+# Transcript length for audio without a sidecar: words per second of 16 kHz 16-bit mono audio
+WORDS_PER_SECOND = 2.5
+BYTES_PER_SECOND = 32000
+
+class StubWhisper:
+    """Whisper stand-in; returns the text next to the audio file (<audio>.txt) if there is one."""
+    
+    def transcribe(self, audio, **options):
+        if isinstance(audio, (str, Path)):
+            sidecar = Path(audio).with_suffix(".txt")
+            if sidecar.exists():
+                text = sidecar.read_text(encoding='utf-8').strip()
+            else:
+                seconds = Path(audio).stat().st_size / BYTES_PER_SECOND
+                text = self._filler(seconds)
+        else:
+            # Samples at Whisper's 16 kHz input rate
+            text = self._filler(len(audio) / 16000)
+        return {"text": text, "segments": [], "language": options.get("language") or "en"}
+        
+    @staticmethod
+    def _filler(seconds):
+        words = max(1, int(seconds * WORDS_PER_SECOND))
+        return " ".join(itertools.islice(itertools.cycle(FILLER), words))
+
+class StubNER:
+    """NER stand-in that tags the medical terms lexicon; labels are lowercased categories like the real model's."""
+    
+    def __init__(self, medical_terms):
+        self.labels = {}
+        for category, terms in medical_terms.items():
+            for term in terms:
+                self.labels.setdefault(term.lower(), category.lower())
+        # Longest terms first so "back pain" wins over "back"
+        alternatives = sorted(self.labels, key=len, reverse=True)
+        self.pattern = re.compile(
+            r"\b(" + "|".join(re.escape(term) for term in alternatives) + r")\b", re.IGNORECASE
+        ) if alternatives else None
+        
+    def __call__(self, text):
+        if self.pattern is None:
+            return []
+        return [
+            {
+                "entity_group": self.labels[match.group(0).lower()],
+                "word": match.group(0),
+                "score": 0.99,
+                "start": match.start(),
+                "end": match.end()
+            }
+            for match in self.pattern.finditer(text)
+        ]
+
+class HashingEncoder:
+    """Embedding stand-in: signed hashed bag of words, L2 normalized, so shared words mean nearby vectors."""
+    
+    def __init__(self, dim=768):
+        self.dim = dim
+        self.model = None
+        self.tokenizer = None
+        
+    def encode(self, text):
+        with span("nlp.tokenize"):
+            tokens = re.findall(r"\w+", text.lower())
+        with span("nlp.embed"):
+            vector = np.zeros((1, self.dim), dtype=np.float32)
+            for token in tokens:
+                digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                vector[0, value % self.dim] += 1.0 if (value >> 63) else -1.0
+            norm = np.linalg.norm(vector)
+            return vector / norm if norm > 0 else vector
+
+class StubBackend:
+    name = "stub"
+    
+    def __init__(self, config=None):
+        self.config = config or {}
+        
+    def device(self):
+        # Stub models are small enough that the CPU keeps runs comparable across machines
+        return "cpu"
+        
+    def load_whisper(self, name_or_path, device):
+        return StubWhisper()
+        
+    def load_ner(self, model_name, device):
+        path = Path(self.config.get('MEDICAL_TERMS_PATH', 'data/medical_terms.json'))
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                medical_terms = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Stub NER has no lexicon at {path}: {str(e)}")
+            medical_terms = {}
+        return StubNER(medical_terms)
+        
+    def load_encoder(self, model_name, device):
+        return HashingEncoder()
+        
+    def load_tokenizer(self, model_path):
+        """Byte-level tokenizer with no merges, so it needs no vocabulary files."""
+        from tokenizers import Tokenizer, decoders, models, pre_tokenizers
+        from transformers import PreTrainedTokenizerFast
+        alphabet = pre_tokenizers.ByteLevel.alphabet()
+        vocab = {token: index for index, token in enumerate(["<s>", "</s>", "<unk>"] + sorted(alphabet))}
+        tokenizer = Tokenizer(models.BPE(vocab=vocab, merges=[], unk_token="<unk>"))
+        tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+        tokenizer.decoder = decoders.ByteLevel()
+        return PreTrainedTokenizerFast(
+            tokenizer_object=tokenizer, bos_token="<s>", eos_token="</s>", unk_token="<unk>", pad_token="</s>"
+        )
+        
+    def load_causal_lm(self, model_path, device, dtype):
+        """Two-layer Llama with fixed random weights per path; output is gibberish but costs real decoding work."""
+        import torch
+        from transformers import LlamaConfig, LlamaForCausalLM
+        config = LlamaConfig(
+            vocab_size=259,
+            hidden_size=64,
+            intermediate_size=128,
+            num_hidden_layers=2,
+            num_attention_heads=4,
+            num_key_value_heads=4,
+            max_position_embeddings=8192,
+            bos_token_id=0,
+            eos_token_id=1,
+            pad_token_id=1
+        )
+        # Same weights for a path on every run, without disturbing the caller's random state;
+        # different paths give different models, e.g. a draft model for assisted decoding
+        seed = int.from_bytes(hashlib.blake2b(str(model_path).encode('utf-8'), digest_size=4).digest(), "little")
+        with torch.random.fork_rng(devices=[]):
+            torch.manual_seed(seed)
+            model = LlamaForCausalLM(config)
+        model.to(device)
+        model.eval()
+        return model
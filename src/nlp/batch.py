@@ -0,0 +1,225 @@
+"""
+Parallel batch processing of transcript files with prefetching and ordered output.
+"""
+import hashlib
+import io
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from ..utils.logger import get_logger
+from ..utils.memory import MemoryBudgetExceeded, check_budget, peak_rss_bytes
+from ..utils.metrics import DOCUMENTS, STAGE_SECONDS
+from ..utils.tracing import encounter_span
+
+logger = get_logger(__name__)
+
+# fingerprint is (size, mtime, content hash) of the bytes read, for the batch manifest
+BatchItem = namedtuple('BatchItem', ['index', 'path', 'transcription', 'error', 'read_time', 'fingerprint'])
+
+# Forked workers inherit the already-loaded pipeline instead of loading models again
+_worker_pipeline = None
+_worker_pool = None
+
+def _init_worker():
+    """Give each forked worker its own stage pool; the parent's threads do not survive fork."""
+    global _worker_pool
+    _worker_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="batch-stage")
+
+def _process_in_worker(transcription, path=None):
+    return _run_pipeline(_worker_pipeline, transcription, _worker_pool, path)
+
+def _run_pipeline(pipeline, transcription, thread_pool, path=None):
+    """Run the pipeline stages without saving; returns (outputs, stage timings)."""
+    patient_id, visit_date = parse_filename(path) if path is not None else (None, None)
+    with encounter_span(patient_id, visit_date, mode="batch"):
+        results, timings = pipeline.run_stages(transcription, thread_pool)
+    return {name: results[name] for name in ("keywords", "template", "soap_note")}, timings
+
+def parse_filename(path):
+    """Patient id and visit date from a '<patient>_<date>...' file name."""
+    parts = path.stem.split('_')
+    if len(parts) >= 2:
+        return parts[0], parts[1]
+    return None, None
+
+class BatchProcessor:
+    def __init__(self, pipeline, config=None):
+        self.pipeline = pipeline
+        self.config = config or {}
+        self.workers = int(self.config.get('BATCH_WORKERS') or os.cpu_count() or 1)
+        self.mode = self.config.get('BATCH_MODE') or 'thread'
+        self.prefetch = int(self.config.get('BATCH_PREFETCH') or 16)
+        self.last_report = {}
+        self.forked = False
+        
+    def run(self, files, on_result=None):
+        """
+        Process transcript files in parallel and write results in input order.
+        
+        Args:
+            files (list): Transcript file paths
+            on_result (callable, optional): Called with each result record as it is written
+            
+        Returns:
+            list: One record per file with its source path, output path and error
+        """
+        started = time.perf_counter()
+        stage_seconds = {"read": 0.0, "write": 0.0}
+        records = []
+        
+        items = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        reader = threading.Thread(
+            target=self._read_files, args=(files, items, stop), name="batch-reader", daemon=True
+        )
+        reader.start()
+        
+        executor, submit, stage_pool = self._create_executor()
+        try:
+            # Oldest first: results are written strictly in input order by this thread
+            in_flight = OrderedDict()
+            exhausted = False
+            while not exhausted or in_flight:
+                while not exhausted and len(in_flight) < self.workers * 2:
+                    item = items.get()
+                    if item is None:
+                        exhausted = True
+                        break
+                    stage_seconds["read"] += item.read_time
+                    STAGE_SECONDS.observe(item.read_time, component="batch", stage="read")
+                    future = self._submit(submit, item) if item.error is None else None
+                    in_flight[item.index] = (item, future)
+                    
+                if not in_flight:
+                    continue
+                _, (item, future) = in_flight.popitem(last=False)
+                record = self._write_result(item, future, stage_seconds)
+                DOCUMENTS.inc(mode="batch", status="ok" if record["error"] is None else "error")
+                records.append(record)
+                if on_result is not None:
+                    on_result(record)
+        finally:
+            executor.shutdown()
+            if stage_pool is not None:
+                stage_pool.shutdown()
+            # The reader may be waiting on a full queue if the loop above stopped early
+            stop.set()
+            reader.join()
+            
+        elapsed = time.perf_counter() - started
+        done = sum(1 for record in records if record["error"] is None)
+        self.last_report = {
+            "documents": len(records),
+            "failed": len(records) - done,
+            "seconds": elapsed,
+            "docs_per_sec": done / elapsed if elapsed > 0 else 0.0,
+            "workers": self.workers,
+            "mode": self.mode,
+            "stage_seconds": stage_seconds,
+            "peak_rss_bytes": peak_rss_bytes()
+        }
+        logger.info(
+            f"Batch processed {done}/{len(records)} documents in {elapsed:.1f}s "
+            f"({self.last_report['docs_per_sec']:.2f} docs/sec, {self.workers} {self.mode} workers)"
+        )
+        return records
+        
+    def _create_executor(self):
+        """Worker pool sharing the loaded models: threads, or processes forked after loading."""
+        global _worker_pipeline
+        if self.mode == 'fork' and 'fork' in multiprocessing.get_all_start_methods():
+            _worker_pipeline = self.pipeline
+            self.forked = True
+            executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('fork'),
+                initializer=_init_worker
+            )
+            return executor, lambda text, path: executor.submit(_process_in_worker, text, path), None
+            
+        if self.mode == 'fork':
+            logger.warning("fork is not available on this platform; using worker threads")
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch-worker")
+        # Each document fans out into its own stages, so the stage pool is sized for every worker
+        stage_pool = ThreadPoolExecutor(max_workers=self.workers * 2, thread_name_prefix="batch-stage")
+        submit = lambda text, path: executor.submit(_run_pipeline, self.pipeline, text, stage_pool, path)
+        return executor, submit, stage_pool
+        
+    @staticmethod
+    def _submit(submit, item):
+        """Start one document, or fail it without running when over the memory budget."""
+        try:
+            check_budget("batch")
+        except MemoryBudgetExceeded as e:
+            future = Future()
+            future.set_exception(e)
+            return future
+        return submit(item.transcription, item.path)
+        
+    def _read_files(self, files, items, stop):
+        """Reader thread: load transcripts ahead of the workers until the batch stops."""
+        for index, path in enumerate(files):
+            if stop.is_set():
+                return
+            started = time.perf_counter()
+            try:
+                with open(path, 'rb') as f:
+                    mtime = os.fstat(f.fileno()).st_mtime
+                    data = f.read()
+                # Fingerprint the bytes that get processed; the file may change before the result is recorded
+                fingerprint = (len(data), mtime, hashlib.sha256(data).hexdigest())
+                transcription = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8').read()
+                item = BatchItem(index, path, transcription, None, 0.0, fingerprint)
+            except Exception as e:
+                item = BatchItem(index, path, None, str(e), 0.0, None)
+            if not self._put(items, item._replace(read_time=time.perf_counter() - started), stop):
+                return
+        self._put(items, None, stop)
+        
+    @staticmethod
+    def _put(items, item, stop):
+        """Queue an item, giving up once the batch stops; returns whether it was queued."""
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+        
+    def _write_result(self, item, future, stage_seconds):
+        """Single writer: save one document's outputs."""
+        record = {"path": str(item.path), "output": None, "error": item.error, "fingerprint": item.fingerprint}
+        if future is None:
+            logger.error(f"Error reading file {item.path}: {item.error}")
+            return record
+            
+        try:
+            outputs, timings = future.result()
+        except Exception as e:
+            logger.error(f"Error processing file {item.path}: {str(e)}")
+            record["error"] = str(e)
+            return record
+            
+        for stage, seconds in timings.items():
+            stage_seconds[stage] = stage_seconds.get(stage, 0.0) + seconds
+            if self.forked:
+                # Metrics recorded inside forked workers stay in the worker
+                STAGE_SECONDS.observe(seconds, component="nlp", stage=stage)
+                
+        started = time.perf_counter()
+        patient_id, visit_date = parse_filename(item.path)
+        record["output"] = self.pipeline.template_filler.save_soap_note(outputs["soap_note"], patient_id, visit_date)
+        self.pipeline._save_pipeline_output(
+            item.transcription, outputs["keywords"], outputs["template"], outputs["soap_note"],
+            patient_id, visit_date
+        )
+        stage_seconds["write"] += time.perf_counter() - started
+        STAGE_SECONDS.observe(time.perf_counter() - started, component="batch", stage="write")
+        if record["output"] is None:
+            record["error"] = "SOAP note could not be saved"
+        return record
@@ -0,0 +1,123 @@
+"""
+Analyzed transcript shared by the NLP stages, so each pass over the text runs once.
+"""
+import re
+import threading
+from collections import namedtuple
+
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+TOKEN_PATTERN = re.compile(r"\w+")
+
+Span = namedtuple('Span', ['start', 'end'])
+TermMatch = namedtuple('TermMatch', ['term', 'start', 'end', 'payload'])
+
+class TermIndex:
+    """Dictionary terms looked up by token n-grams instead of one regex scan per term."""
+    def __init__(self, terms):
+        # term -> payloads, e.g. (category, position) for each list the term appears in
+        self.terms = {}
+        self.irregular = []
+        self.max_tokens = 1
+        for term, payload in terms:
+            folded = term.lower()
+            tokens = TOKEN_PATTERN.findall(folded)
+            if not tokens:
+                continue
+            # Terms that do not start and end on a word character keep their own regex
+            if not (folded[0].isalnum() or folded[0] == '_') or not (folded[-1].isalnum() or folded[-1] == '_'):
+                self.irregular.append((re.compile(r'\b' + re.escape(folded) + r'\b'), folded, payload))
+                continue
+            self.terms.setdefault(folded, []).append(payload)
+            self.max_tokens = max(self.max_tokens, len(tokens))
+
+class Document:
+    def __init__(self, text):
+        self.text = text or ""
+        # Results of every analysis run on this document, by name
+        self.analyses = {}
+        self._lock = threading.Lock()
+        
+    @classmethod
+    def of(cls, text):
+        """Wrap raw text, or return an existing Document unchanged."""
+        return text if isinstance(text, cls) else cls(text)
+        
+    def __str__(self):
+        return self.text
+        
+    def __getstate__(self):
+        # Locks cannot be pickled; process-pool stages get a copy without one
+        with self._lock:
+            state = dict(self.__dict__, analyses=dict(self.analyses))
+        del state['_lock']
+        return state
+        
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        
+    def analysis(self, name, analyzer):
+        """Run analyzer(text) the first time a name is requested and reuse the result after that."""
+        with self._lock:
+            if name in self.analyses:
+                return self.analyses[name]
+        # Analyzers run outside the lock so independent stages do not wait on each other
+        result = analyzer(self.text)
+        with self._lock:
+            return self.analyses.setdefault(name, result)
+            
+    def add(self, name, result):
+        """Store a result computed elsewhere, e.g. in a worker process."""
+        with self._lock:
+            self.analyses[name] = result
+            
+    @property
+    def lower(self):
+        """Lowercased text; offsets match the original text."""
+        return self.analysis("lower", str.lower)
+        
+    @property
+    def tokens(self):
+        """Word token spans."""
+        return self.analysis("tokens", lambda text: [Span(m.start(), m.end()) for m in TOKEN_PATTERN.finditer(text)])
+        
+    @property
+    def sentences(self):
+        """Sentence spans, split at sentence punctuation and line breaks."""
+        return self.analysis("sentences", _sentence_spans)
+        
+    def sentence_texts(self):
+        return [self.text[span.start:span.end] for span in self.sentences]
+        
+    def find_terms(self, index):
+        """
+        Find every whole-word occurrence of the index's terms, matching case-insensitively.
+        
+        Args:
+            index (TermIndex): Terms to look for
+            
+        Returns:
+            list: TermMatch for each occurrence and payload; overlapping terms all match
+        """
+        lower = self.lower
+        tokens = self.tokens
+        found = []
+        for i, first in enumerate(tokens):
+            for last in tokens[i:i + index.max_tokens]:
+                term = lower[first.start:last.end]
+                for payload in index.terms.get(term, ()):
+                    found.append(TermMatch(term, first.start, last.end, payload))
+        for regex, term, payload in index.irregular:
+            found.extend(TermMatch(term, m.start(), m.end(), payload) for m in regex.finditer(lower))
+        return found
+
+def _sentence_spans(text):
+    spans = []
+    start = 0
+    for separator in SENTENCE_SPLIT.finditer(text):
+        if separator.start() > start:
+            spans.append(Span(start, separator.start()))
+        start = separator.end()
+    if start < len(text):
+        spans.append(Span(start, len(text)))
+    return spans
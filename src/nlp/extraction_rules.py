@@ -0,0 +1,154 @@
+"""
+Declarative extraction rules compiled once and run as a single combined scan.
+"""
+import re
+import json
+import threading
+from collections import namedtuple
+from pathlib import Path
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+Rule = namedtuple('Rule', ['name', 'group', 'pattern', 'regex', 'value_group'])
+RuleMatch = namedtuple('RuleMatch', ['rule', 'group', 'value', 'start', 'end'])
+
+# Global inline flags such as (?i) at the start of a pattern
+GLOBAL_FLAGS = re.compile(r"\(\?([aiLmsux]+)\)")
+
+_rule_sets = {}
+_rule_sets_lock = threading.Lock()
+
+def get_rule_set(rules_dir='data/rules'):
+    """Return the shared, compiled rule set for a rules directory."""
+    key = str(Path(rules_dir).resolve())
+    with _rule_sets_lock:
+        if key not in _rule_sets:
+            _rule_sets[key] = RuleSet.from_directory(rules_dir)
+        return _rule_sets[key]
+
+def scope_flags(pattern):
+    """Rewrite leading global inline flags as a scoped group, e.g. "(?i)pain" to "(?i:pain)"."""
+    flags = ""
+    position = 0
+    match = GLOBAL_FLAGS.match(pattern)
+    while match:
+        flags += match.group(1)
+        position = match.end()
+        match = GLOBAL_FLAGS.match(pattern, position)
+    return f"(?{flags}:{pattern[position:]})" if flags else pattern
+
+class RuleSet:
+    def __init__(self, rule_specs):
+        self.rules = []
+        self.groups = {}
+        self.scanner = None
+        self._compile(rule_specs)
+        
+    @classmethod
+    def from_directory(cls, rules_dir):
+        """Load every rule file in a directory; later files override earlier rules by name."""
+        specs = {}
+        rules_path = Path(rules_dir)
+        rule_files = sorted(rules_path.glob("*.json")) if rules_path.is_dir() else []
+        
+        if not rule_files:
+            logger.warning(f"No extraction rule files found in {rules_dir}")
+            
+        for rule_file in rule_files:
+            try:
+                with open(rule_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                for spec in data.get("rules", []):
+                    specs.pop(spec["name"], None)
+                    specs[spec["name"]] = spec
+            except Exception as e:
+                logger.error(f"Error loading extraction rules from {rule_file}: {str(e)}")
+                
+        rule_set = cls(list(specs.values()))
+        logger.info(f"Compiled {len(rule_set.rules)} extraction rules from {len(rule_files)} files")
+        return rule_set
+        
+    def _compile(self, rule_specs):
+        """Compile each rule and the combined scanner."""
+        alternatives = []
+        for spec in rule_specs:
+            flags = 0 if spec.get("case_sensitive") else re.IGNORECASE
+            # Global flags are only allowed at the start of the whole scanner, so each rule gets scoped ones
+            pattern = scope_flags(spec["pattern"])
+            # Zero-width alternatives let rules starting at different offsets all match
+            body = f"(?i:{pattern})" if flags else pattern
+            alternative = f"(?=(?P<r{len(self.rules)}>{body}))"
+            try:
+                regex = re.compile(pattern, flags)
+                re.compile(alternative)
+            except re.error as e:
+                logger.error(f"Invalid pattern for rule {spec.get('name')}: {str(e)}")
+                continue
+                
+            if regex.groupindex:
+                logger.error(f"Rule {spec['name']} must not use named groups")
+                continue
+                
+            rule = Rule(spec["name"], spec.get("group", spec["name"]), spec["pattern"], regex, 1 if regex.groups else 0)
+            self.rules.append(rule)
+            self.groups.setdefault(rule.group, []).append(rule)
+            alternatives.append(alternative)
+            
+        if alternatives:
+            self.scanner = re.compile("|".join(alternatives))
+            self._group_offsets = [self.scanner.groupindex[f"r{i}"] for i in range(len(self.rules))]
+            
+    def scan(self, text):
+        """Run every rule over the text in one pass and return the named captures."""
+        matches = {rule.name: [] for rule in self.rules}
+        if self.scanner is None or not text:
+            return RuleMatches(self, matches)
+            
+        for hit in self.scanner.finditer(text):
+            winner = int(hit.lastgroup[1:]) if hit.lastgroup else self._winner(hit)
+            offset = self._group_offsets[winner]
+            self._record(matches, self.rules[winner], hit, offset)
+            
+            # Later rules anchored at the same offset are shadowed by the winner
+            for rule in self.rules[winner + 1:]:
+                extra = rule.regex.match(text, hit.start())
+                if extra:
+                    self._record(matches, rule, extra, 0)
+                    
+        return RuleMatches(self, matches)
+        
+    def _winner(self, hit):
+        """Find which alternative produced a scanner hit."""
+        for index, offset in enumerate(self._group_offsets):
+            if hit.group(offset) is not None:
+                return index
+        return 0
+        
+    @staticmethod
+    def _record(matches, rule, match, offset):
+        """Store the value capture of a rule match."""
+        group_index = offset + rule.value_group
+        value = match.group(group_index)
+        if value is None:
+            return
+        matches[rule.name].append(
+            RuleMatch(rule.name, rule.group, value, match.start(group_index), match.end(group_index))
+        )
+
+class RuleMatches:
+    def __init__(self, rule_set, matches):
+        self.rule_set = rule_set
+        self.matches = matches
+        
+    def get(self, rule_name):
+        """All matches of a single rule, in text order."""
+        return self.matches.get(rule_name, [])
+        
+    def first(self, group):
+        """Value of the first matching rule in a group, honoring rule priority."""
+        for rule in self.rule_set.groups.get(group, []):
+            found = self.matches.get(rule.name)
+            if found:
+                return found[0].value.strip()
+        return None
@@ -0,0 +1,295 @@
+"""
+Continuous-batching generation service for the local LLM.
+"""
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+import torch
+from transformers import DynamicCache
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+def _cache_layers(past_key_values):
+    """Per-layer (key, value) tensors of a model cache."""
+    if hasattr(past_key_values, "layers"):
+        # transformers 5 keeps one layer object per decoder layer
+        return [(layer.keys, layer.values) for layer in past_key_values.layers]
+    if hasattr(past_key_values, "key_cache"):
+        return list(zip(past_key_values.key_cache, past_key_values.value_cache))
+    return [(layer[0], layer[1]) for layer in past_key_values]
+
+def _to_cache(layers):
+    """A DynamicCache holding per-layer (key, value) tensors; update() works across transformers versions."""
+    cache = DynamicCache()
+    for index, (key, value) in enumerate(layers):
+        cache.update(key, value, index)
+    return cache
+
+def _left_pad(tensor, amount):
+    """Pad a [batch, heads, length, dim] tensor with zeros on the left of the length axis."""
+    if amount == 0:
+        return tensor
+    shape = list(tensor.shape)
+    shape[2] = amount
+    return torch.cat([tensor.new_zeros(shape), tensor], dim=2)
+
+class GenerationRequest:
+    def __init__(self, template, keywords, transcription, on_token):
+        self.template = template
+        self.keywords = keywords
+        self.transcription = transcription
+        self.on_token = on_token
+        self.future = Future()
+        self.submitted = time.perf_counter()
+        self.admitted = None
+        self.first_token = None
+        self.cache_key = None
+        self.tokens = []
+        self.sent_text = ""
+        self.max_new_tokens = 0
+
+class GenerationServer:
+    def __init__(self, generator, config=None):
+        self.generator = generator
+        self.config = config or {}
+        self.max_batch = int(self.config.get('LLM_MAX_BATCH') or 8)
+        self.model = generator.model
+        self.tokenizer = generator.tokenizer
+        self.eos_token_ids = self._eos_token_ids()
+        self.requests = queue.Queue()
+        self.request_metrics = deque(maxlen=1000)
+        self.completed_tokens = 0
+        self.started = None
+        
+        # Running batch: rows are requests, the KV cache is left-padded to a common length
+        self.active = []
+        self.layers = None
+        self.attention_mask = None
+        self.next_tokens = None
+        
+        self._stop = threading.Event()
+        self._thread = None
+        
+    def _eos_token_ids(self):
+        """Token ids that end a generation."""
+        eos = getattr(self.model.generation_config, "eos_token_id", None)
+        ids = set(eos if isinstance(eos, (list, tuple)) else [eos])
+        ids.add(self.tokenizer.eos_token_id)
+        ids.discard(None)
+        return ids
+        
+    def start(self):
+        """Start the scheduler thread."""
+        if self._thread is None:
+            self._stop.clear()
+            self.started = time.perf_counter()
+            self._thread = threading.Thread(target=self._run, name="generation-server", daemon=True)
+            self._thread.start()
+            logger.info(f"Generation server started (max batch {self.max_batch})")
+        return self
+        
+    def stop(self):
+        """Stop the scheduler; pending requests fail."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=30)
+            self._thread = None
+        for request in self.active:
+            request.future.set_exception(RuntimeError("Generation server stopped"))
+        self._reset_batch()
+        while not self.requests.empty():
+            self.requests.get_nowait().future.set_exception(RuntimeError("Generation server stopped"))
+            
+    def submit(self, template, keywords, transcription=None, on_token=None):
+        """Queue a SOAP note generation; returns a Future with the note text."""
+        request = GenerationRequest(template, keywords, transcription, on_token)
+        self.requests.put(request)
+        return request.future
+        
+    def generate_soap_note(self, template, keywords, transcription=None, on_token=None):
+        """Generate a SOAP note through the shared batch and wait for it."""
+        return self.submit(template, keywords, transcription, on_token).result()
+        
+    def _run(self):
+        """Scheduler loop: admit waiting requests between decode steps."""
+        while not self._stop.is_set():
+            try:
+                self._admit(block=not self.active)
+                if self.active:
+                    self._step()
+            except Exception as e:
+                logger.error(f"Generation server error: {str(e)}")
+                for request in self.active:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                self._reset_batch()
+                
+    def _admit(self, block):
+        """Prefill queued requests and join them to the running batch."""
+        while len(self.active) < self.max_batch:
+            try:
+                request = self.requests.get(timeout=0.1) if block else self.requests.get_nowait()
+            except queue.Empty:
+                return
+            block = False
+            try:
+                self._prefill(request)
+            except Exception as e:
+                logger.error(f"Error starting generation: {str(e)}")
+                request.future.set_exception(e)
+                
+    def _prefill(self, request):
+        """Process one prompt on its own and add its state to the batch."""
+        request.admitted = time.perf_counter()
+        prompt = self.generator._create_prompt(request.template, request.keywords, request.transcription)
+        params = self.generator.generation_params()
+        request.max_new_tokens = params["max_new_tokens"]
+        request.cache_key = self.generator._response_cache_key(prompt, params)
+        if request.cache_key is not None:
+            cached = self.generator.response_cache.get(request.cache_key)
+            if cached is not None:
+                if request.on_token is not None:
+                    request.on_token(cached)
+                self._finish(request, cached)
+                return
+                
+        input_ids, past_key_values, prefix_tokens = self.generator._prepare_inputs(request.template, prompt)
+        with torch.inference_mode():
+            # Only tokens past the cached template prefix need processing
+            outputs = self.model(
+                input_ids=input_ids[:, prefix_tokens:],
+                past_key_values=past_key_values if past_key_values is not None else DynamicCache(),
+                use_cache=True
+            )
+        token = outputs.logits[:, -1, :].argmax(dim=-1, keepdim=True)
+        layers = _cache_layers(outputs.past_key_values)
+        mask = torch.ones((1, input_ids.shape[1]), dtype=torch.long, device=input_ids.device)
+        
+        if self.layers is None:
+            self.layers, self.attention_mask, self.next_tokens = layers, mask, token
+        else:
+            # Left-pad whichever side is shorter so every row ends at the same position
+            length, new_length = self.attention_mask.shape[1], mask.shape[1]
+            self.layers = [
+                (
+                    torch.cat([_left_pad(k, max(0, new_length - length)), _left_pad(nk, max(0, length - new_length))]),
+                    torch.cat([_left_pad(v, max(0, new_length - length)), _left_pad(nv, max(0, length - new_length))])
+                )
+                for (k, v), (nk, nv) in zip(self.layers, layers)
+            ]
+            self.attention_mask = torch.cat([
+                torch.nn.functional.pad(self.attention_mask, (max(0, new_length - length), 0)),
+                torch.nn.functional.pad(mask, (max(0, length - new_length), 0))
+            ])
+            self.next_tokens = torch.cat([self.next_tokens, token])
+            
+        self.active.append(request)
+        self._emit([token[0, 0].item()], [request])
+        
+    def _step(self):
+        """Run one decode step for every active request at once."""
+        attention_mask = torch.cat([self.attention_mask, self.attention_mask.new_ones((len(self.active), 1))], dim=1)
+        # Each row continues from its own length, ignoring left padding
+        position_ids = self.attention_mask.sum(dim=1, keepdim=True)
+        with torch.inference_mode():
+            outputs = self.model(
+                input_ids=self.next_tokens,
+                attention_mask=attention_mask,
+                position_ids=position_ids,
+                past_key_values=_to_cache(self.layers),
+                use_cache=True
+            )
+        self.layers = _cache_layers(outputs.past_key_values)
+        self.attention_mask = attention_mask
+        self.next_tokens = outputs.logits[:, -1, :].argmax(dim=-1, keepdim=True)
+        self._emit(self.next_tokens[:, 0].tolist(), list(self.active))
+        
+    def _emit(self, tokens, requests):
+        """Record new tokens, stream text, and retire finished requests."""
+        finished = []
+        for row, (token, request) in enumerate(zip(tokens, requests)):
+            if request.first_token is None:
+                request.first_token = time.perf_counter()
+            done = token in self.eos_token_ids
+            if not done:
+                request.tokens.append(token)
+                self._stream_text(request)
+            if done or len(request.tokens) >= request.max_new_tokens:
+                finished.append(request)
+                
+        for request in finished:
+            text = self.tokenizer.decode(request.tokens, skip_special_tokens=True)
+            if request.cache_key is not None:
+                self.generator.response_cache.put(request.cache_key, text)
+            self._remove(self.active.index(request))
+            self._finish(request, text)
+            
+    def _stream_text(self, request):
+        """Send newly completed text to the request's callback."""
+        if request.on_token is None:
+            return
+        text = self.tokenizer.decode(request.tokens, skip_special_tokens=True)
+        # Hold back partial multi-byte characters until the next token completes them
+        if text.endswith("\ufffd") or len(text) <= len(request.sent_text):
+            return
+        try:
+            request.on_token(text[len(request.sent_text):])
+        except Exception as e:
+            logger.error(f"Error in token callback: {str(e)}")
+        request.sent_text = text
+        
+    def _remove(self, row):
+        """Drop a row from the batch and trim padding no row needs any more."""
+        del self.active[row]
+        if not self.active:
+            self._reset_batch()
+            return
+            
+        keep = [i for i in range(self.attention_mask.shape[0]) if i != row]
+        index = torch.tensor(keep, device=self.attention_mask.device)
+        self.attention_mask = self.attention_mask.index_select(0, index)
+        self.next_tokens = self.next_tokens.index_select(0, index)
+        trim = int((self.attention_mask.cumsum(dim=1) == 0).sum(dim=1).min().item())
+        self.attention_mask = self.attention_mask[:, trim:]
+        self.layers = [
+            (k.index_select(0, index)[:, :, trim:], v.index_select(0, index)[:, :, trim:])
+            for k, v in self.layers
+        ]
+        
+    def _reset_batch(self):
+        self.active = []
+        self.layers = None
+        self.attention_mask = None
+        self.next_tokens = None
+        
+    def _finish(self, request, text):
+        """Complete a request and record its latency."""
+        now = time.perf_counter()
+        self.completed_tokens += len(request.tokens)
+        self.request_metrics.append({
+            "queue_wait": (request.admitted or now) - request.submitted,
+            "time_to_first_token": (request.first_token or now) - request.submitted,
+            "latency": now - request.submitted,
+            "tokens": len(request.tokens)
+        })
+        request.future.set_result(text)
+        
+    def metrics(self):
+        """Queue depth, batch size and per-request latency percentiles (seconds)."""
+        summary = {
+            "queue_depth": self.requests.qsize(),
+            "active": len(self.active),
+            "completed": len(self.request_metrics)
+        }
+        if self.started is not None:
+            summary["tokens_per_second"] = self.completed_tokens / max(time.perf_counter() - self.started, 1e-9)
+            
+        for name in ("queue_wait", "time_to_first_token", "latency"):
+            values = sorted(m[name] for m in self.request_metrics)
+            if values:
+                summary[f"{name}_p50"] = values[len(values) // 2]
+                summary[f"{name}_p95"] = values[min(len(values) - 1, int(0.95 * len(values)))]
+        return summary
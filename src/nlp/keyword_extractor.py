@@ -1,12 +1,13 @@
 """
 Medical keyword extraction from transcribed text.
 """
-from transformers import pipeline, AutoTokenizer, AutoModelForTokenClassification
-import torch
-import re
 from pathlib import Path
 import json
+from .document import Document, TermIndex
+from ..backends import get_backend
 from ..utils.logger import get_logger
+from ..utils.memory import record_model_load, rss_bytes
+from ..utils.tracing import span
 
 logger = get_logger(__name__)
 
@@ -14,8 +15,10 @@ class KeywordExtractor:
     def __init__(self, config=None):
         self.config = config or {}
         self.ner_pipeline = None
+        self.backend = get_backend(self.config)
         self.medical_terms_path = self.config.get('MEDICAL_TERMS_PATH', 'data/medical_terms.json')
         self.medical_terms = self._load_medical_terms()
+        self.term_index = self._build_term_index()
         self.initialize_pipeline()
         
     def initialize_pipeline(self):
@@ -26,17 +29,13 @@ class KeywordExtractor:
             
             logger.info(f"Loading NER model: {model_name}")
             
-            # Check if CUDA is available
-            device = 0 if torch.cuda.is_available() else -1
-            logger.info(f"Using device: {'CUDA' if device == 0 else 'CPU'}")
+            device = self.backend.device()
+            logger.info(f"Using device: {device.upper()} ({self.backend.name} backend)")
             
-            self.ner_pipeline = pipeline(
-                "ner", 
-                model=model_name,
-                tokenizer=model_name,
-                aggregation_strategy="simple",
-                device=device
-            )
+            rss_before = rss_bytes()
+            with span("nlp.load_model", model=model_name, backend=self.backend.name):
+                self.ner_pipeline = self.backend.load_ner(model_name, device)
+            record_model_load("ner", self.ner_pipeline, rss_before)
             
             logger.info("NER pipeline initialized successfully")
         except Exception as e:
@@ -63,6 +62,28 @@ class KeywordExtractor:
             logger.error(f"Error loading medical terms: {str(e)}")
             return self._create_basic_medical_terms()
             
+    def _build_term_index(self):
+        """Index every dictionary term once, so matching is one pass over the document's tokens."""
+        # Positions keep results in dictionary order
+        pairs = [(category, term) for category, terms in self.medical_terms.items() for term in terms]
+        return TermIndex((term, (position, category)) for position, (category, term) in enumerate(pairs))
+        
+    def order_keywords(self, keywords):
+        """Sort keywords merged from several extractions into the order extract_keywords returns."""
+        if self.ner_pipeline:
+            return sorted(keywords, key=lambda k: k.get("start") or 0)
+            
+        positions = {}
+        for term, payloads in self.term_index.terms.items():
+            for position, category in payloads:
+                positions.setdefault((term, category), position)
+        for _, term, (position, category) in self.term_index.irregular:
+            positions.setdefault((term, category), position)
+        return sorted(
+            keywords,
+            key=lambda k: (positions.get((k.get("text", "").lower(), k.get("label")), len(positions)), k.get("start") or 0)
+        )
+        
     def _create_basic_medical_terms(self):
         """Create a basic medical terms dictionary."""
         medical_terms = {
@@ -105,32 +126,39 @@ class KeywordExtractor:
             logger.error(f"Error saving basic medical terms: {str(e)}")
             
         return medical_terms
-            
+        
     def extract_keywords(self, text):
-        """Extract medical keywords from text."""
+        """Extract medical keywords from text or a Document."""
+        document = Document.of(text)
         try:
             # Try using the NER pipeline if available
             if self.ner_pipeline:
                 logger.info("Extracting keywords using NER pipeline")
-                return self._extract_with_ner(text)
+                keywords = self._extract_with_ner(document.text)
             else:
                 logger.info("Extracting keywords using rule-based approach")
-                return self._extract_with_rules(text)
+                keywords = self._extract_with_rules(document)
         except Exception as e:
             logger.error(f"Keyword extraction error: {str(e)}")
             # Fall back to rule-based extraction if NER fails
-            return self._extract_with_rules(text)
+            keywords = self._extract_with_rules(document)
             
+        document.add("keywords", keywords)
+        return keywords
+        
     def _extract_with_ner(self, text):
         """Extract keywords using the NER pipeline."""
-        entities = self.ner_pipeline(text)
-        
+        with span("nlp.ner_inference", characters=len(text)):
+            entities = self.ner_pipeline(text)
+            
         # Filter and format results
         keywords = [
             {
                 "text": entity["word"],
                 "label": entity["entity_group"],
-                "score": entity["score"]
+                "score": entity["score"],
+                "start": entity.get("start"),
+                "end": entity.get("end")
             }
             for entity in entities
             if entity["score"] > 0.7  # Only include high-confidence predictions
@@ -141,27 +169,21 @@ class KeywordExtractor:
         
     def _extract_with_rules(self, text):
         """Extract keywords using rule-based approach."""
-        keywords = []
-        
-        # Normalize text for matching
-        text_lower = text.lower()
+        document = Document.of(text)
         
-        # Match medical terms from our dictionary
-        for category, terms in self.medical_terms.items():
-            for term in terms:
-                # Use word boundary to match whole words
-                pattern = r'\b' + re.escape(term.lower()) + r'\b'
-                matches = re.finditer(pattern, text_lower)
-                
-                for match in matches:
-                    # Get the actual text from the original case
-                    original_text = text[match.start():match.end()]
-                    
-                    keywords.append({
-                        "text": original_text,
-                        "label": category,
-                        "score": 1.0  # Rule-based matches get a score of 1.0
-                    })
+        # Match every dictionary term in one pass over the document's tokens
+        matches = sorted(document.find_terms(self.term_index), key=lambda m: (m.payload[0], m.start))
+        keywords = [
+            {
+                # Get the actual text from the original case
+                "text": document.text[match.start:match.end],
+                "label": match.payload[1],
+                "score": 1.0,  # Rule-based matches get a score of 1.0
+                "start": match.start,
+                "end": match.end
+            }
+            for match in matches
+        ]
         
         logger.info(f"Extracted {len(keywords)} keywords with rule-based approach")
         return keywords
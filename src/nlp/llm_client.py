@@ -0,0 +1,256 @@
+"""
+Async, connection-pooled client for OpenAI-compatible chat completion endpoints.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+import openai
+from ..utils.logger import get_logger
+from ..utils.metrics import STAGE_ERRORS, STAGE_SECONDS
+from ..utils.tracing import span
+
+logger = get_logger(__name__)
+
+# Failures worth retrying; anything else (bad request, auth) fails immediately
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+# How long a caller waits for the background loop to set up the client
+LOOP_START_TIMEOUT = 30
+
+class LLMClient:
+    def __init__(self, config=None):
+        self.config = config or {}
+        self.base_url = self.config.get('LLM_BASE_URL')
+        self.api_key = self.config.get('OPENAI_API_KEY') or 'not-needed'
+        self.model = self.config.get('LLM_MODEL') or 'gpt-3.5-turbo'
+        self.timeout = float(self.config.get('LLM_TIMEOUT') or 60)
+        # 0 is a valid setting for retries and backoff, so only a missing value takes the default
+        max_retries = self.config.get('LLM_MAX_RETRIES')
+        self.max_retries = 3 if max_retries is None else int(max_retries)
+        self.max_concurrency = int(self.config.get('LLM_MAX_CONCURRENCY') or 8)
+        backoff_base = self.config.get('LLM_BACKOFF_BASE')
+        self.backoff_base = 0.5 if backoff_base is None else float(backoff_base)
+        self.backoff_max = float(self.config.get('LLM_BACKOFF_MAX') or 8.0)
+        self.call_metrics = deque(maxlen=1000)
+        self.in_flight = 0
+        self._client = None
+        self._semaphore = None
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        
+    def _ensure_loop(self):
+        """Start the background event loop that owns the pooled connection."""
+        with self._lock:
+            if self._loop is not None:
+                return self._loop
+                
+            ready = threading.Event()
+            failure = []
+            
+            def run_loop():
+                loop = asyncio.new_event_loop()
+                try:
+                    asyncio.set_event_loop(loop)
+                    # The client and semaphore must be created on the loop that uses them
+                    self._client = openai.AsyncOpenAI(
+                        api_key=self.api_key,
+                        base_url=self.base_url,
+                        timeout=self.timeout,
+                        max_retries=0
+                    )
+                    self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                    self._loop = loop
+                except Exception as e:
+                    failure.append(e)
+                    loop.close()
+                    return
+                finally:
+                    # Set even when setup fails, so the caller never waits forever
+                    ready.set()
+                loop.run_forever()
+                
+            self._thread = threading.Thread(target=run_loop, name="llm-client", daemon=True)
+            self._thread.start()
+            if not ready.wait(timeout=LOOP_START_TIMEOUT):
+                raise RuntimeError(f"LLM client did not start within {LOOP_START_TIMEOUT} seconds")
+            if failure:
+                self._thread = None
+                logger.error(f"Error starting LLM client: {str(failure[0])}")
+                raise failure[0]
+            logger.info(f"LLM client started for {self.base_url or 'OpenAI'} (model {self.model})")
+            return self._loop
+            
+    async def acomplete(self, messages, temperature=0.3, max_tokens=1000):
+        """Run one chat completion with bounded concurrency, timeout and jittered retries."""
+        if self._semaphore is None:
+            raise RuntimeError("acomplete must run on the client loop; use submit() or complete()")
+            
+        started = time.perf_counter()
+        attempts = 0
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                while True:
+                    attempts += 1
+                    try:
+                        response = await self._client.chat.completions.create(
+                            model=self.model,
+                            messages=messages,
+                            temperature=temperature,
+                            max_tokens=max_tokens
+                        )
+                        self._record(started, attempts, True, response)
+                        return response.choices[0].message.content or ""
+                    except RETRYABLE_ERRORS as e:
+                        if attempts > self.max_retries:
+                            self._record(started, attempts, False)
+                            raise
+                        await self._backoff(attempts, e)
+                    except Exception:
+                        self._record(started, attempts, False)
+                        raise
+            finally:
+                self.in_flight -= 1
+                
+    async def astream(self, messages, on_delta, temperature=0.3, max_tokens=1000):
+        """Stream a chat completion, passing each text delta to on_delta; returns the full text."""
+        if self._semaphore is None:
+            raise RuntimeError("astream must run on the client loop; use submit_stream() or stream()")
+            
+        started = time.perf_counter()
+        attempts = 0
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                while True:
+                    attempts += 1
+                    parts = []
+                    first_token = None
+                    try:
+                        stream = await self._client.chat.completions.create(
+                            model=self.model,
+                            messages=messages,
+                            temperature=temperature,
+                            max_tokens=max_tokens,
+                            stream=True
+                        )
+                        async with stream:
+                            async for chunk in stream:
+                                delta = chunk.choices[0].delta.content if chunk.choices else None
+                                if not delta:
+                                    continue
+                                if first_token is None:
+                                    first_token = time.perf_counter() - started
+                                parts.append(delta)
+                                on_delta(delta)
+                        self._record(started, attempts, True, first_token=first_token)
+                        return "".join(parts)
+                    except RETRYABLE_ERRORS as e:
+                        # Text already handed to the caller cannot be taken back, so only retry before it
+                        if parts or attempts > self.max_retries:
+                            self._record(started, attempts, False)
+                            raise
+                        await self._backoff(attempts, e)
+                    except Exception:
+                        self._record(started, attempts, False)
+                        raise
+            finally:
+                self.in_flight -= 1
+                
+    async def _backoff(self, attempts, error):
+        """Sleep before a retry."""
+        # Full jitter keeps concurrent retries from synchronizing
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1)))
+        logger.warning(f"LLM call failed ({type(error).__name__}), retry {attempts} in {delay:.2f}s")
+        await asyncio.sleep(delay)
+        
+    def submit(self, messages, temperature=0.3, max_tokens=1000):
+        """Schedule a completion without blocking; returns a concurrent.futures.Future."""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(
+            self.acomplete(messages, temperature=temperature, max_tokens=max_tokens), loop
+        )
+        
+    def complete(self, messages, temperature=0.3, max_tokens=1000):
+        """Run a completion and wait for the result."""
+        with span("llm.request", model=self.model, streamed=False):
+            return self.submit(messages, temperature=temperature, max_tokens=max_tokens).result()
+            
+    def submit_stream(self, messages, on_delta, temperature=0.3, max_tokens=1000):
+        """Schedule a streamed completion; on_delta runs on the client thread as text arrives."""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(
+            self.astream(messages, on_delta, temperature=temperature, max_tokens=max_tokens), loop
+        )
+        
+    def stream(self, messages, on_delta, temperature=0.3, max_tokens=1000):
+        """Run a streamed completion and wait for the full text."""
+        with span("llm.request", model=self.model, streamed=True):
+            return self.submit_stream(messages, on_delta, temperature=temperature, max_tokens=max_tokens).result()
+            
+    def close(self):
+        """Close pooled connections and stop the background loop."""
+        with self._lock:
+            if self._loop is None:
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self._client.close(), self._loop).result(timeout=5)
+                # Finalize transport generators left behind by streamed responses
+                asyncio.run_coroutine_threadsafe(self._loop.shutdown_asyncgens(), self._loop).result(timeout=5)
+            except Exception as e:
+                logger.error(f"Error closing LLM client: {str(e)}")
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop = None
+            self._client = None
+            self._semaphore = None
+            
+    def _record(self, started, attempts, ok, response=None, first_token=None):
+        """Keep per-call latency metrics."""
+        usage = getattr(response, "usage", None)
+        latency = time.perf_counter() - started
+        STAGE_SECONDS.observe(latency, component="llm", stage="request")
+        if first_token is not None:
+            STAGE_SECONDS.observe(first_token, component="llm", stage="first_token")
+        if not ok:
+            STAGE_ERRORS.inc(component="llm", stage="request")
+        self.call_metrics.append({
+            "latency": latency,
+            "first_token": first_token,
+            "attempts": attempts,
+            "ok": ok,
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None)
+        })
+        
+    def latency_summary(self):
+        """Summarize recent call latencies (seconds)."""
+        latencies = sorted(m["latency"] for m in self.call_metrics if m["ok"])
+        failures = sum(1 for m in self.call_metrics if not m["ok"])
+        if not latencies:
+            return {"calls": 0, "failures": failures}
+            
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+            
+        summary = {
+            "calls": len(latencies),
+            "failures": failures,
+            "retries": sum(m["attempts"] - 1 for m in self.call_metrics),
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "max": latencies[-1]
+        }
+        
+        first_tokens = sorted(m["first_token"] for m in self.call_metrics if m["ok"] and m["first_token"] is not None)
+        if first_tokens:
+            summary["first_token_p50"] = first_tokens[min(len(first_tokens) - 1, len(first_tokens) // 2)]
+        return summary
@@ -1,57 +1,377 @@
 """
 Generate SOAP notes using local LLM.
 """
-from transformers import AutoModelForCausalLM, AutoTokenizer
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from transformers import DynamicCache, TextStreamer
 import torch
+from .prompt_builder import PromptBuilder, tokenizer_counter
+from ..backends import get_backend
+from ..storage.llm_cache import LLMResponseCache
 from ..utils.logger import get_logger
+from ..utils.memory import record_model_load, rss_bytes
+from ..utils.metrics import STAGE_SECONDS
+from ..utils.tracing import span
 
 logger = get_logger(__name__)
 
+class TokenStreamer(TextStreamer):
+    """Streams decoded text to a callback and times the generated tokens."""
+    
+    def __init__(self, tokenizer, on_text=None):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.on_text = on_text
+        self.started = time.perf_counter()
+        self.first_token = None
+        self.tokens = 0
+        
+    def put(self, value):
+        # The first call carries the prompt, which is not output
+        if not self.next_tokens_are_prompt:
+            if self.first_token is None:
+                self.first_token = time.perf_counter() - self.started
+            self.tokens += value.numel()
+        super().put(value)
+        
+    def on_finalized_text(self, text, stream_end=False):
+        if text and self.on_text is not None:
+            self.on_text(text)
+
+class ForwardCounter:
+    """Counts and times forward passes of a model, and their input lengths, while active."""
+    
+    def __init__(self, model):
+        self.model = model
+        self.times = []
+        self.input_lengths = []
+        self._started = None
+        self._handles = []
+        
+    def __enter__(self):
+        if self.model is not None:
+            self._handles = [
+                self.model.register_forward_pre_hook(self._before, with_kwargs=True),
+                self.model.register_forward_hook(self._after)
+            ]
+        return self
+        
+    def __exit__(self, exc_type, exc, tb):
+        for handle in self._handles:
+            handle.remove()
+        self._handles = []
+        
+    def _before(self, module, args, kwargs):
+        input_ids = kwargs.get("input_ids", args[0] if args else None)
+        self.input_lengths.append(input_ids.shape[1] if input_ids is not None else 0)
+        self._started = time.perf_counter()
+        
+    def _after(self, module, args, output):
+        self.times.append(time.perf_counter() - self._started)
+        
+    @property
+    def calls(self):
+        return len(self.times)
+        
+    def total_time(self, skip=0):
+        return sum(self.times[skip:])
+        
+    def mean_time(self, skip=0):
+        times = self.times[skip:]
+        return sum(times) / len(times) if times else 0.0
+
 class LLMGenerator:
     def __init__(self, config):
+        self.config = config
         self.model_path = config.get('LLAMA_MODEL_PATH')
         self.model = None
         self.tokenizer = None
+        self.prompt_builder = None
+        self.response_cache = LLMResponseCache(config)
+        self.backend = get_backend(config)
+        self.device = self._select_device(config.get('LLM_DEVICE') or 'auto')
+        self.dtype = self._select_dtype(config.get('LLM_DTYPE') or 'auto', self.device)
+        self.last_stats = {}
+        # Past key/values of each template's static prompt prefix, most recently used last
+        self.prefix_cache = OrderedDict()
+        self.prefix_cache_size = int(config.get('LLM_PREFIX_CACHE_SIZE', 4) or 0)
+        self.draft_model_path = config.get('LLM_DRAFT_MODEL_PATH')
+        self.draft_lookahead = int(config.get('LLM_DRAFT_LOOKAHEAD') or 5)
+        self.draft_model = None
+        self._prefix_lock = threading.Lock()
         self.initialize_model()
         
+    @staticmethod
+    def _select_device(requested):
+        """Resolve the configured device, falling back to CPU."""
+        if requested != 'auto':
+            return requested
+        if torch.cuda.is_available():
+            return 'cuda'
+        if getattr(torch.backends, 'mps', None) is not None and torch.backends.mps.is_available():
+            return 'mps'
+        return 'cpu'
+        
+    @staticmethod
+    def _select_dtype(requested, device):
+        """Resolve the configured weight precision for a device."""
+        if requested != 'auto':
+            return requested
+        if device == 'cuda':
+            return 'bf16' if torch.cuda.is_bf16_supported() else 'fp16'
+        if device == 'mps':
+            return 'fp16'
+        # Half precision matmuls are slow on most CPUs without AMX/AVX512-BF16
+        return 'fp32'
+        
     def initialize_model(self):
         """Initialize the LLM model."""
         try:
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
-            self.model = AutoModelForCausalLM.from_pretrained(
-                self.model_path,
-                torch_dtype=torch.float16,
-                device_map="auto"
-            )
-            logger.info("LLM model initialized successfully")
+            if self.device == 'cpu' and self.config.get('LLM_THREADS'):
+                torch.set_num_threads(int(self.config.get('LLM_THREADS')))
+                
+            self.tokenizer = self.backend.load_tokenizer(self.model_path)
+            self.model = self._load_model(self.model_path)
+            
+            if self.draft_model_path:
+                # The draft proposes a fixed number of tokens per step for the main model to verify
+                self.draft_model = self._load_model(self.draft_model_path)
+                self.draft_model.generation_config.num_assistant_tokens = self.draft_lookahead
+                self.draft_model.generation_config.num_assistant_tokens_schedule = "constant"
+                logger.info(f"Assisted decoding enabled with draft model {self.draft_model_path}")
+                
+            # Budget prompts with the model's own tokenizer and context window
+            self.prompt_builder = PromptBuilder(self.config, tokenizer_counter(self.tokenizer))
+            if not self.config.get('LLM_CONTEXT_TOKENS'):
+                self.prompt_builder.context_tokens = getattr(
+                    self.model.config, "max_position_embeddings", self.prompt_builder.context_tokens
+                )
+            logger.info(f"LLM model initialized successfully on {self.device} ({self.dtype})")
         except Exception as e:
             logger.error(f"Error initializing LLM: {str(e)}")
             raise
             
-    def generate_soap_note(self, template, keywords):
-        """Generate SOAP note based on template and keywords."""
-        try:
-            prompt = self._create_prompt(template, keywords)
-            inputs = self.tokenizer(prompt, return_tensors="pt").to("cuda")
+    def _load_model(self, model_path):
+        """Load a causal LM with the configured device and precision."""
+        rss_before = rss_bytes()
+        with span("llm.load_model", model=str(model_path), device=self.device, dtype=self.dtype,
+                  backend=self.backend.name):
+            model = self.backend.load_causal_lm(model_path, self.device, self.dtype)
+        record_model_load(f"llm:{Path(str(model_path)).name}", model, rss_before)
+        return model
+        
+    def generate_soap_note(self, template, keywords, transcription=None, on_token=None):
+        """
+        Generate SOAP note based on template, keywords and, if given, the transcript.
+        
+        Args:
+            template: The matched template (dict or text)
+            keywords (list): Keyword strings or keyword dicts
+            transcription (str, optional): The transcript to draw details from
+            on_token (callable, optional): Called with each piece of decoded text as it is generated
             
-            outputs = self.model.generate(
-                **inputs,
-                max_length=512,
-                temperature=0.7,
-                num_return_sequences=1
-            )
+        Returns:
+            str: The generated SOAP note
+        """
+        try:
+            prompt = self._create_prompt(template, keywords, transcription)
+            # max_new_tokens reserves the output budget regardless of prompt length; decoding is greedy
+            params = self.generation_params()
+            cache_key = self._response_cache_key(prompt, params)
+            if cache_key is not None:
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    logger.info("Returning SOAP note from LLM response cache")
+                    self.last_stats = {"cached": True}
+                    if on_token is not None:
+                        on_token(cached)
+                    return cached
+                    
+            with span("llm.tokenize"):
+                input_ids, past_key_values, prefix_tokens = self._prepare_inputs(template, prompt)
+            streamer = TokenStreamer(self.tokenizer, on_token)
             
-            return self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+            extra = {}
+            if self.draft_model is not None:
+                # Greedy verification keeps the output identical to the main model's own
+                extra["assistant_model"] = self.draft_model
+                
+            with torch.inference_mode(), ForwardCounter(self.model) as target, ForwardCounter(self.draft_model) as draft, \
+                    span("llm.generate", prompt_tokens=input_ids.shape[1], prefix_cached_tokens=prefix_tokens) as traced:
+                outputs = self.model.generate(
+                    input_ids=input_ids,
+                    attention_mask=torch.ones_like(input_ids),
+                    past_key_values=past_key_values,
+                    **params,
+                    **extra,
+                    num_return_sequences=1,
+                    pad_token_id=self.tokenizer.pad_token_id or self.tokenizer.eos_token_id,
+                    streamer=streamer
+                )
+                if traced is not None:
+                    traced.set(new_tokens=streamer.tokens)
+                    
+            # Decode only the generated continuation, not the echoed prompt
+            prompt_tokens = input_ids.shape[1]
+            soap_note = self.tokenizer.decode(outputs[0][prompt_tokens:], skip_special_tokens=True)
+            self._record_stats(streamer, prompt_tokens)
+            self.last_stats["prefix_cached_tokens"] = prefix_tokens
+            if self.draft_model is not None:
+                self._record_draft_stats(streamer.tokens, prompt_tokens, target, draft)
+                
+            if cache_key is not None:
+                self.response_cache.put(cache_key, soap_note)
+            return soap_note
         except Exception as e:
             logger.error(f"SOAP note generation error: {str(e)}")
             raise
             
-    def _create_prompt(self, template, keywords):
-        """Create a prompt for the LLM."""
+    def generation_params(self):
+        """Decoding parameters; also part of the response cache key."""
+        return {"max_new_tokens": self.prompt_builder.output_tokens, "do_sample": False}
+        
+    def _response_cache_key(self, prompt, params):
+        """Response cache key for a prompt, or None when the call may not be cached."""
+        if not self.response_cache.is_cacheable(params):
+            return None
+        return LLMResponseCache.make_key(prompt, self.model_path, params)
+        
+    def _prepare_inputs(self, template, prompt):
+        """Tokenize a prompt, resuming from the cached state of its template prefix when possible."""
+        prefix = self._prompt_prefix(template)
+        # Assisted decoding keeps its own caches for both models, so it starts from the full prompt
+        if not self.prefix_cache_size or self.draft_model is not None or not prompt.startswith(prefix):
+            input_ids = self.tokenizer(prompt, return_tensors="pt").input_ids.to(self.model.device)
+            return input_ids, None, 0
+            
+        # Prefix and suffix are tokenized separately so the prefix tokens are the same every time
+        prefix_ids, prefix_kv = self._prefix_state(template, prefix)
+        suffix_ids = self.tokenizer(
+            prompt[len(prefix):], add_special_tokens=False, return_tensors="pt"
+        ).input_ids.to(self.model.device)
+        input_ids = torch.cat([prefix_ids, suffix_ids], dim=1)
+        # generate() extends the cache in place, so every call works on its own copy
+        return input_ids, copy.deepcopy(prefix_kv), prefix_ids.shape[1]
+        
+    def _prefix_state(self, template, prefix):
+        """Return (prefix token ids, past key/values) for a template prefix, computing it on a miss."""
+        template_id = template.get('id') if isinstance(template, dict) else None
+        key = (template_id, self.model_path, hashlib.sha256(prefix.encode('utf-8')).hexdigest())
+        
+        with self._prefix_lock:
+            if key in self.prefix_cache:
+                self.prefix_cache.move_to_end(key)
+                return self.prefix_cache[key]
+                
+            prefix_ids = self.tokenizer(prefix, return_tensors="pt").input_ids.to(self.model.device)
+            with torch.inference_mode():
+                prefix_kv = self.model(
+                    input_ids=prefix_ids, past_key_values=DynamicCache(), use_cache=True
+                ).past_key_values
+                
+            self.prefix_cache[key] = (prefix_ids, prefix_kv)
+            while len(self.prefix_cache) > self.prefix_cache_size:
+                self.prefix_cache.popitem(last=False)
+            logger.info(f"Cached {prefix_ids.shape[1]}-token prompt prefix for template {template_id or 'unknown'}")
+            return self.prefix_cache[key]
+            
+    def _record_draft_stats(self, new_tokens, prompt_tokens, target, draft):
+        """Acceptance rate and speedup of assisted decoding for the last generation."""
+        # Every target pass verifies a block of draft tokens: the first one follows the prompt,
+        # later ones follow the token the target produced itself in the previous pass
+        proposed = sum(
+            max(length - (prompt_tokens if index == 0 else 1), 0) for index, length in enumerate(target.input_lengths)
+        )
+        # Each pass keeps the draft tokens it accepted plus one token of its own
+        passes = max(target.calls, 1)
+        accepted = max(new_tokens - target.calls, 0)
+        # One-token-at-a-time decoding would need a pass per token after the prompt pass
+        prompt_pass = target.times[0] if target.times else 0.0
+        baseline = prompt_pass + max(new_tokens - 1, 0) * target.mean_time(skip=1)
+        actual = target.total_time() + draft.total_time()
+        
+        self.last_stats.update({
+            "draft_proposed": proposed,
+            "draft_accepted": accepted,
+            "acceptance_rate": accepted / proposed if proposed else 0.0,
+            "target_passes": target.calls,
+            "draft_passes": draft.calls,
+            "tokens_per_target_pass": new_tokens / passes,
+            "estimated_speedup": baseline / actual if actual > 0 else 0.0
+        })
+        logger.info(
+            f"Assisted decoding: {self.last_stats['acceptance_rate']:.0%} of draft tokens accepted, "
+            f"{self.last_stats['tokens_per_target_pass']:.2f} tokens per target pass, "
+            f"~{self.last_stats['estimated_speedup']:.2f}x"
+        )
+        
+    def _record_stats(self, streamer, prompt_tokens):
+        """Keep timing for the last generation."""
+        total = time.perf_counter() - streamer.started
+        first_token = streamer.first_token or total
+        decode_time = total - first_token
+        STAGE_SECONDS.observe(total, component="llm", stage="generate")
+        STAGE_SECONDS.observe(first_token, component="llm", stage="first_token")
+        self.last_stats = {
+            "cached": False,
+            "device": self.device,
+            "dtype": self.dtype,
+            "prompt_tokens": prompt_tokens,
+            "new_tokens": streamer.tokens,
+            "time_to_first_token": first_token,
+            "total_time": total,
+            # Decode rate excludes the prompt pass that produced the first token
+            "tokens_per_second": (streamer.tokens - 1) / decode_time if streamer.tokens > 1 and decode_time > 0 else 0.0
+        }
+        logger.info(
+            f"Generated {streamer.tokens} tokens: first token {first_token:.2f}s, "
+            f"{self.last_stats['tokens_per_second']:.1f} tokens/s"
+        )
+        
+    @staticmethod
+    def _keyword_texts(keywords):
+        """Keyword strings for the prompt, whether keywords are strings or extractor dicts."""
+        texts = []
+        for keyword in keywords or []:
+            if isinstance(keyword, dict):
+                text = keyword.get('text', '')
+                label = keyword.get('label')
+                texts.append(f"{text} ({label})" if label else text)
+            else:
+                texts.append(str(keyword))
+        return texts
+        
+    @staticmethod
+    def _prompt_prefix(template):
+        """The part of the prompt that only depends on the template, ending on a line break."""
         return f"""Generate a medical SOAP note based on the following template:
         {template}
         
         Using these medical keywords:
-        {', '.join(keywords)}
-        
+"""
+
+    def _create_prompt(self, template, keywords, transcription=None):
+        """Create a prompt for the LLM that fits the model's context window."""
+        def render(transcript_text, keywords_text):
+            prompt = self._prompt_prefix(template) + f"""        {keywords_text}
+        """
+            if transcription:
+                prompt += f"""
+        From this conversation transcript ([...] marks omitted, less relevant conversation):
+        {transcript_text}
+        """
+            return prompt + """
         SOAP Note:"""
+        
+        if isinstance(template, dict):
+            template_text = " ".join(str(v) for v in template.get('template', template).values())
+        else:
+            template_text = str(template)
+        prompt, report = self.prompt_builder.build(
+            render, transcription or "", self._keyword_texts(keywords), template_text
+        )
+        logger.debug(f"SOAP prompt uses {report['prompt_tokens']} of {report['context_tokens']} tokens")
+        return prompt
@@ -0,0 +1,171 @@
+"""
+Local stub of an OpenAI-compatible chat completion server for tests and benchmarks.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+PLACEHOLDER = re.compile(r"\[([A-Z0-9_]+)\]")
+
+# Streamed responses are sent a word at a time, keeping the whitespace that follows it
+STREAM_PIECE = re.compile(r"\s*\S+\s*")
+
+def default_response(messages):
+    """Echo the template sections found in the prompt back as a SOAP note."""
+    prompt = messages[-1].get("content", "") if messages else ""
+    sections = re.findall(r"^(SUBJECTIVE|OBJECTIVE|ASSESSMENT|PLAN): (.*)$", prompt, re.MULTILINE)
+    if not sections:
+        sections = [(name, "Stub content.") for name in ("SUBJECTIVE", "OBJECTIVE", "ASSESSMENT", "PLAN")]
+        
+    notes = []
+    for name, body in sections:
+        body = PLACEHOLDER.sub(lambda m: m.group(1).lower().replace("_", " "), body)
+        notes.append(f"{name}:\n{body}")
+    return "\n\n".join(notes)
+
+class StubLLMServer:
+    def __init__(self, host='127.0.0.1', port=0, response_fn=None, latency=0.0, fail_first=0, token_delay=0.0):
+        self.host = host
+        self.port = port
+        self.response_fn = response_fn or default_response
+        self.latency = latency
+        self.token_delay = token_delay
+        self.fail_first = fail_first
+        self.request_count = 0
+        self._server = None
+        self._thread = None
+        self._lock = threading.Lock()
+        
+    @property
+    def url(self):
+        """Base URL to use as LLM_BASE_URL."""
+        return f"http://{self.host}:{self.port}/v1"
+        
+    def start(self):
+        """Start serving on a background thread."""
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                    
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                
+                with stub._lock:
+                    stub.request_count += 1
+                    failing = stub.request_count <= stub.fail_first
+                    
+                if stub.latency:
+                    time.sleep(stub.latency)
+                    
+                if failing:
+                    self._send_json(500, {"error": {"message": "stub failure", "type": "server_error"}})
+                    return
+                    
+                content = stub.response_fn(body.get("messages", []))
+                if body.get("stream"):
+                    self._send_stream(body, content)
+                    return
+                    
+                self._send_json(200, {
+                    "id": f"stub-{stub.request_count}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "stub"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": {
+                        "prompt_tokens": sum(len(m.get("content", "").split()) for m in body.get("messages", [])),
+                        "completion_tokens": len(content.split()),
+                        "total_tokens": 0
+                    }
+                })
+                
+            def _send_json(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                
+            def _send_stream(self, body, content):
+                # Server-sent events in the chat.completion.chunk format; the connection closes at the end
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                
+                def chunk(delta, finish_reason=None):
+                    return {
+                        "id": f"stub-{stub.request_count}",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "stub"),
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                    }
+                    
+                events = [chunk({"role": "assistant", "content": ""})]
+                events += [chunk({"content": piece}) for piece in STREAM_PIECE.findall(content)]
+                events.append(chunk({}, "stop"))
+                for event in events:
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    if stub.token_delay:
+                        time.sleep(stub.token_delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+                
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+                
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="llm-stub", daemon=True)
+        self._thread.start()
+        logger.info(f"Stub LLM server listening on {self.url}")
+        return self
+        
+    def stop(self):
+        """Stop the server."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            
+    def __enter__(self):
+        return self.start()
+        
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+def main():
+    """Run the stub server from the command line."""
+    parser = argparse.ArgumentParser(description="Stub OpenAI-compatible chat server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each response")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed words")
+    args = parser.parse_args()
+    
+    server = StubLLMServer(args.host, args.port, latency=args.latency, token_delay=args.token_delay).start()
+    print(f"Serving stub chat completions at {server.url} (Ctrl+C to stop)")
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Medication extraction using a drug-name lexicon trie and a dose/route/frequency grammar.
+"""
+import re
+import threading
+from pathlib import Path
+from .vitals import NUM, parse_number
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+# Attributes that may follow a drug name ("sumatriptan 50 mg by mouth as needed")
+ATTRIBUTE_PATTERN = re.compile(
+    rf"""
+    [\s,;:()-]*(?:(?:of|at|a|an|the|take|taking|by|with|and|then|to)\b[\s,;:()-]*)*
+    (?:
+        (?P<dose>{NUM})\s*(?P<unit>milligrams?|mg|micrograms?|mcg|µg|grams?|g|milliliters?|ml|units?|iu|
+            puffs?|tablets?|tabs?|capsules?|caps?|drops?|sprays?|%)(?![^\W_])
+      | (?P<route>by\s+mouth|orally|oral|po|intravenous(?:ly)?|iv|intramuscular(?:ly)?|im|sub-?q|
+            subcutaneous(?:ly)?|topical(?:ly)?|inhaled|nebulized|sublingual(?:ly)?|rectal(?:ly)?|
+            transdermal|intranasal(?:ly)?|nasal\s+spray)\b
+      | (?P<frequency>(?:once|twice|three\s+times|four\s+times)\s+(?:a|per)\s+day|(?:once\s+|twice\s+)?daily|
+            nightly|at\s+bedtime|every\s+(?:morning|night|evening)|every\s+(?:{NUM}\s+)?(?:hours?|days?|weeks?)|
+            q\s?{NUM}\s?h(?:ours?)?|qhs|qd|q\.?d\.?|b\.?i\.?d\.?|t\.?i\.?d\.?|q\.?i\.?d\.?|
+            as\s+needed|prn|weekly|monthly)(?![^\W_])
+    )
+    """,
+    re.IGNORECASE | re.VERBOSE
+)
+
+# Cues that a drug is mentioned as an allergy, a stopped drug or one the patient is not taking.
+# A cue only covers the drug phrase right after it ("allergic to penicillin and sulfa"); plan cues reset it
+# ("stop aspirin, start ibuprofen"), and negated allergy statements ("NKDA", "no known allergies") are not cues.
+STATUS_CUES = [
+    ("negated", r"nkda|nka|no\s+(?:known\s+)?(?:drug\s+|medication\s+)?allerg(?:y|ies)|not\s+allergic|"
+                r"den(?:y|ies|ied)\s+(?:any\s+)?(?:known\s+)?(?:drug\s+)?allerg(?:y|ies)"),
+    ("allergy", r"allerg(?:y|ies|ic)|anaphyla\w*|intoleran(?:t|ce)|reactions?\s+to|hives\s+(?:with|from)"),
+    ("stopped", r"stop(?:s|ped|ping)?|discontinu\w*|d/c|quit|no\s+longer|came\s+off|taken\s+off|took\s+(?:her|him|them)\s+off|held|hold(?:ing)?"),
+    ("denied", r"den(?:y|ies|ied)|not\s+(?:taking|on|using)|never\s+(?:taken|took|used)|doesn'?t\s+take|does\s+not\s+take"),
+    ("active", r"prescrib\w*|start(?:s|ed|ing)?|begin|began|continu(?:e|es|ed|ing)|resum\w*|restart\w*|recommend\w*|tak(?:e|es|ing)|us(?:e|es|ing)|try|trial\s+of|add(?:ed|ing)?|increase\w*|decrease\w*|refill\w*"),
+]
+# Inactive cues swallow a following "taking" so it does not count as a newer active cue ("stopped taking")
+_verb = r"(?:\s+(?:taking|using|the|her|his|their|any))*"
+STATUS_PATTERN = re.compile(
+    "|".join(
+        rf"\b(?P<{status}>(?:{cues}){_verb if status != 'active' else ''})\b" for status, cues in STATUS_CUES
+    ),
+    re.IGNORECASE
+)
+# What may lie between a cue and the drug it covers, besides earlier drugs of the same list
+CUE_GAP = re.compile(
+    r"(?:[\s,:/()-]|\b(?:and|or|nor|to|of|with|from|the|a|an|her|his|their|any|all|both|either|also|"
+    r"including|like|such\s+as|medications?|drugs?|meds)\b)*",
+    re.IGNORECASE
+)
+# Cues that follow the drug name ("penicillin allergy", "aspirin was stopped")
+TRAILING_STATUS_PATTERN = re.compile(
+    r"^\s*(?:(?P<allergy>allerg(?:y|ies|ic)|causes?\s+(?:a\s+)?(?:rash|hives|anaphylaxis))"
+    r"|(?:was|were|has\s+been|have\s+been|is|got)\s+(?:(?P<stopped>stopped|discontinued|held)))\b",
+    re.IGNORECASE
+)
+# Clause boundaries a status cue does not reach across
+CLAUSE_BREAK = re.compile(r"[.;!?\n]|\bbut\b|\bhowever\b", re.IGNORECASE)
+TRAILING_WINDOW = 40
+
+# Statuses of mentions that must never be listed as current or planned medications
+INACTIVE = ("allergy", "stopped", "denied")
+
+# How far past a drug name attributes are looked for
+ATTRIBUTE_WINDOW = 80
+MAX_ATTRIBUTES = 6
+
+UNIT_NAMES = {
+    "milligram": "mg", "milligrams": "mg", "microgram": "mcg", "micrograms": "mcg", "µg": "mcg",
+    "gram": "g", "grams": "g", "milliliter": "ml", "milliliters": "ml", "unit": "units",
+    "tab": "tablet", "tabs": "tablets", "cap": "capsule", "caps": "capsules"
+}
+
+ROUTE_NAMES = {
+    "orally": "by mouth", "oral": "by mouth", "po": "by mouth", "iv": "IV", "intravenous": "IV",
+    "intravenously": "IV", "im": "IM", "intramuscular": "IM", "intramuscularly": "IM",
+    "subq": "subcutaneous", "sub-q": "subcutaneous", "subcutaneously": "subcutaneous",
+    "topically": "topical", "sublingually": "sublingual", "rectally": "rectal", "intranasally": "intranasal"
+}
+
+FREQUENCY_NAMES = {
+    "qd": "once daily", "daily": "once daily", "once daily": "once daily", "once a day": "once daily",
+    "once per day": "once daily", "bid": "twice daily", "twice a day": "twice daily",
+    "twice per day": "twice daily", "tid": "three times daily", "three times a day": "three times daily",
+    "qid": "four times daily", "four times a day": "four times daily", "qhs": "at bedtime",
+    "nightly": "at bedtime", "prn": "as needed"
+}
+
+_lexicons = {}
+_lexicons_lock = threading.Lock()
+
+def get_medication_lexicon(lexicon_path='data/medications.txt'):
+    """Return the shared lexicon trie for a lexicon file."""
+    key = str(Path(lexicon_path).resolve())
+    with _lexicons_lock:
+        if key not in _lexicons:
+            _lexicons[key] = MedicationLexicon.from_file(lexicon_path)
+        return _lexicons[key]
+
+class MedicationLexicon:
+    # Trie nodes are dicts keyed by token; the terminal entry holds the display name
+    TERMINAL = None
+    
+    def __init__(self, names=()):
+        self.root = {}
+        self.size = 0
+        self.max_depth = 0
+        for name in names:
+            self.add(name)
+            
+    @classmethod
+    def from_file(cls, lexicon_path):
+        """Load one drug name per line, ignoring blanks and # comments."""
+        lexicon = cls()
+        try:
+            with open(lexicon_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    name = line.strip()
+                    if name and not name.startswith("#"):
+                        lexicon.add(name)
+            logger.info(f"Loaded {lexicon.size} medication names from {lexicon_path}")
+        except Exception as e:
+            logger.error(f"Error loading medication lexicon: {str(e)}")
+        return lexicon
+        
+    def add(self, name):
+        """Insert a drug name into the trie."""
+        tokens = [t.casefold() for t in TOKEN_PATTERN.findall(name)]
+        if not tokens:
+            return
+            
+        node = self.root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        if self.TERMINAL not in node:
+            self.size += 1
+        node[self.TERMINAL] = name
+        self.max_depth = max(self.max_depth, len(tokens))
+        
+    def find(self, tokens):
+        """Yield (first_token, last_token, name) for the longest name match at each position."""
+        i = 0
+        count = len(tokens)
+        while i < count:
+            node = self.root
+            best = None
+            j = i
+            while j < count and j - i < self.max_depth:
+                node = node.get(tokens[j][0])
+                if node is None:
+                    break
+                if self.TERMINAL in node:
+                    best = (j, node[self.TERMINAL])
+                j += 1
+                
+            if best is None:
+                i += 1
+            else:
+                yield i, best[0], best[1]
+                i = best[0] + 1
+
+class MedicationExtractor:
+    def __init__(self, lexicon):
+        self.lexicon = lexicon
+        
+    def extract(self, text):
+        """
+        Find medications with their dose, unit, route and frequency, in order of first mention.
+        
+        Each medication also has a status: "allergy", "stopped", "denied" or "active". An allergy
+        mention anywhere wins; otherwise the last mention decides ("stopped ... restarted").
+        """
+        if not text or not self.lexicon.size:
+            return []
+            
+        tokens = [(m.group().casefold(), m.start(), m.end()) for m in TOKEN_PATTERN.finditer(text)]
+        mentions = list(self.lexicon.find(tokens))
+        
+        medications = {}
+        spans = []
+        for index, (first, last, name) in enumerate(mentions):
+            start, end = tokens[first][1], tokens[last][2]
+            
+            # Attributes never reach past the next drug name
+            limit = min(end + ATTRIBUTE_WINDOW, len(text))
+            if index + 1 < len(mentions):
+                limit = min(limit, tokens[mentions[index + 1][0]][1])
+            attributes, attr_end = self._parse_attributes(text, end, limit)
+            
+            status = self._status(text, start, end, limit, spans)
+            spans.append((start, attr_end))
+            key = name.casefold()
+            if key not in medications:
+                medications[key] = {
+                    "name": name,
+                    "dose": None,
+                    "unit": None,
+                    "route": None,
+                    "frequency": None,
+                    "status": status,
+                    "start": start,
+                    "end": attr_end,
+                    "text": text[start:attr_end]
+                }
+                
+            # Later mentions fill in details the first one lacked
+            medication = medications[key]
+            if medication["status"] != "allergy":
+                medication["status"] = status
+            for field, value in attributes.items():
+                if medication[field] is None:
+                    medication[field] = value
+                    
+        return list(medications.values())
+        
+    @staticmethod
+    def _status(text, start, end, limit, spans=()):
+        """Classify one mention by the status cue whose drug phrase it is part of, or a cue right after it."""
+        clause_start = 0
+        for boundary in CLAUSE_BREAK.finditer(text, max(0, start - 200), start):
+            clause_start = boundary.end()
+        cue = None
+        for cue in STATUS_PATTERN.finditer(text, clause_start, start):
+            pass
+        if cue is not None and cue.lastgroup in INACTIVE and MedicationExtractor._covers(text, cue.end(), start, spans):
+            return cue.lastgroup
+            
+        trailing = TRAILING_STATUS_PATTERN.match(text[end:min(limit, end + TRAILING_WINDOW)])
+        if trailing:
+            return trailing.lastgroup
+        return "active"
+        
+    @staticmethod
+    def _covers(text, pos, start, spans):
+        """Whether only filler words and earlier listed drugs lie between a cue ending at pos and a drug at start."""
+        for span_start, span_end in spans:
+            if span_end <= pos or span_start >= start:
+                continue
+            if span_start > pos and not CUE_GAP.fullmatch(text, pos, span_start):
+                return False
+            pos = max(pos, span_end)
+        return CUE_GAP.fullmatch(text, pos, start) is not None
+        
+    @staticmethod
+    def active(medications):
+        """Medications that are current or planned, leaving out allergies, stopped and denied drugs."""
+        return [medication for medication in medications if medication.get("status") not in INACTIVE]
+        
+    def _parse_attributes(self, text, pos, limit):
+        """Apply the attribute grammar to the text following a drug name."""
+        attributes = {}
+        end = pos
+        for _ in range(MAX_ATTRIBUTES):
+            match = ATTRIBUTE_PATTERN.match(text, pos, limit)
+            if not match:
+                break
+                
+            if match.group("dose") and "dose" not in attributes:
+                unit = match.group("unit").lower()
+                attributes["dose"] = parse_number(match.group("dose"))
+                attributes["unit"] = UNIT_NAMES.get(unit, unit)
+            elif match.group("route") and "route" not in attributes:
+                route = " ".join(match.group("route").lower().split())
+                attributes["route"] = ROUTE_NAMES.get(route, route)
+            elif match.group("frequency"):
+                frequency = " ".join(match.group("frequency").lower().replace(".", "").split())
+                frequency = FREQUENCY_NAMES.get(frequency, frequency)
+                if "frequency" not in attributes:
+                    attributes["frequency"] = frequency
+                elif frequency == "as needed" and not attributes["frequency"].endswith(frequency):
+                    # "every 4 hours as needed"
+                    attributes["frequency"] += " as needed"
+                else:
+                    break
+            else:
+                break
+                
+            pos = end = match.end()
+            
+        return attributes, end
+        
+    @staticmethod
+    def format(medications):
+        """Render medications as a semicolon-separated list."""
+        rendered = []
+        for medication in medications:
+            parts = [medication["name"]]
+            if medication["dose"] is not None:
+                parts.append(f"{medication['dose']:g} {medication['unit']}")
+            if medication["route"]:
+                parts.append(medication["route"])
+            if medication["frequency"]:
+                parts.append(medication["frequency"])
+            rendered.append(" ".join(parts))
+        return "; ".join(rendered)
@@ -2,15 +2,35 @@
 NLP pipeline for processing transcribed text into SOAP notes.
 """
 import os
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from functools import partial
 from pathlib import Path
 import json
 from .keyword_extractor import KeywordExtractor
 from .template_matcher import TemplateMatcher
-from .template_filler import TemplateFiller
+from .template_filler import TemplateFiller, analyze_transcript
+from .stage_graph import Stage, StageGraph
+from .document import Document
+from .batch import BatchProcessor
+from .streaming import StreamingSession
+from .refill import RefillSession
+from ..storage.manifest import BatchManifest, file_hash
 from ..utils.logger import get_logger
+from ..utils.memory import check_budget
+from ..utils.metrics import DOCUMENTS, STAGE_SECONDS
+from ..utils.profiler import profiled
+from ..utils.tracing import current_span, encounter_span, propagate, span
 
 logger = get_logger(__name__)
 
+# Bump when a code change alters the notes the pipeline produces
+PIPELINE_VERSION = "1"
+
+# Settings that change the notes produced for the same transcript
+VERSION_CONFIG_KEYS = ('LLM_BASE_URL', 'LLM_MODEL', 'LLAMA_MODEL_PATH', 'LLM_CONTEXT_TOKENS', 'LLM_OUTPUT_TOKENS')
+
 class NLPPipeline:
     def __init__(self, config=None):
         self.config = config or {}
@@ -20,7 +40,72 @@ class NLPPipeline:
         self.output_dir = Path(self.config.get('PIPELINE_OUTPUT_DIR', 'output/pipeline'))
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
-    def process(self, transcription, patient_id=None, visit_date=None):
+        # Independent stages run concurrently; CPU-heavy ones may go to worker processes
+        self.stage_pool = ThreadPoolExecutor(
+            max_workers=int(self.config.get('PIPELINE_WORKERS') or 4), thread_name_prefix="pipeline-stage"
+        )
+        processes = int(self.config.get('PIPELINE_PROCESSES') or 0)
+        self.process_pool = ProcessPoolExecutor(max_workers=processes) if processes else None
+        # File writes run in order on one background thread, off the critical path
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pipeline-writer")
+        self.pending_writes = []
+        self._writes_lock = threading.Lock()
+        self.graph = self._build_graph()
+        self.last_timings = {}
+        self.last_batch_report = {}
+        self._version = None
+        
+    def _build_graph(self):
+        """Declare the pipeline stages and what each one consumes."""
+        if self.process_pool is not None:
+            analyze = partial(
+                analyze_transcript,
+                rules_dir=self.config.get('EXTRACTION_RULES_DIR') or 'data/rules',
+                lexicon_path=self.config.get('MEDICATION_LEXICON_PATH') or 'data/medications.txt'
+            )
+        else:
+            analyze = self.template_filler.analyze_transcript
+            
+        return StageGraph([
+            Stage("keywords", self.keyword_extractor.extract_keywords, ("transcription",), "thread"),
+            # Rule scans, vitals and medications only need the transcript
+            Stage("analyses", analyze, ("transcription",), "process"),
+            Stage("template", self.template_matcher.find_matching_template, ("keywords",), "thread"),
+            Stage("soap_note", self._fill, ("template", "transcription", "keywords", "analyses"), "thread"),
+        ])
+        
+    def _fill(self, template, transcription, keywords, analyses):
+        return self.template_filler.fill_template(template, transcription, keywords, analyses=analyses)
+        
+    def version(self):
+        """Fingerprint of the code, models, templates and rule files that produce notes."""
+        if self._version is None:
+            data_files = [
+                self.config.get('MEDICATION_LEXICON_PATH') or 'data/medications.txt',
+                self.keyword_extractor.medical_terms_path
+            ]
+            data_files += sorted(Path(self.config.get('EXTRACTION_RULES_DIR') or 'data/rules').glob('*'))
+            fingerprint = {
+                "pipeline": PIPELINE_VERSION,
+                "config": {key: self.config.get(key) for key in VERSION_CONFIG_KEYS},
+                "templates": self.template_matcher.index_version,
+                # The index version only covers template ids, names and keywords, not the text that is filled
+                "template_content": sorted(self.template_matcher.templates, key=lambda t: str(t.get("id"))),
+                "data": {str(path): file_hash(path) for path in data_files if Path(path).is_file()}
+            }
+            payload = json.dumps(fingerprint, sort_keys=True, ensure_ascii=False)
+            self._version = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+        return self._version
+        
+    def run_stages(self, transcription, thread_pool=None, process_pool=None):
+        """Run the stage graph for one transcript; returns (results by stage, stage timings)."""
+        # Every stage reads the same analyzed document, so each pass over the text runs once
+        document = Document.of(transcription)
+        # Keywords -> template -> fill, with transcript analyses running alongside
+        return self.graph.run({"transcription": document}, thread_pool or self.stage_pool, process_pool)
+        
+    @profiled("nlp.process")
+    def process(self, transcription, patient_id=None, visit_date=None, save=True):
         """
         Process transcribed text through the NLP pipeline.
         
@@ -28,34 +113,35 @@ class NLPPipeline:
             transcription (str): The transcribed text to process
             patient_id (str, optional): Patient identifier
             visit_date (str, optional): Visit date in YYYYMMDD format
+            save (bool): Whether to write the SOAP note and pipeline output
             
         Returns:
             dict: The processed SOAP note
         """
         try:
             logger.info("Starting NLP pipeline processing")
+            check_budget("nlp.process")
             
-            # Step 1: Extract keywords
-            logger.info("Extracting keywords from transcription")
-            keywords = self.keyword_extractor.extract_keywords(transcription)
-            
-            # Step 2: Match template
-            logger.info("Matching appropriate template")
-            template = self.template_matcher.find_matching_template(keywords)
-            
-            # Step 3: Fill template
-            logger.info("Filling template with extracted information")
-            soap_note = self.template_filler.fill_template(template, transcription, keywords)
-            
-            # Step 4: Save SOAP note
-            logger.info("Saving SOAP note")
-            saved_path = self.template_filler.save_soap_note(soap_note, patient_id, visit_date)
-            
-            # Step 5: Save pipeline output for debugging/analysis
-            self._save_pipeline_output(transcription, keywords, template, soap_note, patient_id, visit_date)
-            
-            return soap_note
+            # Nested under the caller's encounter span when there is one, e.g. from run.py
+            root = span("nlp.process") if current_span() else encounter_span(patient_id, visit_date)
+            with root:
+                results, self.last_timings = self.run_stages(transcription, self.stage_pool, self.process_pool)
+                soap_note = results["soap_note"]
+                DOCUMENTS.inc(mode="single", status="ok")
+                if not save:
+                    return soap_note
+                    
+                # Save the SOAP note and the debugging output in the background
+                logger.info("Saving SOAP note")
+                self._submit_write(self.template_filler.save_soap_note, soap_note, patient_id, visit_date)
+                self._submit_write(
+                    self._save_pipeline_output, transcription, results["keywords"], results["template"],
+                    soap_note, patient_id, visit_date
+                )
+                
+                return soap_note
         except Exception as e:
+            DOCUMENTS.inc(mode="single", status="error")
             logger.error(f"Error in NLP pipeline: {str(e)}")
             # Return empty SOAP note in case of error
             return {
@@ -65,6 +151,55 @@ class NLPPipeline:
                 "plan": "Error processing transcription."
             }
             
+    def stream(self, on_update=None):
+        """
+        Start a streaming session that updates a draft note as transcript segments arrive.
+        
+        Args:
+            on_update (callable, optional): Called with each versioned partial note
+            
+        Returns:
+            StreamingSession: Feed it with add_segment() and end it with finish()
+        """
+        return StreamingSession(self, on_update, self.config)
+        
+    def refill_session(self):
+        """
+        Start a session for re-filling a note as a clinician edits its transcript.
+        
+        Returns:
+            RefillSession: Call update() with each version of the transcript
+        """
+        return RefillSession(self, self.config)
+        
+    def _submit_write(self, fn, *args):
+        """Queue a file write on the background writer."""
+        # The write's span joins the trace of the encounter that queued it
+        future = self.writer.submit(propagate(self._timed_write), fn, *args)
+        with self._writes_lock:
+            self.pending_writes.append(future)
+        return future
+        
+    @staticmethod
+    def _timed_write(fn, *args):
+        with STAGE_SECONDS.time(component="nlp", stage="save"), span("io.write", target=fn.__name__):
+            return fn(*args)
+            
+    def flush(self, timeout=None):
+        """Wait for queued file writes; returns their results in submission order."""
+        with self._writes_lock:
+            pending, self.pending_writes = self.pending_writes, []
+        wait(pending, timeout=timeout)
+        return [future.result() for future in pending if future.done()]
+        
+    def close(self):
+        """Finish queued writes and shut down the worker pools."""
+        self.flush()
+        self.writer.shutdown()
+        self.stage_pool.shutdown()
+        if self.process_pool is not None:
+            self.process_pool.shutdown()
+            
     def _save_pipeline_output(self, transcription, keywords, template, soap_note, patient_id, visit_date):
         """Save the pipeline output for debugging and analysis."""
         try:
@@ -98,13 +233,17 @@ class NLPPipeline:
         except Exception as e:
             logger.error(f"Error saving pipeline output: {str(e)}")
             
-    def batch_process(self, transcriptions_dir, output_dir=None):
+    def batch_process(self, transcriptions_dir, output_dir=None, force=False):
         """
         Process multiple transcription files in a directory.
         
+        Files already processed by the same pipeline version are skipped, and
+        failed files are retried, using the batch manifest.
+        
         Args:
             transcriptions_dir (str): Directory containing transcription files
             output_dir (str, optional): Directory to save SOAP notes
+            force (bool): Reprocess every file, ignoring the manifest
             
         Returns:
             list: Paths to generated SOAP notes
@@ -120,44 +259,36 @@ class NLPPipeline:
                 self.template_filler.output_dir = Path(output_dir)
                 self.template_filler.output_dir.mkdir(parents=True, exist_ok=True)
                 
-            # Get all text files in the directory
-            transcription_files = list(transcriptions_path.glob("*.txt"))
+            # Get all text files in the directory, in a stable order
+            transcription_files = sorted(transcriptions_path.glob("*.txt"))
             logger.info(f"Found {len(transcription_files)} transcription files to process")
             
-            soap_note_paths = []
+            # Only new, changed and previously failed files need processing
+            manifest = BatchManifest(self.config)
+            version = self.version()
+            if force:
+                pending, done = transcription_files, {}
+            else:
+                pending, done = manifest.plan(transcription_files, version, self.template_filler.output_dir)
+                
+            # Read ahead, process in parallel, write each note once in input order;
+            # each outcome is recorded as it is written so an interrupted run resumes
+            processor = BatchProcessor(self, self.config)
+            records = processor.run(
+                pending,
+                on_result=lambda record: manifest.record(
+                    record["path"], version, record["output"], record["error"], record["fingerprint"]
+                )
+            )
+            self.last_batch_report = dict(processor.last_report, skipped=len(done))
             
-            # Process each file
-            for file_path in transcription_files:
-                try:
-                    # Extract patient ID and date from filename
-                    filename = file_path.stem
-                    parts = filename.split('_')
-                    
-                    patient_id = None
-                    visit_date = None
-                    
-                    if len(parts) >= 2:
-                        patient_id = parts[0]
-                        visit_date = parts[1]
-                    
-                    # Read transcription
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        transcription = f.read()
-                        
-                    # Process transcription
-                    logger.info(f"Processing file: {file_path}")
-                    soap_note = self.process(transcription, patient_id, visit_date)
-                    
-                    # Save SOAP note
-                    saved_path = self.template_filler.save_soap_note(soap_note, patient_id, visit_date)
-                    if saved_path:
-                        soap_note_paths.append(saved_path)
-                        
-                except Exception as e:
-                    logger.error(f"Error processing file {file_path}: {str(e)}")
-                    continue
-                    
-            logger.info(f"Batch processing complete. Generated {len(soap_note_paths)} SOAP notes.")
+            outputs = dict(done)
+            outputs.update((Path(record["path"]), record["output"]) for record in records if record["output"])
+            soap_note_paths = [outputs[path] for path in transcription_files if path in outputs]
+            logger.info(
+                f"Batch processing complete. Generated {len(records) - processor.last_report['failed']} SOAP notes, "
+                f"{len(done)} unchanged."
+            )
             return soap_note_paths
         except Exception as e:
             logger.error(f"Error in batch processing: {str(e)}")
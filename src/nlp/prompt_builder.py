@@ -0,0 +1,208 @@
+"""
+Token-budgeted prompt construction with relevance-ranked transcript compression.
+"""
+import math
+import re
+from .document import Document
+from ..utils.logger import get_logger
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = get_logger(__name__)
+
+WORD_PATTERN = re.compile(r"[^\W\d_]{4,}")
+
+# Unpunctuated ASR output is cut into windows of this many words
+MAX_SENTENCE_WORDS = 60
+
+# Share of the free context the keyword list may take before the transcript
+KEYWORD_SHARE = 0.15
+
+# Words that make a sentence relevant to the placeholders a template asks for
+SECTION_CUES = {
+    "SYMPTOMS": ["pain", "ache", "hurts", "swelling", "started", "since", "worse", "better", "feel"],
+    "HISTORY": ["history", "previous", "prior", "surgery", "years ago", "diagnosed"],
+    "VITALS": ["blood pressure", "pulse", "heart rate", "temperature", "oxygen", "saturation", "weight"],
+    "EXAM": ["exam", "tender", "tenderness", "range of motion", "strength", "reflexes", "palpation", "swelling"],
+    "DIAGNOSIS": ["diagnosis", "likely", "consistent with", "suspect", "sprain", "strain", "tear"],
+    "TREATMENT": ["recommend", "prescribe", "therapy", "follow up", "rest", "ice", "brace", "injection"],
+    "MEDICATIONS": ["medication", "mg", "taking", "prescribed", "dose", "tablet"],
+    "TESTS": ["x-ray", "xray", "mri", "ct", "ultrasound", "labs", "blood work"],
+}
+SECTION_CUES["FINDINGS"] = SECTION_CUES["EXAM"]
+SECTION_CUES["O2_SAT"] = SECTION_CUES["VITALS"]
+SECTION_CUES["TIMEFRAME"] = ["follow up", "weeks", "return"]
+
+STOPWORDS = {"patient", "reports", "with", "that", "this", "from", "have", "will", "were", "been", "their", "there"}
+
+def approximate_tokens(text):
+    """Rough token count (about four characters per token) when no tokenizer is available."""
+    return math.ceil(len(text) / 4)
+
+def openai_token_counter(model):
+    """Token counter for OpenAI-compatible models, using tiktoken when installed."""
+    if tiktoken is None:
+        return approximate_tokens
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            # Local and third-party models: cl100k is a close enough estimate
+            encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"Falling back to approximate token counts: {str(e)}")
+        return approximate_tokens
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+def tokenizer_counter(tokenizer):
+    """Token counter for a Hugging Face tokenizer."""
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+
+def split_sentences(text):
+    """Split a transcript (text or Document) into sentences, windowing long unpunctuated stretches."""
+    sentences = []
+    for sentence in Document.of(text).sentence_texts():
+        words = sentence.split()
+        for i in range(0, len(words), MAX_SENTENCE_WORDS):
+            sentences.append(" ".join(words[i:i + MAX_SENTENCE_WORDS]))
+    return sentences
+
+class PromptBuilder:
+    def __init__(self, config=None, count_tokens=None):
+        self.config = config or {}
+        self.context_tokens = int(self.config.get('LLM_CONTEXT_TOKENS') or 4096)
+        self.output_tokens = int(self.config.get('LLM_OUTPUT_TOKENS') or 1000)
+        self.count_tokens = count_tokens or approximate_tokens
+        
+    def build(self, render, transcription, keywords, template_text="", system_prompt=""):
+        """
+        Render a prompt whose transcript and keywords fit the context budget.
+        
+        Args:
+            render (callable): render(transcript_text, keywords_text) -> prompt string
+            transcription (str or Document): The full transcript
+            keywords (list): Keyword strings, most important first
+            template_text (str): Template text, used to rank transcript sentences
+            system_prompt (str): System message sent alongside the prompt
+            
+        Returns:
+            tuple: (prompt, report) where report records token counts and omissions
+        """
+        available = (
+            self.context_tokens - self.output_tokens
+            - self.count_tokens(render("", "")) - self.count_tokens(system_prompt)
+        )
+        keywords = self._unique(keywords)
+        keywords_text, kept_keywords = self._fit_keywords(keywords, max(0, int(available * KEYWORD_SHARE)))
+        available -= self.count_tokens(keywords_text)
+        
+        sentences = split_sentences(transcription)
+        # A transcript that fits goes in as is, keeping speaker turns and paragraph breaks
+        transcript_text = str(transcription)
+        kept = len(sentences)
+        if self.count_tokens(transcript_text) > available:
+            transcript_text, kept = self._compress(sentences, keywords, template_text, available)
+            
+        report = {
+            "context_tokens": self.context_tokens,
+            "output_tokens": self.output_tokens,
+            "sentences": len(sentences),
+            "omitted_sentences": len(sentences) - kept,
+            "keywords": len(keywords),
+            "omitted_keywords": len(keywords) - kept_keywords
+        }
+        prompt = render(transcript_text, keywords_text)
+        report["prompt_tokens"] = self.count_tokens(prompt) + self.count_tokens(system_prompt)
+        
+        if report["omitted_sentences"] or report["omitted_keywords"]:
+            logger.warning(
+                f"Prompt compressed to fit {self.context_tokens} tokens: omitted "
+                f"{report['omitted_sentences']}/{report['sentences']} transcript sentences and "
+                f"{report['omitted_keywords']}/{report['keywords']} keywords"
+            )
+        return prompt, report
+        
+    @staticmethod
+    def _unique(keywords):
+        """Drop repeated keywords, keeping first occurrences."""
+        seen = set()
+        unique = []
+        for keyword in keywords or []:
+            folded = keyword.casefold()
+            if keyword and folded not in seen:
+                seen.add(folded)
+                unique.append(keyword)
+        return unique
+        
+    def _fit_keywords(self, keywords, budget):
+        """Keep as many keywords as fit the keyword budget."""
+        text = ", ".join(keywords)
+        if self.count_tokens(text) <= budget:
+            return text, len(keywords)
+            
+        kept = []
+        used = 0
+        for keyword in keywords:
+            cost = self.count_tokens(keyword) + 1
+            if used + cost > budget:
+                break
+            kept.append(keyword)
+            used += cost
+        return ", ".join(kept), len(kept)
+        
+    def _compress(self, sentences, keywords, template_text, budget):
+        """Keep the most relevant sentences that fit, in transcript order, marking every gap."""
+        scores = self._score(sentences, keywords, template_text)
+        costs = [self.count_tokens(sentence) + 1 for sentence in sentences]
+        # Reserve room for the omission note and gap markers
+        budget -= self.count_tokens(f"[{len(sentences)} of {len(sentences)} transcript sentences omitted]") + 1
+        
+        selected = set()
+        used = 0
+        for index in sorted(range(len(sentences)), key=lambda i: (-scores[i], i)):
+            cost = costs[index] + (2 if index - 1 not in selected else 0)
+            if used + cost <= budget:
+                selected.add(index)
+                used += cost
+                
+        pieces = []
+        for index, sentence in enumerate(sentences):
+            if index in selected:
+                pieces.append(sentence)
+            elif not pieces or pieces[-1] != "[...]":
+                pieces.append("[...]")
+        omitted = len(sentences) - len(selected)
+        pieces.append(f"[{omitted} of {len(sentences)} transcript sentences omitted]")
+        return " ".join(pieces), len(selected)
+        
+    def _score(self, sentences, keywords, template_text):
+        """Score sentences by keyword and template-section relevance."""
+        weights = {}
+        for placeholder in re.findall(r"\[([A-Z0-9_]+)\]", template_text):
+            for cue in SECTION_CUES.get(placeholder, []):
+                weights[cue] = 1.0
+        for word in WORD_PATTERN.findall(template_text.lower()):
+            if word not in STOPWORDS:
+                weights.setdefault(word, 1.0)
+        for keyword in keywords:
+            term = re.sub(r"\s*\([A-Z_]+\)$", "", keyword).casefold().strip()
+            if term:
+                weights[term] = 2.0
+                
+        if not weights:
+            return [0.0] * len(sentences)
+            
+        terms = sorted(weights, key=len, reverse=True)
+        pattern = re.compile(r"\b(?:" + "|".join(re.escape(t) for t in terms) + r")\b", re.IGNORECASE)
+        scores = []
+        for index, sentence in enumerate(sentences):
+            found = {m.casefold() for m in pattern.findall(sentence)}
+            score = sum(weights.get(term, 0.0) for term in found)
+            # Chief complaint and plan tend to open and close the visit
+            if index < 3 or index >= len(sentences) - 3:
+                score += 0.5
+            scores.append(score)
+        return scores
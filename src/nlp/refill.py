@@ -0,0 +1,141 @@
+"""
+Incremental re-fill of a SOAP note after the transcript is edited.
+"""
+import bisect
+import difflib
+import threading
+from .document import Document
+from .streaming import jaccard, keyword_set
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class RefillSession:
+    def __init__(self, pipeline, config=None):
+        self.pipeline = pipeline
+        self.config = config or {}
+        # The template match holds while the keyword set stays at least this similar
+        self.rematch_similarity = float(self.config.get('STREAM_REMATCH_JACCARD') or 0.8)
+        
+        self.document = None
+        self.keywords = []
+        self.template = None
+        self.matched_keywords = set()
+        self.note = {}
+        self.fill_state = None
+        self.last_stats = {}
+        self._lock = threading.Lock()
+        
+    def update(self, transcription):
+        """
+        Bring the note up to date with a new version of the transcript.
+        
+        Args:
+            transcription (str): The full, edited transcript
+            
+        Returns:
+            dict: The note, the sections that changed and what was recomputed
+        """
+        with self._lock:
+            document = Document.of(transcription)
+            if self.document is None:
+                stats = self._full(document)
+            else:
+                stats = self._incremental(document)
+                
+            previous = self.note
+            self._fill(document)
+            self.document = document
+            stats["changed_sections"] = [name for name, text in self.note.items() if previous.get(name) != text]
+            stats["reused_placeholders"] = self.fill_state["reused"] if self.fill_state else 0
+            self.last_stats = stats
+            logger.info(
+                f"Re-filled note: {stats['changed_sentences']} sentences changed, "
+                f"{len(stats['changed_sections'])} sections updated"
+            )
+            return {"note": dict(self.note), "template": self.template, "keywords": self.keywords, "stats": stats}
+            
+    def _full(self, document):
+        """First version: extract keywords and match a template from scratch."""
+        self.keywords = self.pipeline.keyword_extractor.extract_keywords(document)
+        self._match_template(force=True)
+        return {
+            "changed_sentences": len(document.sentences),
+            "extracted_chars": len(document.text),
+            "rematched": True
+        }
+        
+    def _incremental(self, document):
+        """Later versions: re-extract keywords only from sentences that changed."""
+        # Keywords without offsets cannot be carried over
+        if any(k.get("start") is None for k in self.keywords):
+            return self._full(document)
+            
+        old_sentences = self.document.sentences
+        new_sentences = document.sentences
+        matcher = difflib.SequenceMatcher(
+            a=self.document.sentence_texts(), b=document.sentence_texts(), autojunk=False
+        )
+        
+        # Keywords in unchanged sentences move with their sentence; the rest are re-extracted
+        moved = {}
+        regions = []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                for i, j in zip(range(i1, i2), range(j1, j2)):
+                    moved[i] = new_sentences[j].start - old_sentences[i].start
+            elif j2 > j1:
+                regions.append((new_sentences[j1].start, new_sentences[j2 - 1].end))
+                
+        keywords = []
+        starts = [sentence.start for sentence in old_sentences]
+        for keyword in self.keywords:
+            sentence = self._sentence_index(old_sentences, starts, keyword["start"], keyword["end"])
+            if sentence in moved:
+                shift = moved[sentence]
+                keywords.append(dict(keyword, start=keyword["start"] + shift, end=keyword["end"] + shift))
+        for start, end in regions:
+            for keyword in self.pipeline.keyword_extractor.extract_keywords(document.text[start:end]):
+                keywords.append(dict(keyword, start=keyword["start"] + start, end=keyword["end"] + start))
+        self.keywords = self.pipeline.keyword_extractor.order_keywords(keywords)
+        
+        rematched = self._match_template()
+        return {
+            "changed_sentences": len(new_sentences) - sum(size for _, _, size in matcher.get_matching_blocks()),
+            "extracted_chars": sum(end - start for start, end in regions),
+            "rematched": rematched
+        }
+        
+    @staticmethod
+    def _sentence_index(sentences, starts, start, end):
+        """Index of the sentence containing a span, or None if it crosses sentences."""
+        index = bisect.bisect_right(starts, start) - 1
+        if index >= 0 and end <= sentences[index].end:
+            return index
+        return None
+        
+    def _match_template(self, force=False):
+        """Re-rank templates only when the keyword set has drifted from the last match."""
+        current = keyword_set(self.keywords)
+        if not force and jaccard(current, self.matched_keywords) >= self.rematch_similarity:
+            return False
+            
+        template = self.pipeline.template_matcher.find_matching_template(self.keywords)
+        if self.template is None or template.get("id") != self.template.get("id"):
+            # Placeholder values from another template cannot be reused
+            self.fill_state = None
+        self.template = template
+        self.matched_keywords = current
+        return True
+        
+    def _fill(self, document):
+        """Recompute only the placeholders whose inputs changed."""
+        template_sections = self.template.get('template', {})
+        filler = self.pipeline.template_filler
+        if filler.use_openai:
+            # The model rewrites whole notes; unchanged prompts are served by the response cache
+            self.note = filler.fill_template(self.template, document, self.keywords)
+            return
+        self.note, self.fill_state = filler.fill_incremental(
+            template_sections, document, self.keywords, self.fill_state
+        )
@@ -0,0 +1,116 @@
+"""
+Incremental SOAP section parser for streamed LLM output.
+"""
+import re
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Alternative header names and the section they fill when the primary header is missing
+ALTERNATIVE_NAMES = {
+    "subjective": ["S", "HISTORY", "HPI"],
+    "objective": ["O", "PHYSICAL EXAM", "EXAMINATION"],
+    "assessment": ["A", "IMPRESSION", "DIAGNOSIS"],
+    "plan": ["P", "TREATMENT", "RECOMMENDATIONS"]
+}
+
+# Any "WORD:" line ends the current section, even if it is not a known header
+UNKNOWN_HEADER = re.compile(r"^[A-Z]+:")
+
+class SOAPStreamParser:
+    def __init__(self, section_names, on_section=None):
+        self.section_names = list(section_names)
+        self.on_section = on_section
+        self.sections = {name: "" for name in self.section_names}
+        self._primary = set()
+        self._buffer = ""
+        self._current = None
+        self._current_primary = False
+        self._lines = []
+        self._header = self._compile_headers()
+        
+    def _compile_headers(self):
+        """Build one header pattern covering the template's sections and their alternatives."""
+        self._header_targets = {}
+        for name in self.section_names:
+            self._header_targets[name.upper()] = (name, True)
+        for name, alternatives in ALTERNATIVE_NAMES.items():
+            if name in self.sections:
+                for alternative in alternatives:
+                    self._header_targets.setdefault(alternative, (name, False))
+                    
+        names = sorted(self._header_targets, key=len, reverse=True)
+        alternation = "|".join(re.escape(n).replace(r"\ ", r"\s+") for n in names)
+        # Markdown decoration ("## Plan", "**PLAN:**") is tolerated around the header
+        return re.compile(
+            rf"^\s*(?:#+\s*)?(?:\*\*)?\s*(?P<name>{alternation})\s*(?:\*\*)?\s*"
+            rf"(?:(?::|\*\*:)\s*(?:\*\*)?\s*(?P<rest>.*)|$)",
+            re.IGNORECASE
+        )
+        
+    def feed(self, text):
+        """Consume a chunk of streamed text; completed sections are published immediately."""
+        self._buffer += text
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            self._process_line(line)
+            
+    def close(self):
+        """Flush remaining text and return every section."""
+        if self._buffer:
+            self._process_line(self._buffer)
+            self._buffer = ""
+        self._finish_section()
+        return dict(self.sections)
+        
+    def _process_line(self, line):
+        """Advance the state machine by one line."""
+        match = self._header.match(line)
+        if match:
+            name = " ".join(match.group("name").upper().split())
+            target, primary = self._header_targets[name]
+            # "PLAN:\nPlan: rest and ice" - a repeated header opening the section is content
+            if target == self._current and not self._lines:
+                self._lines.append(line.strip())
+                return
+            self._finish_section()
+            self._current, self._current_primary = target, primary
+            rest = (match.group("rest") or "").strip()
+            if rest:
+                self._lines.append(rest)
+            return
+            
+        if UNKNOWN_HEADER.match(line):
+            self._finish_section()
+            return
+            
+        if self._current is None:
+            return
+            
+        if line.strip():
+            self._lines.append(line.strip())
+        elif self._lines:
+            # A blank line after content ends the section
+            self._finish_section()
+            
+    def _finish_section(self):
+        """Store and publish the section being read."""
+        name, lines = self._current, self._lines
+        self._current, self._lines = None, []
+        if name is None or not lines:
+            return
+            
+        # Content under the primary header wins over alternative headers
+        if self._current_primary:
+            if name in self._primary:
+                return
+            self._primary.add(name)
+        elif self.sections[name]:
+            return
+            
+        self.sections[name] = "\n".join(lines)
+        if self.on_section is not None:
+            try:
+                self.on_section(name, self.sections[name])
+            except Exception as e:
+                logger.error(f"Error in section callback: {str(e)}")
@@ -0,0 +1,107 @@
+"""
+Declarative stage graph with a scheduler that runs independent stages concurrently.
+"""
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, wait
+from ..utils.logger import get_logger
+from ..utils.memory import track_stage
+from ..utils.metrics import STAGE_ERRORS, STAGE_SECONDS
+from ..utils.tracing import current_span, propagate, record_span, span
+
+logger = get_logger(__name__)
+
+# executor is "thread" or "process"; process stages need picklable functions and inputs
+Stage = namedtuple('Stage', ['name', 'fn', 'inputs', 'executor'])
+
+def _traced_stage(name, fn, *args):
+    with span(f"nlp.{name}", executor="thread"), track_stage("nlp", name):
+        return fn(*args)
+
+class StageGraph:
+    def __init__(self, stages):
+        self.stages = {stage.name: stage for stage in stages}
+        self.order = self._topological_order()
+        
+    def _topological_order(self):
+        """Order stages so every stage follows its inputs; rejects cycles."""
+        order = []
+        state = {}
+        
+        def visit(name, path):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Stage graph has a cycle: {' -> '.join(path + [name])}")
+            state[name] = "visiting"
+            for dependency in self.stages[name].inputs:
+                if dependency in self.stages:
+                    visit(dependency, path + [name])
+            state[name] = "done"
+            order.append(name)
+            
+        for name in self.stages:
+            visit(name, [])
+        return order
+        
+    def run(self, initial, thread_pool, process_pool=None):
+        """
+        Run every stage as soon as its inputs are available.
+        
+        Args:
+            initial (dict): Values for inputs that are not produced by a stage
+            thread_pool: Executor for "thread" stages
+            process_pool: Executor for "process" stages; they fall back to threads without one
+            
+        Returns:
+            tuple: (results by name, seconds spent in each stage)
+        """
+        missing = {
+            dependency for stage in self.stages.values() for dependency in stage.inputs
+            if dependency not in self.stages and dependency not in initial
+        }
+        if missing:
+            raise ValueError(f"Stage graph inputs not provided: {', '.join(sorted(missing))}")
+            
+        results = dict(initial)
+        timings = {}
+        started = {}
+        wall_started = {}
+        parent = current_span()
+        waiting = list(self.order)
+        running = {}
+        
+        while waiting or running:
+            for name in list(waiting):
+                stage = self.stages[name]
+                if all(dependency in results for dependency in stage.inputs):
+                    waiting.remove(name)
+                    pool = process_pool if stage.executor == "process" and process_pool is not None else thread_pool
+                    started[name] = time.perf_counter()
+                    wall_started[name] = time.time()
+                    args = [results[d] for d in stage.inputs]
+                    if pool is process_pool:
+                        future = pool.submit(stage.fn, *args)
+                    else:
+                        # Thread stages open their span inside the caller's trace
+                        future = pool.submit(propagate(_traced_stage), name, stage.fn, *args)
+                    running[future] = name
+                    
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                timings[name] = time.perf_counter() - started[name]
+                STAGE_SECONDS.observe(timings[name], component="nlp", stage=name)
+                if self.stages[name].executor == "process" and process_pool is not None:
+                    # Spans opened in worker processes do not reach this trace, so time them from here
+                    record_span(f"nlp.{name}", wall_started[name], timings[name], parent, executor="process")
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    STAGE_ERRORS.inc(component="nlp", stage=name)
+                    logger.error(f"Stage '{name}' failed: {str(e)}")
+                    for pending in running:
+                        pending.cancel()
+                    raise
+                    
+        return results, timings
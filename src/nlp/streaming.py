@@ -0,0 +1,151 @@
+"""
+Streaming pipeline session that keeps a draft SOAP note current as transcript segments arrive.
+"""
+import threading
+import time
+from .document import Document
+from ..utils.logger import get_logger
+from ..utils.memory import check_budget
+
+logger = get_logger(__name__)
+
+def keyword_set(keywords):
+    """Distinct keyword texts, case-folded, for comparing keyword sets."""
+    return {str(k.get("text", "") if isinstance(k, dict) else k).casefold() for k in keywords or []}
+
+def jaccard(a, b):
+    """Jaccard similarity of two sets; two empty sets are identical."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+class StreamingSession:
+    def __init__(self, pipeline, on_update=None, config=None):
+        self.pipeline = pipeline
+        self.on_update = on_update
+        self.config = config or {}
+        # Templates are re-ranked only when the keyword set drifts below this similarity
+        self.rematch_similarity = float(self.config.get('STREAM_REMATCH_JACCARD') or 0.8)
+        
+        self.text = ""
+        self.keywords = []
+        self.template = None
+        self.matched_keywords = set()
+        self.note = {}
+        self.version = 0
+        self.finished = False
+        self.stats = {"segments": 0, "rematches": 0}
+        self._lock = threading.Lock()
+        
+    def add_segment(self, segment):
+        """
+        Add a transcript segment and refresh the draft note.
+        
+        Args:
+            segment (str): Newly transcribed text
+            
+        Returns:
+            dict: The update published for this segment, or None if no section changed
+        """
+        segment = (segment or "").strip()
+        if not segment:
+            return None
+            
+        with self._lock:
+            if self.finished:
+                raise RuntimeError("Streaming session already finished")
+            check_budget("nlp.stream")
+            
+            offset = len(self.text) + (1 if self.text else 0)
+            self.text = f"{self.text} {segment}" if self.text else segment
+            self.stats["segments"] += 1
+            
+            # Only the new segment is scanned for keywords; earlier ones keep their results
+            for keyword in self.pipeline.keyword_extractor.extract_keywords(segment):
+                if isinstance(keyword, dict) and keyword.get("start") is not None:
+                    keyword = dict(keyword, start=keyword["start"] + offset, end=keyword["end"] + offset)
+                self.keywords.append(keyword)
+                
+            self._match_template()
+            if self.template is None:
+                return None
+                
+            # Drafts use the rule-based filler; the full fill runs once, in finish()
+            document = Document(self.text)
+            draft = self.pipeline.template_filler._fill_with_rules(
+                self.template.get('template', {}), document, self.keywords
+            )
+            return self._publish(draft, final=False)
+            
+    def finish(self, patient_id=None, visit_date=None, save=True):
+        """
+        Produce the final note from the complete transcript.
+        
+        Args:
+            patient_id (str, optional): Patient identifier
+            visit_date (str, optional): Visit date in YYYYMMDD format
+            save (bool): Whether to write the SOAP note and pipeline output
+            
+        Returns:
+            dict: The final SOAP note
+        """
+        with self._lock:
+            self.finished = True
+            # The final pass sees the whole transcript, exactly as a batch run would
+            results, timings = self.pipeline.run_stages(self.text)
+            self.keywords = results["keywords"]
+            self.template = results["template"]
+            self._publish(results["soap_note"], final=True)
+            
+            if save:
+                self.pipeline._submit_write(
+                    self.pipeline.template_filler.save_soap_note, self.note, patient_id, visit_date
+                )
+                self.pipeline._submit_write(
+                    self.pipeline._save_pipeline_output, self.text, self.keywords, self.template,
+                    self.note, patient_id, visit_date
+                )
+            logger.info(
+                f"Streaming session finished after {self.stats['segments']} segments, "
+                f"{self.stats['rematches']} template matches, {self.version} versions"
+            )
+            return dict(self.note)
+            
+    def _match_template(self):
+        """Re-rank templates when the keyword set has changed materially since the last match."""
+        current = keyword_set(self.keywords)
+        if self.template is not None and jaccard(current, self.matched_keywords) >= self.rematch_similarity:
+            return
+            
+        template = self.pipeline.template_matcher.find_matching_template(self.keywords)
+        self.matched_keywords = current
+        self.stats["rematches"] += 1
+        if self.template is None or template.get("id") != self.template.get("id"):
+            logger.info(f"Streaming session matched template: {template.get('name', 'Unknown')}")
+            # A different template replaces every section
+            self.note = {}
+        self.template = template
+        
+    def _publish(self, note, final):
+        """Emit a new version carrying the sections that changed."""
+        changed = [name for name, text in note.items() if self.note.get(name) != text]
+        removed = [name for name in self.note if name not in note]
+        if not changed and not removed and not final:
+            return None
+            
+        self.note = dict(note)
+        self.version += 1
+        update = {
+            "version": self.version,
+            "final": final,
+            "template": {"id": self.template.get("id", "unknown"), "name": self.template.get("name", "Unknown Template")},
+            "changed": {name: note[name] for name in changed},
+            "note": dict(note),
+            "time": time.time()
+        }
+        if self.on_update is not None:
+            try:
+                self.on_update(update)
+            except Exception as e:
+                logger.error(f"Error in streaming update callback: {str(e)}")
+        return update
@@ -3,92 +3,266 @@ Fill SOAP templates with extracted information.
 """
 import re
 import json
+import hashlib
+from concurrent.futures import Future
+from functools import lru_cache
 from pathlib import Path
-import openai
 import os
+from .llm_client import LLMClient
+from .document import Document
+from .soap_stream import SOAPStreamParser
+from .prompt_builder import PromptBuilder, openai_token_counter
+from .extraction_rules import RuleMatches, get_rule_set
+from .vitals import VitalsParser
+from .medications import MedicationExtractor, get_medication_lexicon
+from ..storage.llm_cache import LLMResponseCache
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+SYSTEM_PROMPT = "You are a medical assistant that creates SOAP notes from doctor-patient conversations."
+
+PLACEHOLDER_PATTERN = re.compile(r"\[([A-Z0-9_]+)\]")
+
+@lru_cache(maxsize=256)
+def compile_template(template):
+    """Split a section template into literal text and placeholder names."""
+    pieces = PLACEHOLDER_PATTERN.split(template)
+    return tuple(pieces[0::2]), tuple(pieces[1::2])
+
+@lru_cache(maxsize=1024)
+def _term_pattern(term):
+    """Compiled whole-word pattern for a keyword term."""
+    return re.compile(r"\b" + re.escape(term) + r"\b", re.IGNORECASE)
+
+def source_fingerprint(value):
+    """Offset-free digest of an extractor input, so edits elsewhere in the transcript leave it unchanged."""
+    def strip(item):
+        if isinstance(item, RuleMatches):
+            return {name: [match.value for match in found] for name, found in item.matches.items()}
+        if hasattr(item, "_asdict"):
+            item = item._asdict()
+        if isinstance(item, dict):
+            return {key: strip(v) for key, v in item.items() if key not in ("start", "end")}
+        if isinstance(item, (list, tuple)):
+            return [strip(v) for v in item]
+        return item
+    return hashlib.sha256(repr(strip(value)).encode('utf-8')).hexdigest()
+
+def analyze_transcript(transcription, rules_dir='data/rules', lexicon_path='data/medications.txt'):
+    """Run every transcript analyzer; module-level so a process pool can run it."""
+    text = str(transcription)
+    return {
+        "scan": get_rule_set(rules_dir).scan(text),
+        "vitals": VitalsParser().parse(text),
+        "medications": MedicationExtractor(get_medication_lexicon(lexicon_path)).extract(text)
+    }
+
 class TemplateFiller:
+    # Placeholder -> (extractor method, inputs it consumes)
+    PLACEHOLDER_EXTRACTORS = {
+        "SYMPTOMS": ("_get_symptoms_text", ("keywords", "scan")),
+        "HISTORY": ("_extract_history", ("scan",)),
+        "FINDINGS": ("_get_findings_text", ("keywords", "transcription")),
+        "DIAGNOSIS": ("_get_diagnosis_text", ("keywords", "scan")),
+        "TREATMENT": ("_get_treatment_text", ("keywords", "scan")),
+        "VITALS": ("_extract_vitals", ("scan", "vitals")),
+        "O2_SAT": ("_extract_o2_sat", ("vitals",)),
+        "EXAM": ("_extract_exam_findings", ("scan",)),
+        "MEDICATIONS": ("_extract_medications", ("scan", "medications")),
+        "ALLERGIES": ("_extract_allergies", ("medications",)),
+        "TESTS": ("_get_tests_text", ("keywords",)),
+    }
+    
+    # Placeholders filled with fixed defaults
+    PLACEHOLDER_DEFAULTS = {
+        "TIMEFRAME": "2 weeks",  # Default follow-up time
+        "ROM": "within normal limits",  # Default range of motion
+        "NEURO_EXAM": "Neurological examination is unremarkable",  # Default neuro exam
+        "LUNG_EXAM": "Clear to auscultation bilaterally",  # Default lung exam
+        "O2_SAT": "98"  # Default oxygen saturation when none was recorded
+    }
+    
     def __init__(self, config=None):
         self.config = config or {}
         self.openai_api_key = self.config.get('OPENAI_API_KEY')
-        self.use_openai = self.openai_api_key is not None
+        self.llm_base_url = self.config.get('LLM_BASE_URL')
+        # Any OpenAI-compatible endpoint works, including a local server without a key
+        self.use_openai = self.openai_api_key is not None or self.llm_base_url is not None
+        self.llm_client = LLMClient(self.config) if self.use_openai else None
+        self.response_cache = LLMResponseCache(self.config) if self.use_openai else None
+        self.prompt_builder = None
+        if self.use_openai:
+            self.prompt_builder = PromptBuilder(self.config, openai_token_counter(self.llm_client.model))
+            # Sampling parameters for template fills; part of the response cache key
+            self.fill_params = {"temperature": 0.3, "max_tokens": self.prompt_builder.output_tokens}
         self.output_dir = Path(self.config.get('SOAP_OUTPUT_DIR', 'output/soap_notes'))
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.rules = get_rule_set(self.config.get('EXTRACTION_RULES_DIR') or 'data/rules')
+        self.vitals_parser = VitalsParser()
+        self.medication_extractor = MedicationExtractor(
+            get_medication_lexicon(self.config.get('MEDICATION_LEXICON_PATH') or 'data/medications.txt')
+        )
         
-    def fill_template(self, template, transcription, keywords):
-        """Fill the template with information from transcription and keywords."""
+        # Transcript analyses shared by extractors, computed at most once per document
+        self.analyzers = {
+            "scan": self.rules.scan,
+            "vitals": self.vitals_parser.parse,
+            "medications": self.medication_extractor.extract
+        }
+        
+    def analyze_transcript(self, transcription):
+        """Run every transcript analyzer up front, e.g. while keywords are still being extracted."""
+        document = Document.of(transcription)
+        return {source: document.analysis(source, analyzer) for source, analyzer in self.analyzers.items()}
+        
+    def fill_template(self, template, transcription, keywords, on_section=None, analyses=None):
+        """
+        Fill the template with information from transcription and keywords.
+        
+        Args:
+            template (dict): The matched template
+            transcription (str or Document): The transcribed text
+            keywords (list): Extracted keywords
+            on_section (callable, optional): Called as on_section(name, text) as soon as
+                each section is complete, before the whole note is finished
+            analyses (dict, optional): Precomputed transcript analyses from analyze_transcript
+            
+        Returns:
+            dict: The filled SOAP note
+        """
         try:
             logger.info(f"Filling template: {template.get('name', 'Unknown')}")
             
             # Extract template sections
             template_sections = template.get('template', {})
+            document = Document.of(transcription)
             
             if self.use_openai:
                 # Use OpenAI to intelligently fill the template
-                filled_template = self._fill_with_openai(template_sections, transcription, keywords)
+                filled_template = self._fill_with_openai(template_sections, document, keywords, on_section)
             else:
                 # Use rule-based approach
-                filled_template = self._fill_with_rules(template_sections, transcription, keywords)
+                filled_template = self._fill_with_rules(template_sections, document, keywords, analyses)
+                self._publish_sections(filled_template, on_section)
                 
             return filled_template
         except Exception as e:
             logger.error(f"Error filling template: {str(e)}")
             return self._create_empty_soap_note()
             
-    def _fill_with_openai(self, template_sections, transcription, keywords):
-        """Use OpenAI to intelligently fill the template."""
-        try:
-            # Set up OpenAI API
-            openai.api_key = self.openai_api_key
-            
-            # Prepare prompt
-            prompt = self._create_openai_prompt(template_sections, transcription, keywords)
-            
-            # Call OpenAI API
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a medical assistant that creates SOAP notes from doctor-patient conversations."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=1000
-            )
+    def submit_fill(self, template, transcription, keywords, on_section=None):
+        """Start filling a template without blocking; returns a Future with the SOAP note."""
+        result = Future()
+        template_sections = template.get('template', {})
+        
+        if not self.use_openai:
+            result.set_result(self.fill_template(template, transcription, keywords, on_section))
+            return result
             
-            # Extract and parse the response
-            soap_text = response.choices[0].message.content.strip()
+        parser = SOAPStreamParser(template_sections.keys(), on_section)
+        
+        def finish(pending):
+            try:
+                self._store_response(cache_key, pending.result())
+                result.set_result(parser.close())
+            except Exception as e:
+                logger.error(f"Error using OpenAI to fill template: {str(e)}")
+                result.set_result(self._fill_rules_fallback(template_sections, transcription, keywords, on_section))
+                
+        try:
+            messages = self._create_openai_messages(template_sections, transcription, keywords)
+            cache_key, cached = self._cached_response(messages)
+            if cached is not None:
+                parser.feed(cached)
+                result.set_result(parser.close())
+                return result
+            self.llm_client.submit_stream(messages, parser.feed, **self.fill_params).add_done_callback(finish)
+        except Exception as e:
+            logger.error(f"Error submitting template fill: {str(e)}")
+            result.set_result(self._fill_rules_fallback(template_sections, transcription, keywords, on_section))
             
-            # Parse the response into sections
-            filled_template = self._parse_openai_response(soap_text, template_sections)
+        return result
+        
+    def _fill_with_openai(self, template_sections, transcription, keywords, on_section=None):
+        """Use OpenAI to intelligently fill the template."""
+        try:
+            # Sections are parsed while the response streams in and published as they complete
+            parser = SOAPStreamParser(template_sections.keys(), on_section)
+            messages = self._create_openai_messages(template_sections, transcription, keywords)
+            
+            # An unchanged encounter is answered from the response cache without calling the model
+            cache_key, cached = self._cached_response(messages)
+            if cached is not None:
+                parser.feed(cached)
+                logger.info("Filled template from LLM response cache")
+                return parser.close()
+                
+            soap_text = self.llm_client.stream(messages, parser.feed, **self.fill_params)
+            self._store_response(cache_key, soap_text)
+            filled_template = parser.close()
             
             logger.info("Successfully filled template with OpenAI")
             return filled_template
         except Exception as e:
             logger.error(f"Error using OpenAI to fill template: {str(e)}")
             # Fall back to rule-based approach
-            return self._fill_with_rules(template_sections, transcription, keywords)
-            
+            return self._fill_rules_fallback(template_sections, transcription, keywords, on_section)
+            
+    def _cached_response(self, messages):
+        """Return (cache key, cached response) for a fill; the key is None when caching does not apply."""
+        if self.response_cache is None or not self.response_cache.is_cacheable(self.fill_params):
+            return None, None
+        key = LLMResponseCache.make_key(messages, self.llm_client.model, self.fill_params)
+        return key, self.response_cache.get(key)
+        
+    def _store_response(self, cache_key, soap_text):
+        """Remember a completed response for later re-processing."""
+        if cache_key is not None:
+            self.response_cache.put(cache_key, soap_text)
+            
+    def _fill_rules_fallback(self, template_sections, transcription, keywords, on_section=None):
+        """Fill with rules after an LLM failure, republishing every section."""
+        filled_template = self._fill_with_rules(template_sections, transcription, keywords)
+        self._publish_sections(filled_template, on_section)
+        return filled_template
+        
+    def _publish_sections(self, filled_template, on_section):
+        """Hand finished sections to the caller's callback."""
+        if on_section is None:
+            return
+        for section_name, text in filled_template.items():
+            try:
+                on_section(section_name, text)
+            except Exception as e:
+                logger.error(f"Error in section callback: {str(e)}")
+                
+    def _create_openai_messages(self, template_sections, transcription, keywords):
+        """Build the chat messages for a template fill."""
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": self._create_openai_prompt(template_sections, transcription, keywords)}
+        ]
+        
     def _create_openai_prompt(self, template_sections, transcription, keywords):
-        """Create a prompt for OpenAI to fill the template."""
+        """Create a prompt for OpenAI to fill the template, fitted to the context budget."""
         # Extract keywords text
-        keywords_text = ""
+        keyword_texts = []
         if keywords:
             if isinstance(keywords, list):
                 if all(isinstance(k, dict) for k in keywords):
-                    keywords_text = ", ".join([f"{k.get('text', '')} ({k.get('label', '')})" for k in keywords])
+                    keyword_texts = [f"{k.get('text', '')} ({k.get('label', '')})" for k in keywords]
                 else:
-                    keywords_text = ", ".join(keywords)
+                    keyword_texts = [str(k) for k in keywords]
             else:
-                keywords_text = str(keywords)
+                keyword_texts = [str(keywords)]
                 
-        prompt = f"""
+        def render(transcript_text, keywords_text):
+            prompt = f"""
 I need you to create a SOAP note based on the following doctor-patient conversation.
 
 CONVERSATION TRANSCRIPT:
-{transcription}
+{transcript_text}
 
 EXTRACTED MEDICAL KEYWORDS:
 {keywords_text}
@@ -96,70 +270,99 @@ EXTRACTED MEDICAL KEYWORDS:
 Please create a SOAP note with the following sections:
 """
 
-        # Add template sections to prompt
-        for section_name, section_template in template_sections.items():
-            prompt += f"\n{section_name.upper()}: {section_template}"
-            
-        prompt += """
+            # Add template sections to prompt
+            for section_name, section_template in template_sections.items():
+                prompt += f"\n{section_name.upper()}: {section_template}"
+                
+            prompt += """
 
 Replace all placeholders like [SYMPTOMS], [HISTORY], etc. with appropriate information from the conversation.
+Where the transcript shows [...], less relevant conversation was left out; do not invent it.
 Format your response as a complete SOAP note with clear section headers.
 """
-
+            return prompt
+            
+        prompt, report = self.prompt_builder.build(
+            render, Document.of(transcription), keyword_texts,
+            template_text=" ".join(template_sections.values()), system_prompt=SYSTEM_PROMPT
+        )
+        logger.debug(f"Template fill prompt uses {report['prompt_tokens']} of {report['context_tokens']} tokens")
         return prompt
         
     def _parse_openai_response(self, soap_text, template_sections):
-        """Parse the OpenAI response into a structured SOAP note."""
-        filled_template = {}
-        
-        # Initialize with empty sections
-        for section_name in template_sections.keys():
-            filled_template[section_name] = ""
-            
-        # Try to extract sections using regex
-        for section_name in template_sections.keys():
-            pattern = rf"{section_name.upper()}:?\s*(.*?)(?=\n\n|\n[A-Z]+:|\Z)"
-            match = re.search(pattern, soap_text, re.DOTALL | re.IGNORECASE)
-            if match:
-                filled_template[section_name] = match.group(1).strip()
-                
-        # If any section is empty, try alternative section names
-        alternative_names = {
-            "subjective": ["SUBJECTIVE", "S:", "HISTORY", "HPI"],
-            "objective": ["OBJECTIVE", "O:", "PHYSICAL EXAM", "EXAMINATION"],
-            "assessment": ["ASSESSMENT", "A:", "IMPRESSION", "DIAGNOSIS"],
-            "plan": ["PLAN", "P:", "TREATMENT", "RECOMMENDATIONS"]
-        }
-        
-        for section_name, alternatives in alternative_names.items():
-            if section_name in filled_template and not filled_template[section_name]:
-                for alt in alternatives:
-                    pattern = rf"{alt}:?\s*(.*?)(?=\n\n|\n[A-Z]+:|\Z)"
-                    match = re.search(pattern, soap_text, re.DOTALL | re.IGNORECASE)
-                    if match:
-                        filled_template[section_name] = match.group(1).strip()
-                        break
-                        
-        return filled_template
+        """Parse a complete OpenAI response into a structured SOAP note."""
+        parser = SOAPStreamParser(template_sections.keys())
+        parser.feed(soap_text)
+        return parser.close()
         
-    def _fill_with_rules(self, template_sections, transcription, keywords):
+    def _fill_with_rules(self, template_sections, transcription, keywords, analyses=None):
         """Use rule-based approach to fill the template."""
         filled_template = {}
-        
+        document = Document.of(transcription)
+        for source, result in (analyses or {}).items():
+            document.add(source, result)
+            
         # Extract keywords by category
         categorized_keywords = self._categorize_keywords(keywords)
         
+        # Placeholder values are computed on first use and shared across sections
+        resolved = {}
+        
         # Process each template section
         for section_name, section_template in template_sections.items():
-            filled_section = section_template
-            
-            # Replace placeholders with extracted information
-            filled_section = self._replace_placeholders(filled_section, transcription, categorized_keywords)
-            
-            filled_template[section_name] = filled_section
+            filled_template[section_name] = self._replace_placeholders(
+                section_template, document, categorized_keywords, resolved
+            )
             
         return filled_template
         
+    def fill_incremental(self, template_sections, transcription, keywords, previous=None):
+        """
+        Fill with rules, reusing placeholder values whose inputs are unchanged since the previous fill.
+        
+        Args:
+            template_sections (dict): Section templates
+            transcription (str or Document): The (edited) transcript
+            keywords (list): Extracted keywords
+            previous (dict, optional): State returned by the previous call for the same template
+            
+        Returns:
+            tuple: (filled sections, state for the next call)
+        """
+        document = Document.of(transcription)
+        categorized_keywords = self._categorize_keywords(keywords)
+        previous = previous or {"values": {}, "sources": {}}
+        
+        fingerprints = {}
+        def fingerprint(source):
+            if source not in fingerprints:
+                if source == "keywords":
+                    value = categorized_keywords
+                elif source == "transcription":
+                    value = document.text
+                else:
+                    value = self._analyze(source, document)
+                fingerprints[source] = source_fingerprint(value)
+            return fingerprints[source]
+            
+        # Placeholders whose inputs fingerprint the same keep their previous values
+        resolved = {}
+        sources = {}
+        for section_template in template_sections.values():
+            for name in compile_template(section_template)[1]:
+                inputs = self.PLACEHOLDER_EXTRACTORS.get(name, (None, ()))[1]
+                sources[name] = [fingerprint(source) for source in inputs]
+                if name in previous["values"] and previous["sources"].get(name) == sources[name]:
+                    resolved[name] = previous["values"][name]
+        reused = len(resolved)
+        
+        filled_template = {
+            section_name: self._replace_placeholders(section_template, document, categorized_keywords, resolved)
+            for section_name, section_template in template_sections.items()
+        }
+        values = {name: resolved.get(name) for name in sources}
+        return filled_template, {"values": values, "sources": sources, "reused": reused}
+        
     def _categorize_keywords(self, keywords):
         """Categorize keywords by their label."""
         categories = {
@@ -187,47 +390,63 @@ Format your response as a complete SOAP note with clear section headers.
                 else:
                     # If it's just a string, add to OTHER
                     categories["OTHER"].append(keyword)
-        
+                    
         return categories
         
-    def _replace_placeholders(self, template, transcription, categorized_keywords):
+    def _replace_placeholders(self, template, transcription, categorized_keywords, resolved=None):
         """Replace placeholders in the template with actual content."""
-        # Common placeholders and their replacements
-        replacements = {
-            "[SYMPTOMS]": self._get_symptoms_text(categorized_keywords, transcription),
-            "[HISTORY]": self._extract_history(transcription),
-            "[FINDINGS]": self._get_findings_text(categorized_keywords, transcription),
-            "[DIAGNOSIS]": self._get_diagnosis_text(categorized_keywords, transcription),
-            "[TREATMENT]": self._get_treatment_text(categorized_keywords, transcription),
-            "[VITALS]": self._extract_vitals(transcription),
-            "[EXAM]": self._extract_exam_findings(transcription),
-            "[MEDICATIONS]": self._extract_medications(transcription),
-            "[TIMEFRAME]": "2 weeks",  # Default follow-up time
-            "[ROM]": "within normal limits",  # Default range of motion
-            "[TESTS]": self._get_tests_text(categorized_keywords),
-            "[NEURO_EXAM]": "Neurological examination is unremarkable",  # Default neuro exam
-            "[LUNG_EXAM]": "Clear to auscultation bilaterally",  # Default lung exam
-            "[O2_SAT]": "98"  # Default oxygen saturation
-        }
+        if resolved is None:
+            resolved = {}
+            
+        literals, names = compile_template(template)
+        if not names:
+            return template
+            
+        # Substitute in a single pass; only placeholders present are computed
+        parts = [literals[0]]
+        for name, literal in zip(names, literals[1:]):
+            value = self._resolve_placeholder(name, transcription, categorized_keywords, resolved)
+            parts.append(f"[{name}]" if value is None else value)
+            parts.append(literal)
+            
+        return "".join(parts)
         
-        # Replace each placeholder
-        result = template
-        for placeholder, replacement in replacements.items():
-            result = result.replace(placeholder, replacement)
+    def _resolve_placeholder(self, name, transcription, categorized_keywords, resolved):
+        """Compute a placeholder value at most once per document."""
+        if name in resolved:
+            return resolved[name]
+            
+        if name in self.PLACEHOLDER_EXTRACTORS:
+            method_name, inputs = self.PLACEHOLDER_EXTRACTORS[name]
+            args = []
+            for source in inputs:
+                if source == "keywords":
+                    args.append(categorized_keywords)
+                elif source == "transcription":
+                    args.append(str(transcription))
+                else:
+                    args.append(self._analyze(source, transcription))
+            value = getattr(self, method_name)(*args)
+        elif name in self.PLACEHOLDER_DEFAULTS:
+            value = self.PLACEHOLDER_DEFAULTS[name]
+        else:
+            # Unknown placeholders are left in place
+            value = None
             
-        return result
+        resolved[name] = value
+        return value
+        
+    def _analyze(self, source, transcription):
+        """Run a transcript analyzer once per document."""
+        return Document.of(transcription).analysis(source, self.analyzers[source])
         
-    def _get_symptoms_text(self, categorized_keywords, transcription):
+    def _get_symptoms_text(self, categorized_keywords, scan):
         """Get text describing symptoms."""
         problems = categorized_keywords.get("PROBLEM", [])
         
         if not problems:
             # Try to extract symptoms from transcription
-            symptoms_pattern = r"(?:complain(?:s|ing|ed) of|(?:has|having|had) (?:a|an)|suffering from|experiencing) ([^.]*)"
-            match = re.search(symptoms_pattern, transcription, re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
-            return "unspecified symptoms"
+            return scan.first("symptoms") or "unspecified symptoms"
             
         if len(problems) == 1:
             return problems[0]
@@ -246,13 +465,16 @@ Format your response as a complete SOAP note with clear section headers.
             
         findings = []
         
+        # Check each distinct problem against the transcription once
+        present = {p for p in set(problems) if _term_pattern(p).search(transcription)} if anatomy else set()
+        mentioned = [problem for problem in problems if problem in present]
+        
         # Try to match anatomy with problems
         for part in anatomy:
             matched = False
-            for problem in problems:
-                if re.search(r"\b" + re.escape(problem) + r"\b", transcription, re.IGNORECASE):
-                    findings.append(f"{part} shows {problem}")
-                    matched = True
+            for problem in mentioned:
+                findings.append(f"{part} shows {problem}")
+                matched = True
             if not matched and part:
                 findings.append(f"{part} appears normal")
                 
@@ -260,37 +482,29 @@ Format your response as a complete SOAP note with clear section headers.
             if problems:
                 return f"evidence of {', '.join(problems)}"
             return "no significant findings"
-                
+            
         return "; ".join(findings)
         
-    def _get_diagnosis_text(self, categorized_keywords, transcription):
+    def _get_diagnosis_text(self, categorized_keywords, scan):
         """Get text describing diagnosis."""
         problems = categorized_keywords.get("PROBLEM", [])
         
         if not problems:
             # Try to extract diagnosis from transcription
-            diagnosis_pattern = r"(?:diagnos(?:is|ed|e) (?:of|as|with)|impression:?|assessment:?) ([^.]*)"
-            match = re.search(diagnosis_pattern, transcription, re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
-            return "Diagnosis pending further evaluation"
+            return scan.first("diagnosis") or "Diagnosis pending further evaluation"
             
         if len(problems) == 1:
             return problems[0]
         else:
             return f"1. {problems[0]}" + ''.join(f"\n2. {p}" for p in problems[1:])
             
-    def _get_treatment_text(self, categorized_keywords, transcription):
+    def _get_treatment_text(self, categorized_keywords, scan):
         """Get text describing treatment plan."""
         treatments = categorized_keywords.get("TREATMENT", [])
         
         if not treatments:
             # Try to extract treatment from transcription
-            treatment_pattern = r"(?:recommend(?:ed|ing)?|prescrib(?:ed|ing)?|start(?:ed|ing)?|plan:?) ([^.]*)"
-            match = re.search(treatment_pattern, transcription, re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
-            return "Supportive care and symptomatic treatment"
+            return scan.first("treatment") or "Supportive care and symptomatic treatment"
             
         if len(treatments) == 1:
             return treatments[0]
@@ -313,70 +527,61 @@ Format your response as a complete SOAP note with clear section headers.
         else:
             return f"{', '.join(tests[:-1])}, and {tests[-1]} were performed"
             
-    def _extract_history(self, transcription):
+    def _extract_history(self, scan):
         """Extract patient history from transcription."""
-        history_patterns = [
-            r"(?:past medical history|pmh):? ([^.]*)",
-            r"(?:history of|previously had|has had) ([^.]*)",
-            r"(?:patient reports|patient states|patient notes) ([^.]*)"
-        ]
+        return scan.first("history") or "no significant past medical history"
         
-        for pattern in history_patterns:
-            match = re.search(pattern, transcription, re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
-                
-        return "no significant past medical history"
-        
-    def _extract_vitals(self, transcription):
+    def _extract_vitals(self, scan, vitals):
         """Extract vital signs from transcription."""
-        vitals_pattern = r"(?:vital signs|vitals):? ([^.]*)"
-        match = re.search(vitals_pattern, transcription, re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
-            
-        # Try to extract individual vitals
-        bp_pattern = r"(?:blood pressure|bp):? (\d+/\d+)"
-        hr_pattern = r"(?:heart rate|pulse|hr):? (\d+)"
-        temp_pattern = r"(?:temperature|temp):? (\d+\.?\d*)"
-        
-        vitals = []
-        
-        bp_match = re.search(bp_pattern, transcription, re.IGNORECASE)
-        if bp_match:
-            vitals.append(f"BP {bp_match.group(1)}")
-            
-        hr_match = re.search(hr_pattern, transcription, re.IGNORECASE)
-        if hr_match:
-            vitals.append(f"HR {hr_match.group(1)}")
-            
-        temp_match = re.search(temp_pattern, transcription, re.IGNORECASE)
-        if temp_match:
-            vitals.append(f"Temp {temp_match.group(1)}°F")
-            
         if vitals:
-            return ", ".join(vitals)
+            return self.vitals_parser.format(vitals)
+            
+        # Fall back to a free-text "vital signs: ..." statement
+        stated = scan.first("vitals")
+        if stated is not None:
+            return stated
             
         return "Within normal limits"
         
-    def _extract_exam_findings(self, transcription):
+    def _extract_o2_sat(self, vitals):
+        """Get the recorded oxygen saturation."""
+        spo2 = self.vitals_parser.first_by_kind(vitals).get("spo2")
+        if spo2 is not None:
+            return str(spo2.value)
+            
+        return self.PLACEHOLDER_DEFAULTS["O2_SAT"]
+        
+    def _extract_exam_findings(self, scan):
         """Extract physical examination findings from transcription."""
-        exam_pattern = r"(?:physical exam|examination|exam findings):? ([^.]*)"
-        match = re.search(exam_pattern, transcription, re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
+        stated = scan.first("exam")
+        if stated is not None:
+            return stated
             
         return "No abnormal findings"
         
-    def _extract_medications(self, transcription):
-        """Extract medications from transcription."""
-        med_pattern = r"(?:medications?|prescrib(?:e|ed|ing)|recommend(?:ed|ing)?) ([^.]*)"
-        match = re.search(med_pattern, transcription, re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
-            
+    def _extract_medications(self, scan, medications):
+        """Extract current and planned medications; allergies, stopped and denied drugs are left out."""
+        active = self.medication_extractor.active(medications or [])
+        if active:
+            return self.medication_extractor.format(active)
+            
+        # Fall back to free text following "prescribe", "recommend" and similar, unless the
+        # lexicon found drugs that are all inactive and the free text could repeat one of them
+        if not medications:
+            stated = scan.first("medications")
+            if stated is not None:
+                return stated
+                
         return "No medications prescribed"
         
+    def _extract_allergies(self, medications):
+        """List drugs the patient is allergic to."""
+        allergies = [medication["name"] for medication in medications or [] if medication.get("status") == "allergy"]
+        if allergies:
+            return "; ".join(allergies)
+            
+        return "None recorded"
+        
     def _create_empty_soap_note(self):
         """Create an empty SOAP note structure."""
         return {
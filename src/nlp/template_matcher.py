@@ -3,12 +3,15 @@ Match appropriate SOAP templates based on extracted information.
 """
 import faiss
 import numpy as np
-import torch
 import json
 import os
+import hashlib
 from pathlib import Path
-from transformers import AutoModel, AutoTokenizer
+from ..backends import get_backend
+from ..storage.embedding_cache import EmbeddingCache
 from ..utils.logger import get_logger
+from ..utils.memory import record_model_load, rss_bytes
+from ..utils.tracing import span
 
 logger = get_logger(__name__)
 
@@ -17,6 +20,8 @@ class TemplateMatcher:
         self.config = config or {}
         self.model = None
         self.tokenizer = None
+        self.encoder = None
+        self.backend = get_backend(self.config)
         self.index = None
         self.templates = []
         self.templates_dir = Path(self.config.get('TEMPLATES_DIR', 'data/templates'))
@@ -24,23 +29,31 @@ class TemplateMatcher:
         self.vector_db_path = Path(self.config.get('VECTOR_DB_PATH', 'models/vector_db'))
         self.vector_db_path.mkdir(parents=True, exist_ok=True)
         self.embedding_dim = 768  # Default for most BERT models
+        self.model_name = "pritamdeka/S-PubMedBert-MS-MARCO"
+        self.templates_by_id = {}
+        self.index_version = None
+        self.query_cache = None
         self.initialize_model()
         self.load_templates()
         self.build_or_load_index()
+        self.initialize_query_cache()
         
     def initialize_model(self):
         """Initialize the embedding model."""
         try:
             # Use a medical/clinical BERT model for better domain-specific embeddings
-            model_name = "pritamdeka/S-PubMedBert-MS-MARCO"
+            model_name = self.model_name
             logger.info(f"Loading embedding model: {model_name}")
             
-            # Check if CUDA is available
-            device = "cuda" if torch.cuda.is_available() else "cpu"
-            logger.info(f"Using device: {device}")
+            device = self.backend.device()
+            logger.info(f"Using device: {device} ({self.backend.name} backend)")
             
-            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-            self.model = AutoModel.from_pretrained(model_name).to(device)
+            rss_before = rss_bytes()
+            with span("nlp.load_model", model=model_name, device=device, backend=self.backend.name):
+                self.encoder = self.backend.load_encoder(model_name, device)
+            self.tokenizer = self.encoder.tokenizer
+            self.model = self.encoder.model
+            record_model_load("embedding", self.encoder, rss_before)
             
             logger.info("Template matching model initialized")
         except Exception as e:
@@ -63,6 +76,7 @@ class TemplateMatcher:
                     template = json.load(f)
                     self.templates.append(template)
                     
+            self.templates_by_id = {t.get("id"): t for t in self.templates}
             logger.info(f"Loaded {len(self.templates)} templates")
         except Exception as e:
             logger.error(f"Error loading templates: {str(e)}")
@@ -113,10 +127,12 @@ class TemplateMatcher:
                 json.dump(template, f, indent=2)
                 
         logger.info(f"Created {len(sample_templates)} sample templates")
-            
+        
     def build_or_load_index(self):
         """Build or load the FAISS index for template matching."""
-        index_path = self.vector_db_path / "templates.index"
+        # Each backend embeds differently, so each keeps its own index
+        index_name = "templates.index" if self.backend.name == "hf" else f"templates.{self.backend.name}.index"
+        index_path = self.vector_db_path / index_name
         
         try:
             if index_path.exists():
@@ -136,6 +152,35 @@ class TemplateMatcher:
             # Create a new index if loading fails
             self._build_index()
             
+    def initialize_query_cache(self):
+        """Set up the query embedding memo cache for the current model and index."""
+        self.index_version = self._compute_index_version()
+        
+        cache_size = self.config.get('EMBEDDING_CACHE_SIZE')
+        cache_size = 1024 if cache_size is None else int(cache_size)
+        if cache_size <= 0:
+            logger.info("Query embedding cache disabled")
+            return
+            
+        cache_config = dict(self.config)
+        cache_config['EMBEDDING_CACHE_SIZE'] = cache_size
+        cache_config['EMBEDDING_CACHE_PATH'] = (
+            self.config.get('EMBEDDING_CACHE_PATH') or str(self.vector_db_path / "query_cache.sqlite")
+        )
+        self.query_cache = EmbeddingCache(cache_config)
+        
+    def _compute_index_version(self):
+        """Fingerprint the embedding model and indexed templates for cache keys."""
+        fingerprint = {
+            "model": self.model_name if self.backend.name == "hf" else f"{self.backend.name}:{self.model_name}",
+            "templates": [
+                [t.get("id"), t.get("name"), t.get("keywords", [])] for t in self.templates
+            ],
+            "ntotal": int(self.index.ntotal) if self.index is not None else 0
+        }
+        payload = json.dumps(fingerprint, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+        
     def _build_index(self):
         """Build a FAISS index from templates."""
         # Initialize index
@@ -169,26 +214,37 @@ class TemplateMatcher:
                 logger.warning("No templates in index, returning default template")
                 return self._get_default_template()
                 
-            # Convert keywords to text
-            if isinstance(keywords, list):
-                if all(isinstance(k, dict) for k in keywords):
-                    # Extract text from keyword objects
-                    keywords_text = " ".join([k.get("text", "") for k in keywords])
-                else:
-                    # Join string keywords
-                    keywords_text = " ".join(keywords)
+            # Normalize keywords so equivalent keyword sets share one cache entry
+            normalized = EmbeddingCache.normalize_keywords(keywords)
+            keywords_text = " ".join(normalized)
+            
+            cache_key = None
+            cached = None
+            if self.query_cache is not None:
+                cache_key = EmbeddingCache.make_key(normalized, self.index_version)
+                cached = self.query_cache.get(cache_key)
+                
+            if cached is not None:
+                # Repeat keyword sets skip the embedder entirely
+                embedding, template_id = cached
+                template = self.templates_by_id.get(template_id)
+                if template is not None:
+                    logger.info(f"Found matching template (cached): {template.get('name', 'Unknown')}")
+                    return template
             else:
-                # Use as is if already a string
-                keywords_text = keywords
+                embedding = self._get_embedding(keywords_text)
                 
-            # Get embedding and search
-            embedding = self._get_embedding(keywords_text)
+            # Search the index
             D, I = self.index.search(embedding.reshape(1, -1), 1)
             
             # Check if we got a valid result
-            if len(I) > 0 and len(I[0]) > 0 and I[0][0] < len(self.templates):
+            if len(I) > 0 and len(I[0]) > 0 and 0 <= I[0][0] < len(self.templates):
                 template = self.templates[I[0][0]]
                 logger.info(f"Found matching template: {template.get('name', 'Unknown')}")
+                
+                # Zero embeddings come from the error fallback and are not worth remembering
+                if cache_key is not None and np.any(embedding):
+                    self.query_cache.put(cache_key, embedding, template.get("id"))
                 return template
             else:
                 logger.warning("No matching template found, returning default")
@@ -200,26 +256,11 @@ class TemplateMatcher:
     def _get_embedding(self, text):
         """Get embedding for input text."""
         try:
-            # Ensure model and tokenizer are loaded
-            if self.model is None or self.tokenizer is None:
+            # Ensure the encoder is loaded
+            if self.encoder is None:
                 self.initialize_model()
                 
-            # Tokenize and get embedding
-            inputs = self.tokenizer(
-                text, 
-                return_tensors="pt", 
-                max_length=512, 
-                truncation=True,
-                padding="max_length"
-            ).to(self.model.device)
-            
-            # Get embeddings without gradient calculation
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                
-            # Use mean of last hidden state as embedding
-            embedding = outputs.last_hidden_state.mean(dim=1).cpu().numpy()
-            return embedding
+            return self.encoder.encode(text)
         except Exception as e:
             logger.error(f"Error getting embedding: {str(e)}")
             # Return zero embedding as fallback
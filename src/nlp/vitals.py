@@ -0,0 +1,210 @@
+"""
+Single-pass vital sign extraction with typed, unit-normalized results.
+"""
+import re
+from collections import namedtuple
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+VitalSign = namedtuple('VitalSign', ['kind', 'value', 'unit', 'start', 'end', 'text', 'context'])
+
+# Spoken number vocabulary as produced by Whisper ("one twenty over eighty")
+NUMBER_WORDS = {
+    "zero": 0, "oh": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11,
+    "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15, "sixteen": 16,
+    "seventeen": 17, "eighteen": 18, "nineteen": 19, "twenty": 20, "thirty": 30,
+    "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90
+}
+
+_first_word = "|".join(sorted((w for w in NUMBER_WORDS if w != "oh"), key=len, reverse=True))
+_any_word = "|".join(sorted(list(NUMBER_WORDS) + ["hundred"], key=len, reverse=True))
+_spoken = (
+    rf"(?:{_first_word})\b(?:[\s-]+(?:and[\s-]+)?(?:{_any_word})\b)*"
+    rf"(?:\s+point(?:\s+(?:{_any_word})\b)+)?"
+)
+NUM = rf"(?:\d+(?:\.\d+)?|{_spoken})"
+
+# Connecting words between a vital's name and its value ("blood pressure is about ...")
+_filler = r"[\s:=,]*(?:(?:is|was|of|at|reads|reading|measured|running|around|about|approximately)[\s:=,]+)*"
+
+# Words that make an "N/10" a pain score; the score must be near one of them
+_pain_cue = r"(?:pain(?:ful)?|hurts?|hurting|aches?|aching|discomfort|tender(?:ness)?|sore(?:ness)?|rates?|rated|rating|severity)"
+_out_of_ten = r"\s*(?:/|\bout\s+of\b)\s*(?:10|ten)\b(?![/\d])"
+
+VITALS_PATTERN = re.compile(
+    rf"""
+    \b(?:blood\s+pressure|b\.?p\.?)\b{_filler}
+        (?P<bp_sys>{NUM})\s*(?:/|\bover\b)\s*(?P<bp_dia>{NUM})
+    |\b(?:heart\s+rate|pulse(?:\s+rate)?|hr)\b(?!\s+ox){_filler}
+        (?P<hr>{NUM})(?:\s*(?:bpm|beats\s+(?:per|a)\s+minute))?
+    |\b(?:respiratory\s+rate|respirations|resp(?:iratory)?\s+rate|rr|breathing\s+rate)\b{_filler}
+        (?P<rr>{NUM})(?:\s*(?:breaths\s+(?:per|a)\s+minute))?
+    |\b(?:temperature|temp)\b{_filler}
+        (?P<temp>{NUM})\s*(?:°|degrees?)?\s*(?P<temp_unit>fahrenheit|celsius|f|c)?\b
+    |\b(?:oxygen\s+saturation|o2\s+sat(?:uration)?s?|spo2|sats?|saturating|pulse\s+ox(?:imetry)?|o2)\b{_filler}
+        (?P<spo2>{NUM})\s*(?:%|\s*percent\b)?
+        (?:\s*on\s+(?P<spo2_on>room\s+air|ra\b|{NUM}\s*(?:l|liters?)\b(?:\s+(?:nasal\s+cannula|nc))?))?
+    |(?P<spo2_alt>{NUM})\s*(?:%|\s*percent\b)\s*on\s+
+        (?P<spo2_alt_on>room\s+air|ra\b|{NUM}\s*(?:l|liters?)\b(?:\s+(?:nasal\s+cannula|nc))?)
+    |\b(?:weight|weighs|wt)\b{_filler}
+        (?P<weight>{NUM})\s*(?P<weight_unit>pounds?|lbs?|kilograms?|kilos?|kgs?)\b
+    |\b{_pain_cue}\b[^.;!?\n\d]{{0,40}}?(?<![/\d])(?P<pain>{NUM}){_out_of_ten}
+    |(?<![/\d])(?P<pain_alt>{NUM}){_out_of_ten}(?:\s+\w+){{0,2}}?\s+{_pain_cue}\b
+    """,
+    re.IGNORECASE | re.VERBOSE
+)
+
+# Plausible ranges, used to reject misheard or unrelated numbers
+PLAUSIBLE = {
+    "systolic": (50, 300),
+    "diastolic": (20, 200),
+    "heart_rate": (20, 250),
+    "respiratory_rate": (4, 80),
+    "temperature": (90.0, 110.0),
+    "spo2": (50, 100),
+    "weight": (0.5, 400.0),
+    "pain": (0, 10),
+}
+
+def parse_number(text):
+    """Convert a digit or spoken number ("one twenty", "ninety eight point six") to a number."""
+    text = text.strip().lower()
+    try:
+        return float(text) if "." in text else int(text)
+    except ValueError:
+        pass
+        
+    tokens = [t for t in re.split(r"[\s-]+", text) if t and t != "and"]
+    fraction = ""
+    if "point" in tokens:
+        index = tokens.index("point")
+        fraction = "".join(str(NUMBER_WORDS.get(t, 0)) for t in tokens[index + 1:])
+        tokens = tokens[:index]
+        
+    # Group words into chunks; adjacent chunks are read digit-wise ("one twenty" -> 120)
+    chunks = []
+    current = None
+    for token in tokens:
+        if token == "hundred":
+            current = (current or 1) * 100
+            continue
+            
+        value = NUMBER_WORDS[token]
+        if current is None:
+            current = value
+        elif current >= 100 and current % 100 == 0 and value < 100:
+            current += value
+        elif current % 100 >= 20 and current % 10 == 0 and value < 10:
+            current += value
+        else:
+            chunks.append(current)
+            current = value
+    if current is not None:
+        chunks.append(current)
+        
+    whole = "".join(str(chunk) for chunk in chunks) or "0"
+    return float(f"{whole}.{fraction}") if fraction else int(whole)
+
+def _plausible(kind, value):
+    low, high = PLAUSIBLE[kind]
+    return low <= value <= high
+
+class VitalsParser:
+    def parse(self, text):
+        """Extract every recognized vital sign from the text, in order of appearance."""
+        vitals = []
+        if not text:
+            return vitals
+            
+        for match in VITALS_PATTERN.finditer(text):
+            try:
+                vital = self._to_vital(match)
+            except (KeyError, ValueError) as e:
+                logger.debug(f"Skipping unparseable vital '{match.group()}': {str(e)}")
+                continue
+            if vital is not None:
+                vitals.append(vital)
+                
+        return vitals
+        
+    def _to_vital(self, match):
+        """Build a typed vital sign from a scanner match."""
+        groups = match.groupdict()
+        start, end, raw = match.start(), match.end(), match.group().strip()
+        
+        if groups["bp_sys"]:
+            systolic, diastolic = parse_number(groups["bp_sys"]), parse_number(groups["bp_dia"])
+            if _plausible("systolic", systolic) and _plausible("diastolic", diastolic):
+                return VitalSign("blood_pressure", (int(systolic), int(diastolic)), "mmHg", start, end, raw, None)
+        elif groups["hr"]:
+            value = parse_number(groups["hr"])
+            if _plausible("heart_rate", value):
+                return VitalSign("heart_rate", int(value), "bpm", start, end, raw, None)
+        elif groups["rr"]:
+            value = parse_number(groups["rr"])
+            if _plausible("respiratory_rate", value):
+                return VitalSign("respiratory_rate", int(value), "breaths/min", start, end, raw, None)
+        elif groups["temp"]:
+            value = float(parse_number(groups["temp"]))
+            unit = (groups["temp_unit"] or "").lower()
+            # Normalize to Fahrenheit; bare values below 45 can only be Celsius
+            if unit.startswith("c") or (not unit and value < 45):
+                value = value * 9 / 5 + 32
+            value = round(value, 1)
+            if _plausible("temperature", value):
+                return VitalSign("temperature", value, "°F", start, end, raw, None)
+        elif groups["spo2"] or groups["spo2_alt"]:
+            value = parse_number(groups["spo2"] or groups["spo2_alt"])
+            context = groups["spo2_on"] or groups["spo2_alt_on"]
+            if context and context.lower() == "ra":
+                context = "room air"
+            if _plausible("spo2", value):
+                return VitalSign("spo2", int(value), "%", start, end, raw, context)
+        elif groups["weight"]:
+            value = float(parse_number(groups["weight"]))
+            if groups["weight_unit"].lower().startswith(("p", "l")):
+                value = value * 0.45359237
+            value = round(value, 1)
+            if _plausible("weight", value):
+                return VitalSign("weight", value, "kg", start, end, raw, None)
+        elif groups["pain"] or groups["pain_alt"]:
+            value = parse_number(groups["pain"] or groups["pain_alt"])
+            if _plausible("pain", value):
+                return VitalSign("pain", int(value), "/10", start, end, raw, None)
+                
+        return None
+        
+    @staticmethod
+    def first_by_kind(vitals):
+        """Map each vital kind to its first recorded value."""
+        found = {}
+        for vital in vitals:
+            found.setdefault(vital.kind, vital)
+        return found
+        
+    @staticmethod
+    def format(vitals):
+        """Render vital signs as a compact SOAP-style string."""
+        found = VitalsParser.first_by_kind(vitals)
+        parts = []
+        
+        if "blood_pressure" in found:
+            systolic, diastolic = found["blood_pressure"].value
+            parts.append(f"BP {systolic}/{diastolic}")
+        if "heart_rate" in found:
+            parts.append(f"HR {found['heart_rate'].value}")
+        if "respiratory_rate" in found:
+            parts.append(f"RR {found['respiratory_rate'].value}")
+        if "temperature" in found:
+            parts.append(f"Temp {found['temperature'].value:g}°F")
+        if "spo2" in found:
+            spo2 = found["spo2"]
+            parts.append(f"SpO2 {spo2.value}%" + (f" on {spo2.context}" if spo2.context else ""))
+        if "weight" in found:
+            parts.append(f"Wt {found['weight'].value:g} kg")
+        if "pain" in found:
+            parts.append(f"Pain {found['pain'].value}/10")
+            
+        return ", ".join(parts)
@@ -4,6 +4,7 @@ Database management for patient records and SOAP notes.
 import sqlite3
 from pathlib import Path
 from ..utils.logger import get_logger
+from ..utils.metrics import STAGE_ERRORS, STAGE_SECONDS
 
 logger = get_logger(__name__)
 
@@ -53,13 +54,15 @@ class Database:
     def save_soap_note(self, patient_id, content):
         """Save a SOAP note to the database."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                INSERT INTO soap_notes (patient_id, date, content)
-                VALUES (?, CURRENT_TIMESTAMP, ?)
-            ''', (patient_id, content))
-            self.conn.commit()
+            with STAGE_SECONDS.time(component="storage", stage="save_soap_note"):
+                cursor = self.conn.cursor()
+                cursor.execute('''
+                    INSERT INTO soap_notes (patient_id, date, content)
+                    VALUES (?, CURRENT_TIMESTAMP, ?)
+                ''', (patient_id, content))
+                self.conn.commit()
             return cursor.lastrowid
         except Exception as e:
+            STAGE_ERRORS.inc(component="storage", stage="save_soap_note")
             logger.error(f"Error saving SOAP note: {str(e)}")
             raise
@@ -0,0 +1,159 @@
+"""
+Memo cache for template-matching query embeddings and match results.
+"""
+import sqlite3
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+from ..utils.logger import get_logger
+from ..utils.metrics import CACHE_REQUESTS
+
+logger = get_logger(__name__)
+
+class EmbeddingCache:
+    def __init__(self, config=None):
+        self.config = config or {}
+        self.max_entries = int(self.config.get('EMBEDDING_CACHE_SIZE', 1024))
+        self.max_disk_entries = int(self.config.get('EMBEDDING_CACHE_DISK_SIZE', 50000))
+        self.cache_path = self.config.get('EMBEDDING_CACHE_PATH', 'models/vector_db/query_cache.sqlite')
+        self.entries = OrderedDict()
+        self.conn = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.initialize_store()
+        
+    def initialize_store(self):
+        """Open the on-disk cache, falling back to memory-only on failure."""
+        if not self.cache_path:
+            logger.info("Embedding cache running in memory-only mode")
+            return
+            
+        try:
+            Path(self.cache_path).parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(str(self.cache_path), check_same_thread=False)
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS query_cache (
+                    key TEXT PRIMARY KEY,
+                    embedding BLOB NOT NULL,
+                    dim INTEGER NOT NULL,
+                    template_id TEXT,
+                    last_used REAL
+                )
+            ''')
+            self.conn.commit()
+            logger.info(f"Embedding cache opened at {self.cache_path}")
+        except Exception as e:
+            logger.error(f"Error opening embedding cache: {str(e)}")
+            self.conn = None
+            
+    @staticmethod
+    def normalize_keywords(keywords):
+        """Reduce keywords to a sorted, deduplicated, case-folded tuple."""
+        if isinstance(keywords, str):
+            terms = keywords.split()
+        elif isinstance(keywords, list):
+            terms = [k.get("text", "") if isinstance(k, dict) else str(k) for k in keywords]
+        else:
+            terms = []
+            
+        normalized = {" ".join(term.casefold().split()) for term in terms}
+        normalized.discard("")
+        return tuple(sorted(normalized))
+        
+    @staticmethod
+    def make_key(normalized_keywords, version):
+        """Build a cache key from a normalized keyword set and a model/index version."""
+        payload = json.dumps([version, list(normalized_keywords)], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        
+    def get(self, key):
+        """Return (embedding, template_id) for a key, or None on a miss."""
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                CACHE_REQUESTS.inc(cache="embedding", result="hit")
+                return self.entries[key]
+                
+            entry = self._load_from_disk(key)
+            if entry is None:
+                self.misses += 1
+                CACHE_REQUESTS.inc(cache="embedding", result="miss")
+                return None
+                
+            self.hits += 1
+            CACHE_REQUESTS.inc(cache="embedding", result="disk_hit")
+            self._remember(key, entry)
+            return entry
+            
+    def put(self, key, embedding, template_id=None):
+        """Store an embedding and its matched template id."""
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        entry = (embedding, template_id)
+        
+        with self._lock:
+            self._remember(key, entry)
+            self._save_to_disk(key, entry)
+            
+    def clear(self):
+        """Drop every cached entry, in memory and on disk."""
+        with self._lock:
+            self.entries.clear()
+            if self.conn is not None:
+                try:
+                    self.conn.execute("DELETE FROM query_cache")
+                    self.conn.commit()
+                except Exception as e:
+                    logger.error(f"Error clearing embedding cache: {str(e)}")
+                    
+    def _remember(self, key, entry):
+        """Insert into the in-memory LRU, evicting the oldest entries."""
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            
+    def _load_from_disk(self, key):
+        """Look a key up in the on-disk cache."""
+        if self.conn is None:
+            return None
+            
+        try:
+            row = self.conn.execute(
+                "SELECT embedding, dim, template_id FROM query_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+                
+            self.conn.execute("UPDATE query_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+            embedding = np.frombuffer(row[0], dtype=np.float32).reshape(1, row[1]).copy()
+            return (embedding, row[2])
+        except Exception as e:
+            logger.error(f"Error reading embedding cache: {str(e)}")
+            return None
+            
+    def _save_to_disk(self, key, entry):
+        """Persist an entry and trim the on-disk cache to its size limit."""
+        if self.conn is None:
+            return
+            
+        embedding, template_id = entry
+        try:
+            self.conn.execute('''
+                INSERT OR REPLACE INTO query_cache (key, embedding, dim, template_id, last_used)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (key, embedding.tobytes(), embedding.shape[1], template_id, time.time()))
+            self.conn.execute('''
+                DELETE FROM query_cache WHERE key IN (
+                    SELECT key FROM query_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_disk_entries,))
+            self.conn.commit()
+        except Exception as e:
+            logger.error(f"Error writing embedding cache: {str(e)}")
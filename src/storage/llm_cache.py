@@ -0,0 +1,156 @@
+"""
+Persistent, encrypted cache of LLM responses keyed by prompt, model and sampling parameters.
+"""
+import sqlite3
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from ..utils.security import Security
+from ..utils.logger import get_logger
+from ..utils.metrics import CACHE_REQUESTS
+
+logger = get_logger(__name__)
+
+class LLMResponseCache:
+    def __init__(self, config=None):
+        self.config = config or {}
+        self.cache_path = self.config.get('LLM_CACHE_PATH', 'data/cache/llm_cache.sqlite')
+        max_entries = self.config.get('LLM_CACHE_SIZE')
+        self.max_entries = 5000 if max_entries is None else int(max_entries)
+        ttl = self.config.get('LLM_CACHE_TTL')
+        self.ttl = 7 * 24 * 3600 if ttl is None else float(ttl)
+        # Sampled calls are cached unless explicitly opted out
+        self.cache_sampled = self.config.get('LLM_CACHE_SAMPLED', True)
+        self.conn = None
+        self.security = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.initialize_store()
+        
+    def initialize_store(self):
+        """Open the on-disk cache; the cache is disabled if this fails."""
+        if not self.cache_path or self.max_entries <= 0:
+            logger.info("LLM response cache disabled")
+            return
+        if not os.getenv('ENCRYPTION_KEY'):
+            # A key generated for this run could not read back entries from earlier runs
+            logger.warning("LLM response cache disabled: set ENCRYPTION_KEY to keep responses across runs")
+            return
+            
+        try:
+            self.security = Security(self.config)
+            Path(self.cache_path).parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(str(self.cache_path), check_same_thread=False)
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    response BLOB NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            self.conn.commit()
+            logger.info(f"LLM response cache opened at {self.cache_path}")
+        except Exception as e:
+            logger.error(f"Error opening LLM response cache: {str(e)}")
+            self.conn = None
+            
+    @property
+    def enabled(self):
+        return self.conn is not None
+        
+    @staticmethod
+    def make_key(prompt, model, params):
+        """Hash a prompt (text or chat messages), model id and sampling parameters."""
+        if isinstance(prompt, str):
+            prompt = [{"role": "user", "content": prompt}]
+        # Whitespace differences do not change what the model is asked
+        normalized = [[m.get("role", ""), " ".join(str(m.get("content", "")).split())] for m in prompt]
+        payload = json.dumps([model, normalized, params], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        
+    def is_cacheable(self, params):
+        """Whether a call with these sampling parameters may be served from the cache."""
+        if not self.enabled:
+            return False
+        sampled = params.get("do_sample", True) and float(params.get("temperature") or 0) > 0
+        return self.cache_sampled or not sampled
+        
+    def get(self, key):
+        """Return the cached response text for a key, or None on a miss."""
+        if not self.enabled:
+            return None
+            
+        with self._lock:
+            try:
+                row = self.conn.execute(
+                    "SELECT response, created FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                response = self._decode(row) if row is not None else None
+                if response is None:
+                    if row is not None:
+                        self.conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                        self.conn.commit()
+                    self.misses += 1
+                    CACHE_REQUESTS.inc(cache="llm_response", result="miss")
+                    return None
+                    
+                self.conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+                self.conn.commit()
+                self.hits += 1
+                CACHE_REQUESTS.inc(cache="llm_response", result="hit")
+                return response
+            except Exception as e:
+                logger.error(f"Error reading LLM response cache: {str(e)}")
+                self.misses += 1
+                CACHE_REQUESTS.inc(cache="llm_response", result="error")
+                return None
+                
+    def _decode(self, row):
+        """Decrypt a stored response; expired or unreadable entries decode to None."""
+        encrypted, created = row
+        if time.time() - created > self.ttl:
+            return None
+        try:
+            return self.security.decrypt_data(encrypted).decode('utf-8')
+        except Exception:
+            # Entries written under another encryption key cannot be read back
+            return None
+            
+    def put(self, key, response):
+        """Encrypt and store a response, evicting expired and least recently used entries."""
+        if not self.enabled or not response:
+            return
+            
+        with self._lock:
+            try:
+                now = time.time()
+                self.conn.execute('''
+                    INSERT OR REPLACE INTO llm_cache (key, response, created, last_used)
+                    VALUES (?, ?, ?, ?)
+                ''', (key, self.security.encrypt_data(response), now, now))
+                self.conn.execute("DELETE FROM llm_cache WHERE created < ?", (now - self.ttl,))
+                self.conn.execute('''
+                    DELETE FROM llm_cache WHERE key IN (
+                        SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                    )
+                ''', (self.max_entries,))
+                self.conn.commit()
+            except Exception as e:
+                logger.error(f"Error writing LLM response cache: {str(e)}")
+                
+    def clear(self):
+        """Drop every cached response."""
+        if not self.enabled:
+            return
+            
+        with self._lock:
+            try:
+                self.conn.execute("DELETE FROM llm_cache")
+                self.conn.commit()
+            except Exception as e:
+                logger.error(f"Error clearing LLM response cache: {str(e)}")
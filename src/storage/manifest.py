@@ -0,0 +1,189 @@
+"""
+Manifest of processed batch inputs, so reruns only process new, changed or failed files.
+"""
+import sqlite3
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+def file_hash(path):
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class BatchManifest:
+    def __init__(self, config=None):
+        self.config = config or {}
+        self.manifest_path = self.config.get('BATCH_MANIFEST_PATH', 'data/cache/batch_manifest.sqlite')
+        self.conn = None
+        self._lock = threading.Lock()
+        self.initialize_store()
+        
+    def initialize_store(self):
+        """Open the manifest; batches reprocess everything if this fails."""
+        if not self.manifest_path:
+            logger.info("Batch manifest disabled")
+            return
+            
+        try:
+            Path(self.manifest_path).parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(str(self.manifest_path), check_same_thread=False)
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS manifest (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    output TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    updated REAL NOT NULL
+                )
+            ''')
+            self.conn.commit()
+            logger.info(f"Batch manifest opened at {self.manifest_path}")
+        except Exception as e:
+            logger.error(f"Error opening batch manifest: {str(e)}")
+            self.conn = None
+            
+    @property
+    def enabled(self):
+        return self.conn is not None
+        
+    @staticmethod
+    def _key(path):
+        return str(Path(path).resolve())
+        
+    def plan(self, files, version, output_dir=None):
+        """
+        Split input files into those that need processing and those already done.
+        
+        Args:
+            files (list): Input file paths
+            version (str): Fingerprint of the pipeline and models producing the outputs
+            output_dir (str, optional): Outputs elsewhere do not count as done
+            
+        Returns:
+            tuple: (paths to process, {path: output path} for unchanged inputs)
+        """
+        if not self.enabled:
+            return list(files), {}
+            
+        pending = []
+        done = {}
+        for path in files:
+            output = self._completed_output(path, version, output_dir)
+            if output is None:
+                pending.append(path)
+            else:
+                done[path] = output
+        logger.info(f"Batch manifest: {len(done)} unchanged, {len(pending)} to process")
+        return pending, done
+        
+    def _completed_output(self, path, version, output_dir):
+        """Output of a previous successful run on identical input, or None."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT size, mtime, content_hash, version, status, output FROM manifest WHERE path = ?",
+                (self._key(path),)
+            ).fetchone()
+        if row is None:
+            return None
+            
+        size, mtime, content_hash, row_version, status, output = row
+        if status != "done" or row_version != version or not output or not os.path.exists(output):
+            return None
+        if output_dir is not None and Path(output).parent.resolve() != Path(output_dir).resolve():
+            return None
+            
+        try:
+            stat = os.stat(path)
+            if (stat.st_size, stat.st_mtime) == (size, mtime):
+                return output
+            # Touched but possibly unchanged: compare contents before reprocessing
+            if stat.st_size != size or file_hash(path) != content_hash:
+                return None
+        except OSError:
+            return None
+            
+        with self._lock:
+            self.conn.execute(
+                "UPDATE manifest SET mtime = ?, updated = ? WHERE path = ?",
+                (stat.st_mtime, time.time(), self._key(path))
+            )
+            self.conn.commit()
+        return output
+        
+    def record(self, path, version, output=None, error=None, fingerprint=None):
+        """
+        Record the outcome for one input; failed inputs are retried on the next run.
+        
+        Args:
+            path (str): Input file path
+            version (str): Fingerprint of the pipeline and models that produced the output
+            output (str, optional): Output path of a successful run
+            error (str, optional): Why the input failed
+            fingerprint (tuple, optional): (size, mtime, content hash) of the bytes that were
+                processed; read from the file now if not given
+        """
+        if not self.enabled:
+            return
+            
+        if fingerprint is None:
+            try:
+                stat = os.stat(path)
+                fingerprint = (stat.st_size, stat.st_mtime, file_hash(path))
+            except OSError as e:
+                logger.error(f"Error fingerprinting {path}: {str(e)}")
+                return
+        size, mtime, content_hash = fingerprint
+        
+        status = "done" if error is None and output else "failed"
+        with self._lock:
+            try:
+                self.conn.execute('''
+                    INSERT INTO manifest (path, size, mtime, content_hash, version, status, output, error, attempts, updated)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1, ?)
+                    ON CONFLICT(path) DO UPDATE SET
+                        size = excluded.size, mtime = excluded.mtime, content_hash = excluded.content_hash,
+                        version = excluded.version, status = excluded.status, output = excluded.output,
+                        error = excluded.error, attempts = manifest.attempts + 1, updated = excluded.updated
+                ''', (
+                    self._key(path), size, mtime, content_hash, version,
+                    status, output, error, time.time()
+                ))
+                # Committed per file, so a crashed run resumes after the last written note
+                self.conn.commit()
+            except Exception as e:
+                logger.error(f"Error writing batch manifest: {str(e)}")
+                
+    def failures(self):
+        """Inputs whose last attempt failed, with their errors."""
+        if not self.enabled:
+            return {}
+            
+        with self._lock:
+            rows = self.conn.execute("SELECT path, error FROM manifest WHERE status = 'failed'").fetchall()
+        return dict(rows)
+        
+    def clear(self):
+        """Forget every recorded input."""
+        if not self.enabled:
+            return
+            
+        with self._lock:
+            try:
+                self.conn.execute("DELETE FROM manifest")
+                self.conn.commit()
+            except Exception as e:
+                logger.error(f"Error clearing batch manifest: {str(e)}")
@@ -18,7 +18,78 @@ def load_config():
         # Model paths
         'WHISPER_MODEL_PATH': os.getenv('WHISPER_MODEL_PATH'),
         'LLAMA_MODEL_PATH': os.getenv('LLAMA_MODEL_PATH'),
+        'LLM_DEVICE': os.getenv('LLM_DEVICE', 'auto'),  # auto, cpu, cuda, mps
+        'LLM_DTYPE': os.getenv('LLM_DTYPE', 'auto'),  # auto, bf16, fp16, fp32, int8
+        'LLM_THREADS': int(os.getenv('LLM_THREADS', 0)) or None,
+        'LLM_PREFIX_CACHE_SIZE': int(os.getenv('LLM_PREFIX_CACHE_SIZE', 4)),  # 0 disables prefix KV reuse
+        'LLM_MAX_BATCH': int(os.getenv('LLM_MAX_BATCH', 8)),  # concurrent requests in the generation server
+        'LLM_DRAFT_MODEL_PATH': os.getenv('LLM_DRAFT_MODEL_PATH'),  # small model for assisted decoding
+        'LLM_DRAFT_LOOKAHEAD': int(os.getenv('LLM_DRAFT_LOOKAHEAD', 5)),
         'VECTOR_DB_PATH': os.getenv('VECTOR_DB_PATH'),
+        'MODEL_BACKEND': os.getenv('MODEL_BACKEND', 'hf'),  # hf, or stub for small offline stand-in models
+        
+        # Template matching cache
+        'EMBEDDING_CACHE_SIZE': int(os.getenv('EMBEDDING_CACHE_SIZE', 1024)),
+        'EMBEDDING_CACHE_PATH': os.getenv('EMBEDDING_CACHE_PATH'),
+        
+        # Rule-based extraction
+        'EXTRACTION_RULES_DIR': os.getenv('EXTRACTION_RULES_DIR', 'data/rules'),
+        'MEDICATION_LEXICON_PATH': os.getenv('MEDICATION_LEXICON_PATH', 'data/medications.txt'),
+        
+        # LLM-based template filling (any OpenAI-compatible endpoint)
+        'OPENAI_API_KEY': os.getenv('OPENAI_API_KEY'),
+        'LLM_BASE_URL': os.getenv('LLM_BASE_URL'),
+        'LLM_MODEL': os.getenv('LLM_MODEL', 'gpt-3.5-turbo'),
+        'LLM_TIMEOUT': float(os.getenv('LLM_TIMEOUT', 60)),
+        'LLM_MAX_RETRIES': int(os.getenv('LLM_MAX_RETRIES', 3)),
+        'LLM_MAX_CONCURRENCY': int(os.getenv('LLM_MAX_CONCURRENCY', 8)),
+        'LLM_CONTEXT_TOKENS': int(os.getenv('LLM_CONTEXT_TOKENS', 0)) or None,  # None: model's own window (local) or 4096
+        'LLM_OUTPUT_TOKENS': int(os.getenv('LLM_OUTPUT_TOKENS', 1000)),
+        
+        # LLM response cache (encrypted with ENCRYPTION_KEY and off without it; an empty path disables it)
+        'LLM_CACHE_PATH': os.getenv('LLM_CACHE_PATH', 'data/cache/llm_cache.sqlite'),
+        'LLM_CACHE_SIZE': int(os.getenv('LLM_CACHE_SIZE', 5000)),  # 0 disables the cache
+        'LLM_CACHE_TTL': float(os.getenv('LLM_CACHE_TTL', 7 * 24 * 3600)),
+        'LLM_CACHE_SAMPLED': os.getenv('LLM_CACHE_SAMPLED', 'true').lower() == 'true',
+        
+        # Pipeline scheduling (PIPELINE_PROCESSES=0 keeps every stage on threads)
+        'PIPELINE_WORKERS': int(os.getenv('PIPELINE_WORKERS', 4)),
+        'PIPELINE_PROCESSES': int(os.getenv('PIPELINE_PROCESSES', 0)),
+        
+        # Streaming sessions re-rank templates when keyword-set similarity drops below this
+        'STREAM_REMATCH_JACCARD': float(os.getenv('STREAM_REMATCH_JACCARD', 0.8)),
+        
+        # Batch processing (BATCH_WORKERS=0 uses one worker per CPU core; BATCH_MODE=fork
+        # runs workers as processes forked after the models are loaded)
+        'BATCH_WORKERS': int(os.getenv('BATCH_WORKERS', 0)),
+        'BATCH_MODE': os.getenv('BATCH_MODE', 'thread'),
+        'BATCH_PREFETCH': int(os.getenv('BATCH_PREFETCH', 16)),
+        'BATCH_MANIFEST_PATH': os.getenv('BATCH_MANIFEST_PATH', 'data/cache/batch_manifest.sqlite'),  # empty disables skipping
+        
+        # Metrics export (METRICS_PORT=0 disables the HTTP endpoint; an empty path disables snapshots)
+        'METRICS_PORT': int(os.getenv('METRICS_PORT', 0)),
+        'METRICS_HOST': os.getenv('METRICS_HOST', '127.0.0.1'),
+        'METRICS_SNAPSHOT_PATH': os.getenv('METRICS_SNAPSHOT_PATH', ''),
+        'METRICS_SNAPSHOT_INTERVAL': float(os.getenv('METRICS_SNAPSHOT_INTERVAL', 60)),
+        
+        # Trace spans (an empty TRACE_DIR disables tracing). Patient ids are hashed with the salt;
+        # without TRACE_ID_SALT a random one is generated once and kept in TRACE_DIR/trace_salt
+        'TRACE_DIR': os.getenv('TRACE_DIR', ''),
+        'TRACE_MAX_BYTES': int(os.getenv('TRACE_MAX_BYTES', 10 * 1024 * 1024)),
+        'TRACE_BACKUPS': int(os.getenv('TRACE_BACKUPS', 5)),
+        'TRACE_ID_SALT': os.getenv('TRACE_ID_SALT', ''),
+        'TRACE_RAW_IDS': os.getenv('TRACE_RAW_IDS', 'false').lower() == 'true',
+        
+        # Sampling profiler (an empty PROFILE_DIR disables it; 0 profiles every watched call)
+        'PROFILE_DIR': os.getenv('PROFILE_DIR', 'data/profiles'),
+        'PROFILE_THRESHOLD_SECONDS': float(os.getenv('PROFILE_THRESHOLD_SECONDS', 30)),
+        'PROFILE_INTERVAL': float(os.getenv('PROFILE_INTERVAL', 0.01)),
+        'PROFILE_CAPTURE_SECONDS': float(os.getenv('PROFILE_CAPTURE_SECONDS', 10)),
+        
+        # Memory budgets in MB (0 disables); heap tracing adds per-stage Python heap deltas at some cost
+        'MEMORY_BUDGET_MB': float(os.getenv('MEMORY_BUDGET_MB', 0)),
+        'AUDIO_BUFFER_BUDGET_MB': float(os.getenv('AUDIO_BUFFER_BUDGET_MB', 0)),
+        'MEMORY_TRACE_HEAP': os.getenv('MEMORY_TRACE_HEAP', 'false').lower() == 'true',
         
         # Database settings
         'DB_CONNECTION_STRING': os.getenv('DB_CONNECTION_STRING'),
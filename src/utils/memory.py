@@ -0,0 +1,185 @@
+"""
+Memory accounting (model sizes, per-stage RSS and heap deltas, audio buffers) and budgets that refuse new work.
+"""
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from .logger import get_logger
+from .metrics import REGISTRY
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is then tracked from samples only
+    resource = None
+
+logger = get_logger(__name__)
+
+MB = 1024 * 1024
+
+# From small per-stage deltas up to multi-gigabyte model weights
+BYTE_BUCKETS = (MB, 4 * MB, 16 * MB, 64 * MB, 256 * MB, 1024 * MB, 4096 * MB, 16384 * MB)
+
+MODEL_BYTES = REGISTRY.gauge(
+    "chiron_model_bytes", "Memory held by each loaded model", ("model", "kind")
+)
+PROCESS_RSS = REGISTRY.gauge(
+    "chiron_process_rss_bytes", "Resident set size of the process", ("kind",)
+)
+STAGE_RSS_DELTA = REGISTRY.histogram(
+    "chiron_stage_rss_delta_bytes", "Change in resident set size across each stage", ("component", "stage"),
+    buckets=BYTE_BUCKETS
+)
+STAGE_HEAP_DELTA = REGISTRY.histogram(
+    "chiron_stage_heap_delta_bytes", "Change in traced Python heap across each stage", ("component", "stage"),
+    buckets=BYTE_BUCKETS
+)
+AUDIO_BUFFER_BYTES = REGISTRY.histogram(
+    "chiron_audio_buffer_bytes", "Audio held in memory per recording", buckets=BYTE_BUCKETS
+)
+BUDGET_REJECTIONS = REGISTRY.counter(
+    "chiron_memory_budget_rejections_total", "Work refused because a memory budget was exceeded", ("work",)
+)
+
+class MemoryBudgetExceeded(RuntimeError):
+    """Raised instead of starting work that would run past a memory budget."""
+
+def rss_bytes():
+    """Current resident set size, or None where it cannot be read."""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_bytes()
+
+def peak_rss_bytes():
+    """Highest resident set size of the process so far, or None where it cannot be read."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def model_bytes(model):
+    """Bytes held by a model's parameters and buffers; pipelines are measured through their model."""
+    model = getattr(model, "model", model)
+    if not hasattr(model, "parameters"):
+        return 0
+    tensors = list(model.parameters()) + list(model.buffers() if hasattr(model, "buffers") else [])
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+def record_model_load(name, model, rss_before=None):
+    """
+    Record the memory taken by a model that has just been loaded.
+    
+    Args:
+        name (str): Model label, e.g. "whisper" or "ner"
+        model: The loaded model or pipeline
+        rss_before (int, optional): rss_bytes() taken before loading started
+    """
+    weights = model_bytes(model)
+    MODEL_BYTES.set(weights, model=name, kind="weights")
+    message = f"Loaded {name}: {weights / MB:.0f} MB of weights"
+    rss_after = rss_bytes()
+    if rss_before is not None and rss_after is not None:
+        MODEL_BYTES.set(rss_after - rss_before, model=name, kind="rss")
+        message += f", resident size +{(rss_after - rss_before) / MB:.0f} MB"
+    _update_process_rss(rss_after)
+    logger.info(message)
+
+def _update_process_rss(current=None):
+    current = rss_bytes() if current is None else current
+    if current is not None:
+        PROCESS_RSS.set(current, kind="current")
+    peak = peak_rss_bytes()
+    if peak is not None:
+        PROCESS_RSS.set(peak, kind="peak")
+
+@contextmanager
+def track_stage(component, stage):
+    """
+    Record the RSS and Python heap change across a stage.
+    
+    Stages that run concurrently share the process, so their deltas overlap;
+    heap deltas are only recorded when MEMORY_TRACE_HEAP has started tracemalloc.
+    
+    Yields:
+        dict: Filled with rss_delta and heap_delta in bytes when the block ends
+    """
+    stats = {}
+    rss_before = rss_bytes()
+    heap_before = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+    try:
+        yield stats
+    finally:
+        rss_after = rss_bytes()
+        if rss_before is not None and rss_after is not None:
+            stats["rss_delta"] = rss_after - rss_before
+            STAGE_RSS_DELTA.observe(stats["rss_delta"], component=component, stage=stage)
+        if heap_before is not None and tracemalloc.is_tracing():
+            stats["heap_delta"] = tracemalloc.get_traced_memory()[0] - heap_before
+            STAGE_HEAP_DELTA.observe(stats["heap_delta"], component=component, stage=stage)
+        _update_process_rss(rss_after)
+
+class MemoryBudget:
+    def __init__(self, config=None):
+        self.config = config or {}
+        # 0 disables a budget
+        self.rss_limit = float(self.config.get('MEMORY_BUDGET_MB') or 0) * MB
+        self.audio_limit = float(self.config.get('AUDIO_BUFFER_BUDGET_MB') or 0) * MB
+        self._last_warning = 0.0
+        
+    def check(self, work):
+        """
+        Refuse new work while the process is over its RSS budget.
+        
+        Args:
+            work (str): What is about to start, e.g. "nlp.process"
+            
+        Raises:
+            MemoryBudgetExceeded: If resident memory is above MEMORY_BUDGET_MB
+        """
+        if not self.rss_limit:
+            return
+        current = rss_bytes()
+        if current is None or current <= self.rss_limit:
+            return
+        BUDGET_REJECTIONS.inc(work=work)
+        message = (
+            f"Refusing {work}: resident memory {current / MB:.0f} MB is over the "
+            f"{self.rss_limit / MB:.0f} MB budget"
+        )
+        logger.error(message)
+        raise MemoryBudgetExceeded(message)
+        
+    def audio_exceeded(self, buffered):
+        """Whether an audio buffer of this many bytes is over AUDIO_BUFFER_BUDGET_MB."""
+        if not self.audio_limit or buffered <= self.audio_limit:
+            return False
+        BUDGET_REJECTIONS.inc(work="audio")
+        # Called from the audio callback, so the warning is rate limited
+        if time.monotonic() - self._last_warning > 10:
+            self._last_warning = time.monotonic()
+            logger.error(f"Audio buffer of {buffered / MB:.0f} MB is over the {self.audio_limit / MB:.0f} MB budget")
+        return True
+
+_budget = MemoryBudget()
+
+def configure_memory(config):
+    """Install the process-wide memory budget and start heap tracing if MEMORY_TRACE_HEAP is set."""
+    global _budget
+    _budget = MemoryBudget(config)
+    if config.get('MEMORY_TRACE_HEAP') and not tracemalloc.is_tracing():
+        # tracemalloc slows allocation-heavy code, so it is opt-in
+        tracemalloc.start()
+    _update_process_rss()
+    return _budget
+
+def get_budget():
+    return _budget
+
+def check_budget(work):
+    """Raise MemoryBudgetExceeded if the process-wide RSS budget is exceeded."""
+    _budget.check(work)
@@ -0,0 +1,297 @@
+"""
+Lightweight metrics registry (counters, gauges, histograms) with Prometheus and JSON exporters.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# Latency buckets in seconds, from fast rule scans to long LLM generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Recent observations kept per histogram series for percentiles in snapshots
+RESERVOIR_SIZE = 1024
+
+def _label_text(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class _Metric:
+    kind = None
+    
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self.series = {}
+        self._lock = threading.Lock()
+        
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"Metric {self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+class Counter(_Metric):
+    kind = "counter"
+    
+    def inc(self, amount=1, **labels):
+        """Add to the series value."""
+        key = self._key(labels)
+        with self._lock:
+            self.series[key] = self.series.get(key, 0) + amount
+            
+    def value(self, **labels):
+        return self.series.get(self._key(labels), 0)
+        
+    def expose(self):
+        with self._lock:
+            items = list(self.series.items())
+        return [f"{self.name}{_label_text(self.label_names, key)} {_number(value)}" for key, value in items]
+        
+    def snapshot(self):
+        with self._lock:
+            items = list(self.series.items())
+        return [{"labels": dict(zip(self.label_names, key)), "value": value} for key, value in items]
+
+class Gauge(Counter):
+    kind = "gauge"
+    
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.series[key] = value
+            
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+        
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+        
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+class Histogram(_Metric):
+    kind = "histogram"
+    
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        
+    def observe(self, value, **labels):
+        """Record one observation, e.g. a stage duration in seconds."""
+        key = self._key(labels)
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {
+                    "counts": [0] * len(self.buckets), "sum": 0.0, "count": 0,
+                    "recent": deque(maxlen=RESERVOIR_SIZE)
+                }
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][index] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+            series["recent"].append(value)
+            
+    def time(self, **labels):
+        """Context manager that observes the duration of its block."""
+        return _Timer(self, labels)
+        
+    def summary(self, **labels):
+        """Count, sum and p50/p95/p99 of recent observations for one series."""
+        series = self.series.get(self._key(labels))
+        if series is None:
+            return {"count": 0, "sum": 0.0}
+        with self._lock:
+            recent = list(series["recent"])
+            summary = {"count": series["count"], "sum": series["sum"]}
+        for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            summary[name] = _percentile(recent, fraction)
+        return summary
+        
+    def expose(self):
+        lines = []
+        with self._lock:
+            items = [(key, list(series["counts"]), series["sum"], series["count"]) for key, series in self.series.items()]
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _label_text(self.label_names, key, [("le", _number(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.label_names, key)} {count}")
+        return lines
+        
+    def snapshot(self):
+        return [
+            dict(self.summary(**dict(zip(self.label_names, key))), labels=dict(zip(self.label_names, key)))
+            for key in list(self.series)
+        ]
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+        
+    def _get(self, cls, name, description, labels, **kwargs):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, description, labels, **kwargs)
+            elif not isinstance(metric, cls) or metric.label_names != tuple(labels):
+                raise ValueError(f"Metric {name} is already registered with a different type or labels")
+            return metric
+            
+    def counter(self, name, description, labels=()):
+        return self._get(Counter, name, description, labels)
+        
+    def gauge(self, name, description, labels=()):
+        return self._get(Gauge, name, description, labels)
+        
+    def histogram(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, description, labels, buckets=buckets)
+        
+    def prometheus_text(self):
+        """Every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+        
+    def snapshot(self):
+        """Every metric as plain data, with percentiles for histograms."""
+        return {
+            "time": time.time(),
+            "metrics": {
+                metric.name: {"type": metric.kind, "help": metric.description, "series": metric.snapshot()}
+                for metric in list(self.metrics.values())
+            }
+        }
+        
+    def write_snapshot(self, path):
+        """Write the snapshot to a JSON file, replacing it atomically."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix(path.suffix + ".tmp")
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(temporary, path)
+
+# Shared by every module; exporters read from it
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "chiron_stage_seconds", "Time spent in each processing stage", ("component", "stage")
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "chiron_stage_errors_total", "Processing stages that raised an error", ("component", "stage")
+)
+DOCUMENTS = REGISTRY.counter(
+    "chiron_documents_total", "Transcripts processed into SOAP notes", ("mode", "status")
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "chiron_cache_requests_total", "Cache lookups by cache and result", ("cache", "result")
+)
+
+class MetricsExporter:
+    def __init__(self, config=None, registry=None):
+        self.config = config or {}
+        self.registry = registry or REGISTRY
+        self.port = int(self.config.get('METRICS_PORT') or 0)
+        self.host = self.config.get('METRICS_HOST') or '127.0.0.1'
+        self.snapshot_path = self.config.get('METRICS_SNAPSHOT_PATH')
+        self.snapshot_interval = float(self.config.get('METRICS_SNAPSHOT_INTERVAL') or 60)
+        self.server = None
+        self._stop = threading.Event()
+        self._threads = []
+        
+    def start(self):
+        """Serve /metrics on the local port and write periodic snapshots, as configured."""
+        if self.port:
+            registry = self.registry
+            
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] == "/metrics":
+                        body, content_type = registry.prometheus_text(), "text/plain; version=0.0.4"
+                    elif self.path.split("?")[0] == "/metrics.json":
+                        body, content_type = json.dumps(registry.snapshot()), "application/json"
+                    else:
+                        self.send_error(404)
+                        return
+                    data = body.encode('utf-8')
+                    self.send_response(200)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    
+                def log_message(self, format, *args):
+                    pass
+                    
+            self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+            self.port = self.server.server_address[1]
+            self._spawn(self.server.serve_forever, "metrics-http")
+            logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+            
+        if self.snapshot_path:
+            self._spawn(self._write_snapshots, "metrics-snapshot")
+            logger.info(f"Writing metrics snapshots to {self.snapshot_path} every {self.snapshot_interval:.0f}s")
+        return self
+        
+    def _spawn(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        
+    def _write_snapshots(self):
+        while not self._stop.wait(self.snapshot_interval):
+            self._snapshot()
+            
+    def _snapshot(self):
+        try:
+            self.registry.write_snapshot(self.snapshot_path)
+        except Exception as e:
+            logger.error(f"Error writing metrics snapshot: {str(e)}")
+            
+    def stop(self):
+        """Stop exporting; writes a last snapshot so short runs are still recorded."""
+        self._stop.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self.snapshot_path:
+            self._snapshot()
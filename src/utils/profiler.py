@@ -0,0 +1,178 @@
+"""
+Statistical sampling profiler that writes collapsed-stack files for calls slower than a threshold.
+"""
+import functools
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+class _Capture:
+    def __init__(self, name):
+        self.name = name
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = time.perf_counter()
+
+class SamplingProfiler:
+    def __init__(self, config=None):
+        self.config = config or {}
+        self.output_dir = self.config.get('PROFILE_DIR')
+        # 0 writes a profile for every watched call
+        threshold = self.config.get('PROFILE_THRESHOLD_SECONDS')
+        self.threshold = float(30 if threshold is None else threshold)
+        self.interval = float(self.config.get('PROFILE_INTERVAL') or 0.01)
+        self.capture_seconds = float(self.config.get('PROFILE_CAPTURE_SECONDS') or 10)
+        self.active = []
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._sampler = None
+        
+    @property
+    def enabled(self):
+        return bool(self.output_dir)
+        
+    @contextmanager
+    def watch(self, name):
+        """
+        Sample every thread while the block runs and keep the profile if it was slow.
+        
+        Args:
+            name (str): Name of the watched call, used in the profile file name
+            
+        Yields:
+            _Capture: The samples being collected, or None when profiling is disabled
+        """
+        if not self.enabled:
+            yield None
+            return
+            
+        capture = self._start(name)
+        try:
+            yield capture
+        finally:
+            elapsed = self._stop(capture)
+            if elapsed >= self.threshold:
+                path = self.dump(capture, elapsed)
+                if path is not None:
+                    logger.warning(f"{name} took {elapsed:.1f}s; profile written to {path}")
+                    
+    def capture(self, seconds=None, name="manual"):
+        """Sample every thread for a fixed time and write the profile; returns its path."""
+        if not self.enabled:
+            logger.warning("Profiling is disabled; set PROFILE_DIR to capture profiles")
+            return None
+        seconds = self.capture_seconds if seconds is None else seconds
+        capture = self._start(name)
+        time.sleep(seconds)
+        elapsed = self._stop(capture)
+        path = self.dump(capture, elapsed)
+        logger.info(f"Manual profile of {elapsed:.1f}s written to {path}")
+        return path
+        
+    def _start(self, name):
+        capture = _Capture(name)
+        with self._lock:
+            self.active.append(capture)
+            # The sampler thread is started on first use and sleeps while nothing is watched
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+                self._sampler.start()
+            self._wake.notify()
+        return capture
+        
+    def _stop(self, capture):
+        with self._lock:
+            self.active.remove(capture)
+        return time.perf_counter() - capture.started
+        
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                while not self.active:
+                    self._wake.wait()
+            stacks = self._sample(own)
+            with self._lock:
+                for capture in self.active:
+                    capture.stacks.update(stacks)
+                    capture.samples += 1
+            time.sleep(self.interval)
+            
+    @staticmethod
+    def _sample(own):
+        """One collapsed stack per thread, root first, e.g. 'MainThread;main (run.py:62);...'."""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            stacks.append(";".join(reversed(stack)))
+        return stacks
+        
+    def dump(self, capture, elapsed):
+        """Write a capture in the collapsed-stack format read by flamegraph.pl and speedscope."""
+        try:
+            Path(self.output_dir).mkdir(parents=True, exist_ok=True)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            path = Path(self.output_dir) / f"{capture.name}_{timestamp}_{int(elapsed * 1000)}ms.folded"
+            with open(path, 'w', encoding='utf-8') as f:
+                for stack, count in capture.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            return path
+        except Exception as e:
+            logger.error(f"Error writing profile: {str(e)}")
+            return None
+
+_profiler = SamplingProfiler()
+
+def configure_profiler(config):
+    """Install the process-wide profiler; calls are only watched when PROFILE_DIR is set."""
+    global _profiler
+    _profiler = SamplingProfiler(config)
+    return _profiler
+
+def get_profiler():
+    return _profiler
+
+def profiled(name):
+    """Decorator that watches every call of a function with the process-wide profiler."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _profiler.watch(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def install_signal_trigger():
+    """Capture a profile of the running process on SIGUSR1, e.g. 'kill -USR1 <pid>'."""
+    if not hasattr(signal, "SIGUSR1"):
+        logger.warning("SIGUSR1 is not available on this platform; manual profiling is disabled")
+        return False
+        
+    def handler(signum, frame):
+        # Sampling must not block the interrupted thread
+        threading.Thread(target=_profiler.capture, name="profiler-capture", daemon=True).start()
+        
+    signal.signal(signal.SIGUSR1, handler)
+    return True
+
+if __name__ == "__main__":
+    # python -m src.utils.profiler <pid>
+    os.kill(int(sys.argv[1]), signal.SIGUSR1)
+    print(f"Requested a profile from process {sys.argv[1]}")
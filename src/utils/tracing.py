@@ -0,0 +1,238 @@
+"""
+Per-encounter trace spans exported to rotating JSONL files and convertible to Chrome trace events.
+"""
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+_current_span = contextvars.ContextVar("chiron_current_span", default=None)
+
+class Span:
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start = time.time()
+        self.duration = None
+        self.error = None
+        self.thread = threading.current_thread().name
+        self.pid = os.getpid()
+        
+    def set(self, **attributes):
+        """Add attributes, e.g. token counts known only at the end of the span."""
+        self.attributes.update(attributes)
+        
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration": self.duration,
+            "pid": self.pid,
+            "thread": self.thread,
+            "error": self.error,
+            "attributes": self.attributes
+        }
+
+class Tracer:
+    def __init__(self, config=None):
+        self.config = config or {}
+        self.trace_dir = self.config.get('TRACE_DIR')
+        self.max_bytes = int(self.config.get('TRACE_MAX_BYTES') or 10 * 1024 * 1024)
+        self.backups = int(self.config.get('TRACE_BACKUPS') or 5)
+        # Hashed surrogates keep patient identifiers out of trace files
+        self.salt = self.config.get('TRACE_ID_SALT') or ''
+        self.raw_ids = bool(self.config.get('TRACE_RAW_IDS'))
+        self.writer = None
+        if self.trace_dir and (self.salt or self.raw_ids or self._load_salt()):
+            self._open_writer()
+            
+    @property
+    def enabled(self):
+        return self.writer is not None
+        
+    def _load_salt(self):
+        """Read the trace directory's salt, creating a random one on first use; returns whether one is set."""
+        # Without a secret salt, hashes of short patient ids can be reversed by trying every id
+        path = Path(self.trace_dir) / "trace_salt"
+        try:
+            if not path.exists():
+                Path(self.trace_dir).mkdir(parents=True, exist_ok=True)
+                fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(secrets.token_hex(32))
+                logger.info(f"Generated a trace id salt at {path}")
+            self.salt = path.read_text(encoding='utf-8').strip()
+        except Exception as e:
+            logger.error(f"Tracing disabled: no TRACE_ID_SALT and the salt file is unusable: {str(e)}")
+            return False
+        if not self.salt:
+            logger.error(f"Tracing disabled: no TRACE_ID_SALT and {path} is empty")
+        return bool(self.salt)
+        
+    def _open_writer(self):
+        """Write one JSON span per line, rotating files by size."""
+        try:
+            Path(self.trace_dir).mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(
+                Path(self.trace_dir) / "spans.jsonl", maxBytes=self.max_bytes, backupCount=self.backups,
+                encoding='utf-8'
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self.writer = logging.getLogger(f"chiron.traces.{id(self)}")
+            self.writer.propagate = False
+            self.writer.setLevel(logging.INFO)
+            self.writer.addHandler(handler)
+            logger.info(f"Writing trace spans to {self.trace_dir}")
+        except Exception as e:
+            logger.error(f"Error opening trace directory: {str(e)}")
+            self.writer = None
+            
+    def export(self, span):
+        if self.writer is not None:
+            self.writer.info(json.dumps(span.to_dict(), default=str, ensure_ascii=False))
+            
+    def surrogate(self, identifier):
+        """Stable, non-reversible stand-in for a patient identifier."""
+        if identifier is None:
+            return None
+        if self.raw_ids:
+            return str(identifier)
+        return hashlib.sha256(f"{self.salt}:{identifier}".encode('utf-8')).hexdigest()[:16]
+        
+    def close(self):
+        if self.writer is not None:
+            for handler in list(self.writer.handlers):
+                handler.close()
+                self.writer.removeHandler(handler)
+            self.writer = None
+
+_tracer = Tracer()
+
+def configure_tracing(config):
+    """Install the process-wide tracer; spans are only recorded when TRACE_DIR is set."""
+    global _tracer
+    _tracer.close()
+    _tracer = Tracer(config)
+    return _tracer
+
+def get_tracer():
+    return _tracer
+
+def current_span():
+    return _current_span.get()
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a block as a child of the current span, or as a new trace if there is none.
+    
+    Args:
+        name (str): Span name, e.g. "asr.transcribe"
+        **attributes: Values recorded with the span
+        
+    Yields:
+        Span: The open span, or None when tracing is disabled
+    """
+    tracer = _tracer
+    if not tracer.enabled:
+        yield None
+        return
+        
+    parent = _current_span.get()
+    opened = Span(name, parent.trace_id if parent else uuid.uuid4().hex, parent.span_id if parent else None, attributes)
+    token = _current_span.set(opened)
+    started = time.perf_counter()
+    try:
+        yield opened
+    except BaseException as e:
+        opened.error = f"{type(e).__name__}: {str(e)}"
+        raise
+    finally:
+        opened.duration = time.perf_counter() - started
+        _current_span.reset(token)
+        tracer.export(opened)
+
+def encounter_span(patient_id=None, visit_date=None, **attributes):
+    """Root span for one encounter; the patient id is recorded as a hashed surrogate."""
+    return span("encounter", patient=_tracer.surrogate(patient_id), visit_date=visit_date, **attributes)
+
+def record_span(name, start, duration, parent=None, **attributes):
+    """Export a span timed elsewhere, e.g. a stage that ran in a worker process."""
+    tracer = _tracer
+    if not tracer.enabled:
+        return
+    parent = parent or _current_span.get()
+    recorded = Span(name, parent.trace_id if parent else uuid.uuid4().hex, parent.span_id if parent else None, attributes)
+    recorded.start = start
+    recorded.duration = duration
+    tracer.export(recorded)
+
+def propagate(fn):
+    """Bind fn to the caller's trace context, for work handed to another thread."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+def chrome_trace(span_files, output_path):
+    """
+    Convert JSONL span files into a Chrome trace-event file (chrome://tracing, Perfetto).
+    
+    Args:
+        span_files (list): JSONL files written by the tracer
+        output_path (str): Where to write the trace-event JSON
+        
+    Returns:
+        int: Number of spans converted
+    """
+    events = []
+    encounters = {}
+    for span_file in span_files:
+        with open(span_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                # Each encounter gets its own row group in the viewer
+                pid = encounters.setdefault(record["trace_id"], len(encounters) + 1)
+                args = dict(record.get("attributes") or {}, span_id=record["span_id"], parent_id=record["parent_id"])
+                if record.get("error"):
+                    args["error"] = record["error"]
+                events.append({
+                    "name": record["name"],
+                    "cat": record["name"].split(".")[0],
+                    "ph": "X",
+                    "ts": record["start"] * 1e6,
+                    "dur": (record["duration"] or 0) * 1e6,
+                    "pid": pid,
+                    "tid": record.get("thread") or "main",
+                    "args": args
+                })
+                
+    for trace_id, pid in encounters.items():
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"trace {trace_id[:8]}"}})
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return len(events) - len(encounters)
+
+if __name__ == "__main__":
+    # python -m src.utils.tracing data/traces trace.json
+    trace_dir, output = Path(sys.argv[1]), sys.argv[2]
+    files = sorted(trace_dir.glob("spans.jsonl*"), key=lambda p: p.stat().st_mtime)
+    print(f"Wrote {chrome_trace(files, output)} spans to {output}")
@@ -0,0 +1,69 @@
+"""
+Tests for backend selection and the offline stub models.
+"""
+import json
+import numpy as np
+import pytest
+from src.backends import get_backend
+from src.backends.stub import HashingEncoder, StubBackend, StubNER, StubWhisper
+
+def test_get_backend_selects_stub():
+    backend = get_backend({'MODEL_BACKEND': 'STUB'})
+    
+    assert isinstance(backend, StubBackend)
+    assert backend.name == "stub"
+    assert backend.device() == "cpu"
+
+def test_get_backend_rejects_unknown_names():
+    with pytest.raises(ValueError, match="Unknown MODEL_BACKEND"):
+        get_backend({'MODEL_BACKEND': 'onnx'})
+
+def test_hashing_encoder_is_deterministic_and_normalized():
+    encoder = HashingEncoder()
+    first = encoder.encode("knee pain and swelling")
+    
+    assert first.shape == (1, 768)
+    assert first.dtype == np.float32
+    assert np.allclose(first, HashingEncoder().encode("Knee pain, and swelling"))
+    assert np.isclose(np.linalg.norm(first), 1.0)
+    assert not np.any(encoder.encode(""))
+
+def test_hashing_encoder_places_shared_words_closer():
+    encoder = HashingEncoder()
+    query = encoder.encode("knee pain swelling")
+    
+    near = (query @ encoder.encode("knee swelling arthritis").T)[0, 0]
+    far = (query @ encoder.encode("cough wheezing sputum").T)[0, 0]
+    assert near > far
+
+def test_stub_ner_tags_lexicon_terms_like_the_ner_pipeline():
+    ner = StubNER({"PROBLEM": ["pain", "back pain"], "ANATOMY": ["back", "knee"]})
+    text = "Back pain and knee pain since Monday."
+    
+    entities = ner(text)
+    
+    assert [(e["word"], e["entity_group"]) for e in entities] == [
+        ("Back pain", "problem"), ("knee", "anatomy"), ("pain", "problem")
+    ]
+    assert all(text[e["start"]:e["end"]] == e["word"] and e["score"] > 0.7 for e in entities)
+
+def test_stub_backend_reads_the_configured_lexicon(tmp_path):
+    terms = tmp_path / "terms.json"
+    terms.write_text(json.dumps({"TEST": ["MRI"]}), encoding='utf-8')
+    
+    ner = StubBackend({'MEDICAL_TERMS_PATH': str(terms)}).load_ner("unused", "cpu")
+    
+    assert [e["word"] for e in ner("An mri was ordered.")] == ["mri"]
+    assert StubBackend({'MEDICAL_TERMS_PATH': str(tmp_path / "missing.json")}).load_ner("unused", "cpu")("pain") == []
+
+def test_stub_whisper_prefers_sidecar_text(tmp_path):
+    audio = tmp_path / "visit.wav"
+    audio.write_bytes(b"\0" * 64000)
+    whisper = StubWhisper()
+    
+    filler = whisper.transcribe(str(audio), language="en")["text"]
+    assert len(filler.split()) == 5
+    
+    audio.with_suffix(".txt").write_text("Patient reports knee pain.\n", encoding='utf-8')
+    assert whisper.transcribe(audio)["text"] == "Patient reports knee pain."
+    assert len(whisper.transcribe(np.zeros(32000, dtype=np.float32))["text"].split()) == 5
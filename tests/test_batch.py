@@ -0,0 +1,88 @@
+"""
+Tests for parallel batch processing.
+"""
+import hashlib
+import random
+import threading
+import time
+from types import SimpleNamespace
+from src.nlp.batch import BatchProcessor
+
+class FakePipeline:
+    """Pipeline stand-in whose stages take a random amount of time."""
+    def __init__(self):
+        self.saved = []
+        self.template_filler = SimpleNamespace(save_soap_note=self.save_soap_note)
+        
+    def run_stages(self, transcription, thread_pool=None, process_pool=None):
+        if transcription == "fail":
+            raise ValueError("bad transcript")
+        time.sleep(random.uniform(0, 0.02))
+        results = {"keywords": [], "template": {"name": "t"}, "soap_note": {"subjective": transcription}}
+        return results, {"keywords": 0.001, "soap_note": 0.002}
+        
+    def save_soap_note(self, soap_note, patient_id=None, visit_date=None):
+        self.saved.append(soap_note["subjective"])
+        return f"{patient_id}_{visit_date}.txt"
+        
+    def _save_pipeline_output(self, transcription, keywords, template, soap_note, patient_id, visit_date):
+        pass
+
+def test_results_are_written_once_in_input_order(tmp_path):
+    files = []
+    for i in range(20):
+        path = tmp_path / f"P{i:02d}_20240101.txt"
+        path.write_text(f"visit {i}")
+        files.append(path)
+        
+    pipeline = FakePipeline()
+    processor = BatchProcessor(pipeline, {'BATCH_WORKERS': 4, 'BATCH_PREFETCH': 2})
+    records = processor.run(files)
+    
+    assert pipeline.saved == [f"visit {i}" for i in range(20)]
+    assert [record["output"] for record in records] == [f"P{i:02d}_20240101.txt" for i in range(20)]
+    # The manifest fingerprint is of the bytes that were read
+    assert records[3]["fingerprint"][0] == len(b"visit 3")
+    assert records[3]["fingerprint"][2] == hashlib.sha256(b"visit 3").hexdigest()
+    report = processor.last_report
+    assert report["documents"] == 20 and report["failed"] == 0
+    assert report["docs_per_sec"] > 0
+    assert report["stage_seconds"]["soap_note"] > 0
+
+def test_failures_are_recorded_without_stopping_the_batch(tmp_path):
+    good = tmp_path / "A_20240101.txt"
+    good.write_text("visit")
+    bad = tmp_path / "B_20240101.txt"
+    bad.write_text("fail")
+    
+    processor = BatchProcessor(FakePipeline(), {'BATCH_WORKERS': 2})
+    records = processor.run([bad, tmp_path / "missing.txt", good])
+    
+    assert records[0]["error"] == "bad transcript"
+    assert records[1]["error"] is not None
+    assert records[2]["output"] == "A_20240101.txt"
+    assert processor.last_report["failed"] == 2
+
+def test_run_returns_when_the_result_callback_raises(tmp_path):
+    files = []
+    for i in range(50):
+        path = tmp_path / f"P{i:02d}_20240101.txt"
+        path.write_text(f"visit {i}")
+        files.append(path)
+        
+    def on_result(record):
+        raise RuntimeError("callback failed")
+        
+    processor = BatchProcessor(FakePipeline(), {'BATCH_WORKERS': 2, 'BATCH_PREFETCH': 2})
+    finished = threading.Event()
+    
+    def run():
+        try:
+            processor.run(files, on_result=on_result)
+        except RuntimeError:
+            finished.set()
+            
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    # The reader is left blocked on the full prefetch queue unless run() stops it
+    assert finished.wait(timeout=10)
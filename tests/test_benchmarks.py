@@ -0,0 +1,60 @@
+"""
+Tests for the benchmark corpus and result comparison.
+"""
+import json
+from pathlib import Path
+import pytest
+from benchmarks.corpus import CorpusBuilder, synthetic_audio
+from benchmarks.run import BenchmarkSuite, compare, main, summarize
+from src.utils.config import load_config
+
+def test_corpus_is_deterministic():
+    corpus = CorpusBuilder(seed=3).transcripts(["short", "medium"], per_size=2)
+    assert corpus == CorpusBuilder(seed=3).transcripts(["short", "medium"], per_size=2)
+    assert corpus != CorpusBuilder(seed=4).transcripts(["short", "medium"], per_size=2)
+    # Subsets of the corpus are the same transcripts
+    assert CorpusBuilder(seed=3).transcripts(["medium"], per_size=1)[0] == corpus[2]
+    
+    short, medium = corpus[0], corpus[2]
+    assert len(short["text"].split()) >= 150 and len(medium["text"].split()) >= 600
+    assert any(keyword in short["text"] for keyword in short["keywords"])
+    assert (synthetic_audio(1, seed=1) == synthetic_audio(1, seed=1)).all()
+
+def test_compare_flags_regressions():
+    baseline = {"results": {"rules/short": summarize([0.010, 0.010]), "ner/short": {"skipped": "no model"}}}
+    current = {"results": {"rules/short": summarize([0.013, 0.013]), "fill/short": summarize([0.002])}}
+    rows = {row["benchmark"]: row for row in compare(current, baseline, threshold=0.1)}
+    assert rows["rules/short"]["status"] == "regression"
+    assert abs(rows["rules/short"]["change"] - 0.3) < 1e-9
+    assert rows["ner/short"]["status"] == "missing" and rows["fill/short"]["status"] == "new"
+    assert compare(baseline, baseline)[0]["status"] == "ok"
+
+def test_suite_times_available_stages():
+    results = BenchmarkSuite(per_size=1, repeat=1, sizes=["short"]).run(["clean_text"])
+    assert results["results"]["clean_text/short"]["calls"] == 1
+    assert results["meta"]["seed"] == 0
+
+def test_stages_with_a_baseline_that_stop_running_fail_the_comparison(tmp_path, capsys):
+    baseline = {"results": {"rules/short": summarize([0.010]), "ner/short": summarize([0.020])}}
+    current = {"results": {"rules/short": summarize([0.010]), "ner/short": {"skipped": "no model"}}}
+    rows = {row["benchmark"]: row for row in compare(current, baseline)}
+    assert rows["ner/short"]["status"] == "failed"
+    assert rows["rules/short"]["status"] == "ok"
+    
+    paths = []
+    for name, results in (("current", current), ("baseline", baseline)):
+        paths.append(tmp_path / f"{name}.json")
+        paths[-1].write_text(json.dumps(results), encoding='utf-8')
+    assert main(["--input", str(paths[0]), "--baseline", str(paths[1])]) == 1
+    assert "1 failed or skipped" in capsys.readouterr().out
+
+def test_suite_matches_templates_with_the_loaded_config(monkeypatch):
+    pytest.importorskip("faiss")
+    monkeypatch.setenv("MODEL_BACKEND", "stub")
+    monkeypatch.delenv("VECTOR_DB_PATH", raising=False)
+    suite = BenchmarkSuite(load_config(), per_size=1, repeat=1, sizes=["short"])
+    
+    results = suite.run(["matching"])["results"]
+    
+    assert results["matching/short"]["calls"] == 1
+    assert Path(suite.config['VECTOR_DB_PATH']).parent == suite.workdir
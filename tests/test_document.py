@@ -0,0 +1,53 @@
+"""
+Tests for the shared analyzed document.
+"""
+import pickle
+import re
+from src.nlp.document import Document, TermIndex
+from src.nlp.template_filler import TemplateFiller
+
+TERMS = {
+    "PROBLEM": ["pain", "back pain", "shortness of breath", "swelling"],
+    "TEST": ["X-ray", "MRI"],
+    "ANATOMY": ["back", "knee"],
+}
+
+def test_term_index_matches_per_term_regex_scan():
+    text = "Back pain and knee swelling. X-ray of the knee; no MRI. Painful? shortness of breath, backpain."
+    pairs = [(category, term) for category, terms in TERMS.items() for term in terms]
+    index = TermIndex((term, (position, category)) for position, (category, term) in enumerate(pairs))
+    found = sorted(Document(text).find_terms(index), key=lambda m: (m.payload[0], m.start))
+    
+    expected = [
+        (category, match.start(), match.end())
+        for category, term in pairs
+        for match in re.finditer(r'\b' + re.escape(term.lower()) + r'\b', text.lower())
+    ]
+    assert [(m.payload[1], m.start, m.end) for m in found] == expected
+
+def test_analyses_run_once_and_survive_pickling():
+    calls = []
+    document = Document("Knee pain. Started last week!\nNo fever.")
+    for _ in range(2):
+        document.analysis("length", lambda text: calls.append(text) or len(text))
+    assert calls == [document.text]
+    assert document.sentence_texts() == ["Knee pain.", "Started last week!", "No fever."]
+    assert Document.of(document) is document
+    
+    copy = pickle.loads(pickle.dumps(document))
+    assert copy.analyses["length"] == len(document.text)
+    assert copy.sentence_texts() == document.sentence_texts()
+
+def test_fill_reuses_document_analyses(tmp_path):
+    filler = TemplateFiller({'SOAP_OUTPUT_DIR': str(tmp_path)})
+    calls = []
+    scan = filler.analyzers["scan"]
+    filler.analyzers["scan"] = lambda text: calls.append(text) or scan(text)
+    document = Document("Past medical history: asthma. Vital signs: stable.")
+    
+    filler.analyze_transcript(document)
+    note = filler.fill_template(
+        {"template": {"subjective": "History of [HISTORY].", "objective": "Vitals: [VITALS]."}}, document, []
+    )
+    assert note == {"subjective": "History of asthma.", "objective": "Vitals: stable."}
+    assert len(calls) == 1
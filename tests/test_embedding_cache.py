@@ -0,0 +1,55 @@
+"""
+Tests for the template-matching query embedding cache.
+"""
+import numpy as np
+import pytest
+from src.storage.embedding_cache import EmbeddingCache
+
+def test_normalize_keywords_is_order_and_case_insensitive():
+    first = EmbeddingCache.normalize_keywords([
+        {"text": "Knee", "label": "ANATOMY"},
+        {"text": "pain", "label": "PROBLEM"},
+        {"text": "MRI", "label": "TEST"},
+        {"text": "knee", "label": "ANATOMY"}
+    ])
+    second = EmbeddingCache.normalize_keywords(["mri", "PAIN", "knee"])
+    assert first == second == ("knee", "mri", "pain")
+
+def test_cache_round_trip_through_disk(tmp_path):
+    config = {'EMBEDDING_CACHE_PATH': str(tmp_path / "cache.sqlite"), 'EMBEDDING_CACHE_SIZE': 2}
+    key = EmbeddingCache.make_key(("knee", "pain"), "v1")
+    embedding = np.arange(4, dtype=np.float32).reshape(1, -1)
+    
+    cache = EmbeddingCache(config)
+    assert cache.get(key) is None
+    cache.put(key, embedding, "knee_exam")
+    
+    reopened = EmbeddingCache(config)
+    cached_embedding, template_id = reopened.get(key)
+    assert template_id == "knee_exam"
+    assert np.array_equal(cached_embedding, embedding)
+    assert reopened.hits == 1
+
+def test_version_changes_key():
+    keywords = ("knee", "pain")
+    assert EmbeddingCache.make_key(keywords, "v1") != EmbeddingCache.make_key(keywords, "v2")
+
+def test_memory_lru_evicts_oldest():
+    cache = EmbeddingCache({'EMBEDDING_CACHE_PATH': '', 'EMBEDDING_CACHE_SIZE': 2})
+    for key in ("a", "b", "c"):
+        cache.put(key, np.zeros((1, 2)), key)
+    assert list(cache.entries) == ["b", "c"]
+    assert cache.get("a") is None
+
+def test_zero_cache_size_disables_the_query_cache(tmp_path):
+    pytest.importorskip("faiss")
+    from src.nlp.template_matcher import TemplateMatcher
+    config = {
+        'MODEL_BACKEND': 'stub',
+        'TEMPLATES_DIR': str(tmp_path / "templates"),
+        'VECTOR_DB_PATH': str(tmp_path / "vector_db"),
+        'EMBEDDING_CACHE_PATH': ''
+    }
+    
+    assert TemplateMatcher(dict(config, EMBEDDING_CACHE_SIZE=0)).query_cache is None
+    assert TemplateMatcher(config).query_cache.max_entries == 1024
@@ -0,0 +1,83 @@
+"""
+End-to-end runs of the NLP pipeline and local SOAP generation on the offline stub models.
+"""
+import json
+import pytest
+
+pytest.importorskip("faiss")
+
+from src.nlp.pipeline import NLPPipeline
+
+TRANSCRIPT = (
+    "Patient reports a severe headache for three days with nausea. Blood pressure 150/95. "
+    "She is allergic to penicillin. I am prescribing sumatriptan 50 mg."
+)
+
+@pytest.fixture
+def config(tmp_path):
+    return {
+        'MODEL_BACKEND': 'stub',
+        'SOAP_OUTPUT_DIR': str(tmp_path / "soap_notes"),
+        'PIPELINE_OUTPUT_DIR': str(tmp_path / "pipeline"),
+        'VECTOR_DB_PATH': str(tmp_path / "vector_db"),
+        'EMBEDDING_CACHE_PATH': '',
+        'LLM_CACHE_PATH': ''
+    }
+
+def test_pipeline_process_writes_a_filled_note(config, tmp_path):
+    pipeline = NLPPipeline(config)
+    try:
+        soap_note = pipeline.process(TRANSCRIPT, "P1", "20240105")
+        pipeline.flush()
+    finally:
+        pipeline.close()
+        
+    assert set(soap_note) == {"subjective", "objective", "assessment", "plan"}
+    assert "headache" in soap_note["subjective"]
+    assert "BP 150/95" in soap_note["objective"]
+    assert "sumatriptan 50 mg" in soap_note["plan"] and "penicillin" not in soap_note["plan"]
+    
+    saved = tmp_path / "soap_notes" / "P1_20240105_soap.json"
+    assert json.loads(saved.read_text(encoding='utf-8')) == soap_note
+    assert (tmp_path / "pipeline" / "P1_20240105_pipeline.json").exists()
+
+def test_local_generation_from_the_pipeline_match(config):
+    pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+    from src.nlp.llm_generator import LLMGenerator
+    
+    pipeline = NLPPipeline(config)
+    try:
+        results, _ = pipeline.run_stages(TRANSCRIPT)
+    finally:
+        pipeline.close()
+    assert results["template"]["id"] == "headache"
+    
+    config.update({'LLAMA_MODEL_PATH': 'stub-llama', 'LLM_DEVICE': 'cpu', 'LLM_OUTPUT_TOKENS': 16})
+    generator = LLMGenerator(config)
+    note = generator.generate_soap_note(results["template"], results["keywords"], TRANSCRIPT)
+    
+    assert isinstance(note, str)
+    assert 0 < generator.last_stats["new_tokens"] <= 16
+    assert generator.last_stats["prompt_tokens"] > len(TRANSCRIPT)
+    # Greedy decoding on fixed stub weights gives the same note every time
+    assert LLMGenerator(config).generate_soap_note(results["template"], results["keywords"], TRANSCRIPT) == note
+
+def test_editing_template_text_changes_the_pipeline_version(config, tmp_path):
+    templates = tmp_path / "templates"
+    templates.mkdir()
+    template = {"id": "knee_exam", "name": "Knee", "keywords": ["knee"], "template": {"plan": "Rest. [MEDICATIONS]."}}
+    (templates / "knee_exam.json").write_text(json.dumps(template), encoding='utf-8')
+    config['TEMPLATES_DIR'] = str(templates)
+    
+    versions = []
+    for plan in ("Rest. [MEDICATIONS].", "Ice and rest. [MEDICATIONS]."):
+        template["template"]["plan"] = plan
+        (templates / "knee_exam.json").write_text(json.dumps(template), encoding='utf-8')
+        pipeline = NLPPipeline(config)
+        try:
+            versions.append(pipeline.version())
+        finally:
+            pipeline.close()
+            
+    assert versions[0] != versions[1]
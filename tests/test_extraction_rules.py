@@ -0,0 +1,54 @@
+"""
+Tests for the declarative extraction rule engine.
+"""
+import json
+from src.nlp.extraction_rules import RuleSet, get_rule_set
+
+def test_default_rules_scan():
+    rules = get_rule_set('data/rules')
+    scan = rules.scan("Past medical history: asthma. Vitals: stable. I recommended ibuprofen.")
+    assert scan.first("history") == "asthma"
+    assert scan.first("vitals") == "stable"
+    assert scan.first("medications") == "ibuprofen"
+    assert scan.first("exam") is None
+
+def test_group_priority_and_overlapping_rules():
+    rules = RuleSet([
+        {"name": "late", "group": "history", "pattern": "history of ([^.]*)"},
+        {"name": "early", "group": "history", "pattern": "(?:past medical history|pmh):? ([^.]*)"},
+        {"name": "any_history", "group": "mentions", "pattern": "(history)"}
+    ])
+    scan = rules.scan("History of asthma. PMH: diabetes.")
+    assert scan.first("history") == "asthma"
+    assert [m.value for m in scan.get("early")] == ["diabetes"]
+    # Rules starting at the same offset as another rule still match
+    assert len(scan.get("any_history")) == 1
+
+def test_specialty_rules_override_by_name(tmp_path):
+    base = {"rules": [{"name": "rom", "group": "rom", "pattern": "range of motion is ([^.]*)"}]}
+    specialty = {"rules": [{"name": "rom", "group": "rom", "pattern": "rom:? ([^.]*)"}]}
+    (tmp_path / "default.json").write_text(json.dumps(base))
+    (tmp_path / "orthopedics.json").write_text(json.dumps(specialty))
+    
+    rules = RuleSet.from_directory(tmp_path)
+    assert len(rules.rules) == 1
+    assert rules.scan("ROM: full and painless.").first("rom") == "full and painless"
+
+def test_global_inline_flags_are_scoped_per_rule():
+    rules = RuleSet([
+        {"name": "exam", "pattern": "(?i)exam:? ([^.]*)", "case_sensitive": True},
+        {"name": "plan", "pattern": "(?s)(?x) plan: \\s (\\w+)"}
+    ])
+    scan = rules.scan("EXAM: normal gait. Plan: rest.")
+    assert len(rules.rules) == 2
+    assert scan.first("exam") == "normal gait"
+    assert scan.first("plan") == "rest"
+
+def test_rules_that_cannot_be_combined_are_skipped(caplog):
+    rules = RuleSet([
+        {"name": "late_flag", "pattern": "pain(?i) (\\w+)"},
+        {"name": "ok", "pattern": "pain (\\w+)"}
+    ])
+    assert [rule.name for rule in rules.rules] == ["ok"]
+    assert "late_flag" in caplog.text
+    assert rules.scan("Pain improving.").first("ok") == "improving"
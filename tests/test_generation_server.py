@@ -0,0 +1,40 @@
+"""
+Tests for the continuous-batching generation server, run against the stub backend's tiny model.
+"""
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from src.nlp.generation_server import GenerationServer
+from src.nlp.llm_generator import LLMGenerator
+
+TEMPLATE = {"id": "knee_exam", "template": {"subjective": "Patient presents with knee pain. [SYMPTOMS]."}}
+
+TRANSCRIPTS = [
+    "Knee hurts.",
+    "Knee hurts when climbing stairs and at night, worse after running for a long time.",
+    "Pain.",
+    "Swelling of the left knee since Monday after a fall at work."
+]
+
+def test_batched_notes_match_sequential_generation():
+    generator = LLMGenerator({
+        'MODEL_BACKEND': 'stub',
+        'LLAMA_MODEL_PATH': 'stub-llama',
+        'LLM_DEVICE': 'cpu',
+        'LLM_CACHE_PATH': '',
+        'LLM_OUTPUT_TOKENS': 16
+    })
+    sequential = [generator.generate_soap_note(TEMPLATE, ["knee"], transcript) for transcript in TRANSCRIPTS]
+    
+    server = GenerationServer(generator, {'LLM_MAX_BATCH': 4}).start()
+    try:
+        # Prompts of different lengths share the batch with left padding
+        futures = [server.submit(TEMPLATE, ["knee"], transcript) for transcript in TRANSCRIPTS]
+        batched = [future.result(timeout=60) for future in futures]
+    finally:
+        server.stop()
+        
+    assert batched == sequential
+    assert server.metrics()["completed"] == len(TRANSCRIPTS)
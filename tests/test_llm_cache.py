@@ -0,0 +1,80 @@
+"""
+Tests for the encrypted LLM response cache.
+"""
+import sqlite3
+import time
+import pytest
+from cryptography.fernet import Fernet
+from src.storage.llm_cache import LLMResponseCache
+from src.nlp.llm_stub_server import StubLLMServer
+from src.nlp.template_filler import TemplateFiller
+
+PARAMS = {"temperature": 0.3, "max_tokens": 1000}
+
+@pytest.fixture(autouse=True)
+def encryption_key(monkeypatch):
+    monkeypatch.setenv('ENCRYPTION_KEY', Fernet.generate_key().decode())
+
+def test_responses_are_encrypted_at_rest(tmp_path):
+    path = tmp_path / "llm.sqlite"
+    key = LLMResponseCache.make_key("SUBJECTIVE: knee pain", "local-model", PARAMS)
+    
+    LLMResponseCache({'LLM_CACHE_PATH': str(path)}).put(key, "SUBJECTIVE:\nknee pain")
+    
+    stored = sqlite3.connect(str(path)).execute("SELECT response FROM llm_cache").fetchone()[0]
+    assert b"knee pain" not in stored
+    assert LLMResponseCache({'LLM_CACHE_PATH': str(path)}).get(key) == "SUBJECTIVE:\nknee pain"
+
+def test_cache_is_off_without_an_encryption_key(tmp_path, monkeypatch, caplog):
+    monkeypatch.delenv('ENCRYPTION_KEY')
+    cache = LLMResponseCache({'LLM_CACHE_PATH': str(tmp_path / "llm.sqlite")})
+    cache.put("a", "response a")
+    
+    assert not cache.enabled and cache.get("a") is None
+    assert not (tmp_path / "llm.sqlite").exists()
+    assert [r.levelname for r in caplog.records if "ENCRYPTION_KEY" in r.getMessage()] == ["WARNING"]
+
+def test_key_ignores_whitespace_but_not_parameters():
+    key = LLMResponseCache.make_key("knee  pain\n", "model", PARAMS)
+    assert key == LLMResponseCache.make_key("knee pain", "model", PARAMS)
+    assert key != LLMResponseCache.make_key("knee pain", "model", {"temperature": 0.0, "max_tokens": 1000})
+    assert key != LLMResponseCache.make_key("knee pain", "other-model", PARAMS)
+
+def test_expiry_eviction_and_sampled_opt_out(tmp_path):
+    cache = LLMResponseCache({'LLM_CACHE_PATH': str(tmp_path / "llm.sqlite"), 'LLM_CACHE_SIZE': 2})
+    for name in ("a", "b", "c"):
+        cache.put(name, f"response {name}")
+    assert cache.get("a") is None
+    assert cache.get("c") == "response c"
+    
+    cache.ttl = 0.01
+    time.sleep(0.02)
+    assert cache.get("c") is None
+    
+    assert cache.is_cacheable(PARAMS)
+    cache.cache_sampled = False
+    assert not cache.is_cacheable(PARAMS)
+    assert cache.is_cacheable({"temperature": 0.0})
+
+def test_zero_size_disables_and_zero_ttl_expires_at_once(tmp_path):
+    assert not LLMResponseCache({'LLM_CACHE_PATH': str(tmp_path / "off.sqlite"), 'LLM_CACHE_SIZE': 0}).enabled
+    
+    cache = LLMResponseCache({'LLM_CACHE_PATH': str(tmp_path / "llm.sqlite"), 'LLM_CACHE_TTL': 0})
+    cache.put("a", "response a")
+    assert cache.enabled and cache.get("a") is None
+
+def test_unchanged_encounter_is_not_regenerated(tmp_path):
+    template = {"name": "Knee Examination", "template": {"subjective": "Patient reports [SYMPTOMS]."}}
+    with StubLLMServer() as server:
+        filler = TemplateFiller({
+            'LLM_BASE_URL': server.url,
+            'SOAP_OUTPUT_DIR': str(tmp_path),
+            'LLM_CACHE_PATH': str(tmp_path / "llm.sqlite")
+        })
+        first = filler.fill_template(template, "Knee pain for three weeks.", [])
+        second = filler.fill_template(template, "Knee pain  for three weeks.", [])
+        filler.llm_client.close()
+        
+    assert first == second == {"subjective": "Patient reports symptoms."}
+    assert server.request_count == 1
+    assert filler.response_cache.hits == 1
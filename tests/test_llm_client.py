@@ -0,0 +1,82 @@
+"""
+Tests for the pooled LLM client against the local stub server.
+"""
+import pytest
+from src.nlp.llm_client import LLMClient
+from src.nlp.llm_stub_server import StubLLMServer
+from src.nlp.template_filler import TemplateFiller
+
+def test_concurrent_completions():
+    with StubLLMServer(latency=0.05) as server:
+        client = LLMClient({'LLM_BASE_URL': server.url, 'LLM_MAX_CONCURRENCY': 4})
+        futures = [
+            client.submit([{"role": "user", "content": f"SUBJECTIVE: note {i}"}]) for i in range(8)
+        ]
+        results = [future.result(timeout=10) for future in futures]
+        client.close()
+        
+    assert results[3] == "SUBJECTIVE:\nnote 3"
+    assert client.latency_summary()["calls"] == 8
+
+def test_retries_transient_failures():
+    with StubLLMServer(fail_first=2) as server:
+        client = LLMClient({'LLM_BASE_URL': server.url, 'LLM_MAX_RETRIES': 3, 'LLM_BACKOFF_BASE': 0.01})
+        assert client.complete([{"role": "user", "content": "PLAN: rest"}]) == "PLAN:\nrest"
+        client.close()
+        
+    assert server.request_count == 3
+    assert client.latency_summary()["retries"] == 2
+
+def test_template_filler_uses_local_endpoint(tmp_path):
+    template = {
+        "name": "Knee Examination",
+        "template": {"subjective": "Patient reports [SYMPTOMS].", "plan": "Plan: [TREATMENT]."}
+    }
+    with StubLLMServer() as server:
+        filler = TemplateFiller({'LLM_BASE_URL': server.url, 'SOAP_OUTPUT_DIR': str(tmp_path), 'LLM_CACHE_PATH': ''})
+        soap_note = filler.submit_fill(template, "Knee pain for three weeks.", []).result(timeout=10)
+        filler.llm_client.close()
+        
+    assert soap_note == {"subjective": "Patient reports symptoms.", "plan": "Plan: treatment."}
+
+def test_streamed_fill_publishes_sections(tmp_path):
+    template = {
+        "name": "Knee Examination",
+        "template": {"subjective": "Patient reports [SYMPTOMS].", "plan": "Plan: [TREATMENT]."}
+    }
+    published = []
+    with StubLLMServer(token_delay=0.001) as server:
+        filler = TemplateFiller({'LLM_BASE_URL': server.url, 'SOAP_OUTPUT_DIR': str(tmp_path), 'LLM_CACHE_PATH': ''})
+        soap_note = filler.fill_template(
+            template, "Knee pain for three weeks.", [], on_section=lambda name, text: published.append(name)
+        )
+        summary = filler.llm_client.latency_summary()
+        filler.llm_client.close()
+        
+    assert soap_note == {"subjective": "Patient reports symptoms.", "plan": "Plan: treatment."}
+    assert published == ["subjective", "plan"]
+    assert summary["first_token_p50"] <= summary["max"]
+
+def test_zero_retries_fails_on_the_first_error():
+    with StubLLMServer(fail_first=1) as server:
+        client = LLMClient({'LLM_BASE_URL': server.url, 'LLM_MAX_RETRIES': 0})
+        with pytest.raises(Exception):
+            client.complete([{"role": "user", "content": "PLAN: rest"}])
+        client.close()
+        
+    assert client.max_retries == 0
+    assert server.request_count == 1
+    assert LLMClient({}).max_retries == 3
+
+def test_client_setup_errors_reach_the_caller(monkeypatch):
+    def broken_client(**kwargs):
+        raise ValueError("bad base url")
+        
+    monkeypatch.setattr("openai.AsyncOpenAI", broken_client)
+    client = LLMClient({'LLM_BASE_URL': 'http://127.0.0.1:9'})
+    
+    # Each call fails promptly instead of waiting on a loop that never started
+    for _ in range(2):
+        with pytest.raises(ValueError, match="bad base url"):
+            client.complete([{"role": "user", "content": "PLAN: rest"}])
+    assert client._loop is None
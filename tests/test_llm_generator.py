@@ -0,0 +1,51 @@
+"""
+Tests for local SOAP note generation, run against the stub backend's tiny model.
+"""
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from src.nlp.llm_generator import LLMGenerator
+
+TEMPLATE = {"id": "knee_exam", "template": {"subjective": "Patient presents with knee pain. [SYMPTOMS]."}}
+
+def make_generator(**overrides):
+    config = {
+        'MODEL_BACKEND': 'stub',
+        'LLAMA_MODEL_PATH': 'stub-llama',
+        'LLM_DEVICE': 'cpu',
+        'LLM_CACHE_PATH': '',
+        'LLM_OUTPUT_TOKENS': 16
+    }
+    config.update(overrides)
+    return LLMGenerator(config)
+
+def test_prefix_cache_matches_uncached_generation():
+    cached = make_generator()
+    uncached = make_generator(LLM_PREFIX_CACHE_SIZE=0)
+    
+    for transcript in ("Knee hurts.", "Knee hurts when climbing stairs."):
+        note = cached.generate_soap_note(TEMPLATE, ["knee", "pain"], transcript)
+        assert note == uncached.generate_soap_note(TEMPLATE, ["knee", "pain"], transcript)
+        
+    # The second call resumes from the template prefix computed by the first
+    assert cached.last_stats["prefix_cached_tokens"] > 0
+    assert len(cached.prefix_cache) == 1
+    assert uncached.last_stats["prefix_cached_tokens"] == 0
+
+def test_draft_stats_count_proposed_and_accepted_tokens():
+    plain = make_generator(LLM_OUTPUT_TOKENS=24).generate_soap_note(TEMPLATE, ["knee"], "Knee hurts.")
+    
+    # A draft identical to the main model has every proposal accepted
+    same = make_generator(LLM_OUTPUT_TOKENS=24, LLM_DRAFT_MODEL_PATH='stub-llama')
+    assert same.generate_soap_note(TEMPLATE, ["knee"], "Knee hurts.") == plain
+    stats = same.last_stats
+    assert stats["draft_accepted"] + stats["target_passes"] == stats["new_tokens"]
+    assert stats["acceptance_rate"] >= 0.9
+    assert stats["tokens_per_target_pass"] == stats["new_tokens"] / stats["target_passes"] > 1
+    
+    # An unrelated draft changes the cost but never the greedy output
+    other = make_generator(LLM_OUTPUT_TOKENS=24, LLM_DRAFT_MODEL_PATH='stub-draft')
+    assert other.generate_soap_note(TEMPLATE, ["knee"], "Knee hurts.") == plain
+    assert 0 <= other.last_stats["draft_accepted"] <= other.last_stats["draft_proposed"]
@@ -0,0 +1,66 @@
+"""
+Tests for the batch manifest.
+"""
+import hashlib
+import os
+from src.storage.manifest import BatchManifest
+
+def test_unchanged_inputs_are_skipped_and_failures_retried(tmp_path):
+    out = tmp_path / "out"
+    out.mkdir()
+    inputs = [tmp_path / f"P{i}_20240101.txt" for i in range(3)]
+    for path in inputs:
+        path.write_text(f"visit {path.stem}")
+    manifest = BatchManifest({'BATCH_MANIFEST_PATH': str(tmp_path / "manifest.sqlite")})
+    
+    pending, done = manifest.plan(inputs, "v1", out)
+    assert pending == inputs and done == {}
+    
+    note = out / "P0_soap.json"
+    note.write_text("{}")
+    manifest.record(inputs[0], "v1", str(note))
+    manifest.record(inputs[1], "v1", error="LLM timeout")
+    
+    # A fresh manifest on the same file resumes from what was recorded
+    manifest = BatchManifest({'BATCH_MANIFEST_PATH': str(tmp_path / "manifest.sqlite")})
+    pending, done = manifest.plan(inputs, "v1", out)
+    assert done == {inputs[0]: str(note)}
+    assert pending == inputs[1:]
+    assert list(manifest.failures().values()) == ["LLM timeout"]
+    
+    # A new pipeline version reprocesses everything
+    assert manifest.plan(inputs, "v2", out)[0] == inputs
+
+def test_touched_files_are_compared_by_content(tmp_path):
+    path = tmp_path / "P0_20240101.txt"
+    path.write_text("knee pain")
+    note = tmp_path / "P0_soap.json"
+    note.write_text("{}")
+    manifest = BatchManifest({'BATCH_MANIFEST_PATH': str(tmp_path / "manifest.sqlite")})
+    manifest.record(path, "v1", str(note))
+    
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+    assert manifest.plan([path], "v1")[1] == {path: str(note)}
+    
+    path.write_text("ankle pain")
+    assert manifest.plan([path], "v1")[0] == [path]
+    
+    note.unlink()
+    path.write_text("knee pain")
+    assert manifest.plan([path], "v1")[0] == [path]
+
+def test_recorded_fingerprint_is_of_the_processed_bytes(tmp_path):
+    path = tmp_path / "P0_20240101.txt"
+    path.write_text("knee pain")
+    note = tmp_path / "P0_soap.json"
+    note.write_text("{}")
+    stat = os.stat(path)
+    processed = (stat.st_size, stat.st_mtime, hashlib.sha256(b"knee pain").hexdigest())
+    
+    # The input changed while it was being processed
+    path.write_text("ankle pain and swelling")
+    manifest = BatchManifest({'BATCH_MANIFEST_PATH': str(tmp_path / "manifest.sqlite")})
+    manifest.record(path, "v1", str(note), fingerprint=processed)
+    
+    assert manifest.plan([path], "v1")[0] == [path]
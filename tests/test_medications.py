@@ -0,0 +1,101 @@
+"""
+Tests for lexicon-based medication extraction.
+"""
+from src.nlp.medications import MedicationExtractor, MedicationLexicon, get_medication_lexicon
+from src.nlp.template_filler import TemplateFiller
+
+def test_dose_route_and_frequency():
+    extractor = MedicationExtractor(get_medication_lexicon('data/medications.txt'))
+    medications = extractor.extract(
+        "I'm going to prescribe sumatriptan 50 mg by mouth as needed. "
+        "Keep taking ibuprofen 400mg three times a day."
+    )
+    
+    assert [m["name"] for m in medications] == ["sumatriptan", "ibuprofen"]
+    assert medications[0]["dose"] == 50
+    assert medications[0]["unit"] == "mg"
+    assert medications[0]["route"] == "by mouth"
+    assert medications[0]["frequency"] == "as needed"
+    assert medications[1]["frequency"] == "three times daily"
+    assert MedicationExtractor.format(medications) == (
+        "sumatriptan 50 mg by mouth as needed; ibuprofen 400 mg three times daily"
+    )
+
+def test_longest_name_wins_and_spoken_doses():
+    lexicon = MedicationLexicon(["insulin", "insulin glargine", "metformin"])
+    medications = MedicationExtractor(lexicon).extract(
+        "Continue insulin glargine twenty units subq nightly and metformin 500 mg PO BID."
+    )
+    
+    glargine, metformin = medications
+    assert glargine["name"] == "insulin glargine"
+    assert (glargine["dose"], glargine["unit"], glargine["route"]) == (20, "units", "subcutaneous")
+    assert glargine["frequency"] == "at bedtime"
+    assert (metformin["route"], metformin["frequency"]) == ("by mouth", "twice daily")
+
+def test_no_medications():
+    lexicon = MedicationLexicon(["ibuprofen"])
+    assert MedicationExtractor(lexicon).extract("No medications were discussed.") == []
+
+def test_allergies_and_stopped_drugs_are_tagged():
+    extractor = MedicationExtractor(get_medication_lexicon('data/medications.txt'))
+    medications = extractor.extract(
+        "She is allergic to penicillin. We stopped aspirin last week. I am prescribing sumatriptan 50 mg."
+    )
+    
+    assert [(m["name"], m["status"]) for m in medications] == [
+        ("penicillin", "allergy"), ("aspirin", "stopped"), ("sumatriptan", "active")
+    ]
+    assert [m["name"] for m in MedicationExtractor.active(medications)] == ["sumatriptan"]
+
+def test_status_cues_within_a_clause():
+    extractor = MedicationExtractor(get_medication_lexicon('data/medications.txt'))
+    status = lambda text: [(m["name"], m["status"]) for m in extractor.extract(text)]
+    
+    assert status("Denies taking ibuprofen. Penicillin allergy.") == [("ibuprofen", "denied"), ("penicillin", "allergy")]
+    assert status("She stopped aspirin and I am prescribing sumatriptan.") == [
+        ("aspirin", "stopped"), ("sumatriptan", "active")
+    ]
+    assert status("We stopped aspirin last week. Restart aspirin 81 mg daily.") == [("aspirin", "active")]
+    assert status("No known drug allergies. Prescribing amoxicillin.") == [("amoxicillin", "active")]
+
+def test_cues_only_cover_the_drug_phrase_they_introduce():
+    extractor = MedicationExtractor(get_medication_lexicon('data/medications.txt'))
+    status = lambda text: [(m["name"], m["status"]) for m in extractor.extract(text)]
+    
+    # Negated allergy statements are not cues, and a cue does not reach into the next clause
+    assert status("No known drug allergies, currently on lisinopril 10 mg daily.") == [("lisinopril", "active")]
+    assert status("Patient has no allergies and is on atorvastatin 20 mg nightly") == [("atorvastatin", "active")]
+    assert status("no problem, we will give amoxicillin 500 mg tid") == [("amoxicillin", "active")]
+    assert status("She is allergic to penicillin, currently on lisinopril.") == [
+        ("penicillin", "allergy"), ("lisinopril", "active")
+    ]
+    # Every drug of a list after the cue is covered
+    assert status("Allergic to penicillin and amoxicillin, takes lisinopril.") == [
+        ("penicillin", "allergy"), ("amoxicillin", "allergy"), ("lisinopril", "active")
+    ]
+
+def test_allergy_statements_keep_active_drugs_in_the_plan(tmp_path):
+    filler = TemplateFiller({'SOAP_OUTPUT_DIR': str(tmp_path)})
+    template = {"subjective": "Allergies: [ALLERGIES].", "plan": "Plan: [MEDICATIONS]."}
+    
+    filled = filler._fill_with_rules(template, "No known drug allergies, currently on lisinopril 10 mg daily.", [])
+    
+    assert filled["plan"] == "Plan: lisinopril 10 mg once daily."
+    assert filled["subjective"] == "Allergies: None recorded."
+
+def test_plan_lists_only_active_medications(tmp_path):
+    filler = TemplateFiller({'SOAP_OUTPUT_DIR': str(tmp_path)})
+    template = {"subjective": "Allergies: [ALLERGIES].", "plan": "Plan: [MEDICATIONS]."}
+    
+    filled = filler._fill_with_rules(
+        template,
+        "She is allergic to penicillin. We stopped aspirin last week. I am prescribing sumatriptan 50 mg.",
+        []
+    )
+    
+    assert filled["plan"] == "Plan: sumatriptan 50 mg."
+    assert filled["subjective"] == "Allergies: penicillin."
+    assert filler._fill_with_rules(template, "She is allergic to penicillin.", [])["plan"] == (
+        "Plan: No medications prescribed."
+    )
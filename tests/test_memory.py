@@ -0,0 +1,68 @@
+"""
+Tests for memory accounting and budgets.
+"""
+import tracemalloc
+from types import SimpleNamespace
+import pytest
+from src.nlp.batch import BatchProcessor
+from src.utils.memory import (
+    MODEL_BYTES, STAGE_HEAP_DELTA, MemoryBudget, MemoryBudgetExceeded, configure_memory, model_bytes,
+    record_model_load, rss_bytes, track_stage
+)
+
+class FakeTensor:
+    def __init__(self, count, size):
+        self.count = count
+        self.size = size
+        
+    def numel(self):
+        return self.count
+        
+    def element_size(self):
+        return self.size
+
+class FakeModel:
+    def parameters(self):
+        return [FakeTensor(1000, 4), FakeTensor(500, 2)]
+        
+    def buffers(self):
+        return [FakeTensor(10, 8)]
+
+@pytest.fixture
+def budget():
+    yield configure_memory
+    configure_memory({})
+
+def test_model_sizes_are_recorded():
+    assert model_bytes(FakeModel()) == 5080
+    # Pipelines are measured through the model they wrap
+    assert model_bytes(SimpleNamespace(model=FakeModel())) == 5080
+    assert model_bytes(object()) == 0
+    
+    record_model_load("ner", FakeModel(), rss_bytes())
+    assert MODEL_BYTES.value(model="ner", kind="weights") == 5080
+
+def test_stage_heap_deltas_are_tracked():
+    tracemalloc.start()
+    try:
+        with track_stage("nlp", "fill") as stats:
+            held = [bytearray(1024) for _ in range(2048)]
+    finally:
+        tracemalloc.stop()
+    assert stats["heap_delta"] >= 2 * 1024 * 1024 and len(held) == 2048
+    assert STAGE_HEAP_DELTA.summary(component="nlp", stage="fill")["count"] >= 1
+
+def test_budgets_refuse_new_work(budget):
+    limits = MemoryBudget({'MEMORY_BUDGET_MB': 1, 'AUDIO_BUFFER_BUDGET_MB': 1})
+    with pytest.raises(MemoryBudgetExceeded):
+        limits.check("nlp.process")
+    assert limits.audio_exceeded(2 * 1024 * 1024)
+    assert not limits.audio_exceeded(1024)
+    MemoryBudget({}).check("nlp.process")
+    
+    # Batch documents started over budget fail without running
+    budget({'MEMORY_BUDGET_MB': 1})
+    ran = []
+    item = SimpleNamespace(transcription="visit", path=None)
+    future = BatchProcessor._submit(lambda text, path: ran.append(text), item)
+    assert isinstance(future.exception(), MemoryBudgetExceeded) and ran == []
@@ -0,0 +1,47 @@
+"""
+Tests for the metrics registry and exporters.
+"""
+import json
+import socket
+import urllib.request
+from src.utils.metrics import MetricsExporter, MetricsRegistry
+
+def test_prometheus_text_and_percentiles():
+    registry = MetricsRegistry()
+    stages = registry.histogram("stage_seconds", "Stage time", ("stage",), buckets=(0.1, 1))
+    errors = registry.counter("errors_total", "Errors", ("stage",))
+    for value in (0.05, 0.5, 0.5, 2):
+        stages.observe(value, stage="fill")
+    errors.inc(stage='fill "llm"')
+    
+    text = registry.prometheus_text()
+    assert "# TYPE stage_seconds histogram" in text
+    assert 'stage_seconds_bucket{stage="fill",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="fill",le="1"} 3' in text
+    assert 'stage_seconds_bucket{stage="fill",le="+Inf"} 4' in text
+    assert 'stage_seconds_count{stage="fill"} 4' in text
+    assert 'errors_total{stage="fill \\"llm\\""} 1' in text
+    
+    summary = stages.summary(stage="fill")
+    assert summary["p50"] == 0.5 and summary["p95"] == 2
+    assert registry.histogram("stage_seconds", "Stage time", ("stage",)) is stages
+
+def test_exporter_serves_and_snapshots(tmp_path):
+    registry = MetricsRegistry()
+    registry.counter("documents_total", "Documents").inc()
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+        
+    snapshot = tmp_path / "metrics.json"
+    exporter = MetricsExporter(
+        {'METRICS_PORT': port, 'METRICS_SNAPSHOT_PATH': str(snapshot), 'METRICS_SNAPSHOT_INTERVAL': 3600}, registry
+    ).start()
+    try:
+        body = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics").read().decode()
+        assert "documents_total 1" in body
+    finally:
+        exporter.stop()
+        
+    data = json.loads(snapshot.read_text())
+    assert data["metrics"]["documents_total"]["series"] == [{"labels": {}, "value": 1}]
@@ -20,3 +20,9 @@ def test_template_matcher():
     template = matcher.find_matching_template(test_keywords)
     assert isinstance(template, str)
     assert len(template) > 0
+
+def test_llm_generator_prompt_inputs():
+    keywords = [{"text": "migraine", "label": "PROBLEM"}, "nausea"]
+    assert LLMGenerator._keyword_texts(keywords) == ["migraine (PROBLEM)", "nausea"]
+    assert LLMGenerator._select_dtype('auto', 'cpu') == 'fp32'
+    assert LLMGenerator._select_dtype('int8', 'cpu') == 'int8'
@@ -0,0 +1,33 @@
+"""
+Tests for the sampling profiler.
+"""
+import time
+from src.utils.profiler import SamplingProfiler
+
+def busy_stage(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+def test_slow_calls_write_collapsed_stacks(tmp_path):
+    profiler = SamplingProfiler({'PROFILE_DIR': str(tmp_path), 'PROFILE_THRESHOLD_SECONDS': 0.15, 'PROFILE_INTERVAL': 0.005})
+    with profiler.watch("nlp.process"):
+        busy_stage(0.02)
+    assert list(tmp_path.iterdir()) == []
+    
+    with profiler.watch("nlp.process") as capture:
+        busy_stage(0.3)
+    profiles = list(tmp_path.glob("nlp.process_*.folded"))
+    assert len(profiles) == 1 and capture.samples > 10
+    
+    lines = profiles[0].read_text(encoding='utf-8').splitlines()
+    busy = [line for line in lines if "busy_stage (test_profiler.py:" in line]
+    assert busy and all(line.startswith("MainThread;") for line in busy)
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) >= capture.samples
+
+def test_disabled_profiler_does_not_sample(tmp_path):
+    profiler = SamplingProfiler({'PROFILE_DIR': '', 'PROFILE_THRESHOLD_SECONDS': 0})
+    with profiler.watch("asr.transcribe") as capture:
+        busy_stage(0.01)
+    assert capture is None and profiler._sampler is None
+    assert profiler.capture(0.01) is None
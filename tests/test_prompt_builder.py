@@ -0,0 +1,41 @@
+"""
+Tests for the token-budgeted prompt builder.
+"""
+from src.nlp.prompt_builder import PromptBuilder, split_sentences
+
+def render(transcript_text, keywords_text):
+    return f"TRANSCRIPT:\n{transcript_text}\nKEYWORDS: {keywords_text}\nSUBJECTIVE: [SYMPTOMS]\nPLAN: [TREATMENT]"
+
+def test_short_transcript_is_untouched():
+    builder = PromptBuilder({'LLM_CONTEXT_TOKENS': 2048, 'LLM_OUTPUT_TOKENS': 512})
+    prompt, report = builder.build(render, "My knee hurts. It started last week.", ["knee", "Knee", "pain"])
+    
+    assert "My knee hurts. It started last week." in prompt
+    assert "KEYWORDS: knee, pain" in prompt
+    assert report["omitted_sentences"] == 0
+    
+    # Line breaks between speaker turns survive when nothing is trimmed
+    dialogue = "Doctor: What brings you in?\nPatient: My knee hurts.\n\nDoctor: Since when?"
+    assert f"TRANSCRIPT:\n{dialogue}\n" in builder.build(render, dialogue, ["knee"])[0]
+
+def test_long_visit_is_compressed_to_budget():
+    small_talk = " ".join(f"We talked about the weather on day {i} of the trip." for i in range(400))
+    transcription = (
+        "I have had sharp knee pain for three weeks. " + small_talk +
+        " The MRI showed a meniscus tear. " + small_talk +
+        " I recommend physical therapy and ice."
+    )
+    builder = PromptBuilder({'LLM_CONTEXT_TOKENS': 1024, 'LLM_OUTPUT_TOKENS': 256})
+    prompt, report = builder.build(render, transcription, ["meniscus tear"], template_text="[SYMPTOMS] [TREATMENT]")
+    
+    assert report["prompt_tokens"] <= 1024 - 256
+    assert report["omitted_sentences"] > 700
+    assert "meniscus tear." in prompt
+    assert "knee pain for three weeks." in prompt
+    assert "physical therapy and ice." in prompt
+    assert "[...]" in prompt
+    assert f"[{report['omitted_sentences']} of {report['sentences']} transcript sentences omitted]" in prompt
+
+def test_unpunctuated_speech_is_windowed():
+    sentences = split_sentences(" ".join(["word"] * 150))
+    assert [len(s.split()) for s in sentences] == [60, 60, 30]
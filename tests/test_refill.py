@@ -0,0 +1,73 @@
+"""
+Tests for incremental re-filling after transcript edits.
+"""
+import re
+from types import SimpleNamespace
+from src.nlp.refill import RefillSession
+from src.nlp.template_filler import TemplateFiller
+
+TERMS = [("pain", "PROBLEM"), ("swelling", "PROBLEM"), ("knee", "ANATOMY"), ("ice", "TREATMENT")]
+
+TEMPLATE = {"id": "knee", "name": "Knee", "template": {
+    "subjective": "Patient reports [SYMPTOMS]. History: [HISTORY].",
+    "objective": "Vitals: [VITALS]. Findings: [FINDINGS].",
+    "plan": "[TREATMENT]."
+}}
+
+class FakeExtractor:
+    def __init__(self):
+        self.extracted = []
+        
+    def extract_keywords(self, text):
+        text = str(text)
+        self.extracted.append(text)
+        return self.order_keywords([
+            {"text": m.group(), "label": label, "score": 1.0, "start": m.start(), "end": m.end()}
+            for term, label in TERMS for m in re.finditer(rf"\b{term}\b", text, re.IGNORECASE)
+        ])
+        
+    def order_keywords(self, keywords):
+        order = [term for term, _ in TERMS]
+        return sorted(keywords, key=lambda k: (order.index(k["text"].lower()), k["start"]))
+
+def make_session(tmp_path):
+    matches = []
+    def find_matching_template(keywords):
+        matches.append(len(keywords))
+        return TEMPLATE
+    pipeline = SimpleNamespace(
+        keyword_extractor=FakeExtractor(),
+        template_matcher=SimpleNamespace(find_matching_template=find_matching_template),
+        template_filler=TemplateFiller({'SOAP_OUTPUT_DIR': str(tmp_path)})
+    )
+    return RefillSession(pipeline), pipeline, matches
+
+def test_edit_recomputes_only_changed_spans(tmp_path):
+    session, pipeline, matches = make_session(tmp_path)
+    original = "My knee has pain. Past medical history: asthma. Vital signs: stable. We will use ice."
+    session.update(original)
+    
+    edited = "My knee has pain and swelling. Past medical history: asthma. Vital signs: stable. We will use ice."
+    result = session.update(edited)
+    
+    assert pipeline.keyword_extractor.extracted[-1] == "My knee has pain and swelling."
+    assert result["stats"]["changed_sentences"] == 1
+    assert result["stats"]["changed_sections"] == ["subjective", "objective"]
+    assert result["stats"]["reused_placeholders"] == 2
+    # A new keyword among three moves the keyword set enough to re-rank templates
+    assert result["stats"]["rematched"] and matches == [3, 4]
+    
+    fresh, _, _ = make_session(tmp_path)
+    assert result["note"] == fresh.update(edited)["note"]
+    assert result["keywords"] == fresh.keywords
+
+def test_keywords_move_with_unchanged_sentences(tmp_path):
+    session, pipeline, matches = make_session(tmp_path)
+    session.update("Knee pain. We will use ice.")
+    result = session.update("The patient is here today. Knee pain. We will use ice.")
+    
+    assert pipeline.keyword_extractor.extracted[-1] == "The patient is here today."
+    text = "The patient is here today. Knee pain. We will use ice."
+    assert all(text[k["start"]:k["end"]] == k["text"] for k in result["keywords"])
+    assert result["stats"]["changed_sections"] == []
+    assert not result["stats"]["rematched"] and len(matches) == 1
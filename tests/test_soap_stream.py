@@ -0,0 +1,59 @@
+"""
+Tests for incremental SOAP section parsing.
+"""
+from src.nlp.soap_stream import SOAPStreamParser
+
+SECTIONS = ["subjective", "objective", "assessment", "plan"]
+
+RESPONSE = """Here is the SOAP note:
+
+**SUBJECTIVE:** Patient reports right knee pain
+for three weeks.
+
+## Objective
+Mild effusion, no instability.
+
+ASSESSMENT: Likely meniscal strain.
+
+PLAN:
+Plan: rest and ice.
+Follow up in 2 weeks.
+
+Let me know if you need anything else."""
+
+def test_sections_published_as_they_complete():
+    published = []
+    parser = SOAPStreamParser(SECTIONS, on_section=lambda name, text: published.append(name))
+    
+    # Subjective and Objective are available before the model has produced the Assessment
+    split = RESPONSE.index("ASSESSMENT")
+    for i in range(0, split, 7):
+        parser.feed(RESPONSE[i:min(i + 7, split)])
+    assert published == ["subjective", "objective"]
+    
+    parser.feed(RESPONSE[split:])
+    sections = parser.close()
+    assert published == SECTIONS
+    assert sections == {
+        "subjective": "Patient reports right knee pain\nfor three weeks.",
+        "objective": "Mild effusion, no instability.",
+        "assessment": "Likely meniscal strain.",
+        "plan": "Plan: rest and ice.\nFollow up in 2 weeks."
+    }
+
+def test_alternative_headers_fill_missing_sections():
+    parser = SOAPStreamParser(SECTIONS)
+    parser.feed("HPI: Headache.\n\nEXAMINATION: Normal.\n\nASSESSMENT: Migraine.\n\nDIAGNOSIS: ignored\n\nP: Rest.")
+    
+    assert parser.close() == {
+        "subjective": "Headache.",
+        "objective": "Normal.",
+        "assessment": "Migraine.",
+        "plan": "Rest."
+    }
+
+def test_prose_starting_with_a_section_word_is_not_a_header():
+    parser = SOAPStreamParser(SECTIONS)
+    parser.feed("PLAN: Ice.\nPlan to follow up in a week.")
+    
+    assert parser.close()["plan"] == "Ice.\nPlan to follow up in a week."
@@ -0,0 +1,36 @@
+"""
+Tests for the stage graph scheduler.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from src.nlp.stage_graph import Stage, StageGraph
+
+def slow(value, seconds=0.2):
+    time.sleep(seconds)
+    return value
+
+def test_independent_stages_run_concurrently():
+    graph = StageGraph([
+        Stage("note", lambda a, b: f"{a}+{b}", ("keywords", "analyses"), "thread"),
+        Stage("keywords", lambda text: slow(text.upper()), ("transcription",), "thread"),
+        Stage("analyses", lambda text: slow(len(text)), ("transcription",), "process"),
+    ])
+    assert graph.order.index("note") == 2
+    
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        started = time.perf_counter()
+        results, timings = graph.run({"transcription": "knee"}, pool)
+        elapsed = time.perf_counter() - started
+        
+    assert results["note"] == "KNEE+4"
+    assert elapsed < 0.35
+    assert set(timings) == {"keywords", "analyses", "note"}
+
+def test_rejects_cycles_and_missing_inputs():
+    with pytest.raises(ValueError, match="cycle"):
+        StageGraph([Stage("a", slow, ("b",), "thread"), Stage("b", slow, ("a",), "thread")])
+        
+    graph = StageGraph([Stage("a", slow, ("transcription",), "thread")])
+    with ThreadPoolExecutor() as pool, pytest.raises(ValueError, match="transcription"):
+        graph.run({}, pool)
@@ -0,0 +1,68 @@
+"""
+Tests for streaming pipeline sessions.
+"""
+from types import SimpleNamespace
+from src.nlp.streaming import StreamingSession, jaccard
+from src.nlp.template_filler import TemplateFiller
+
+KNEE = {"id": "knee", "name": "Knee", "template": {
+    "subjective": "Patient reports [SYMPTOMS].",
+    "objective": "Vitals: [VITALS].",
+    "plan": "Follow up in [TIMEFRAME]."
+}}
+
+class FakePipeline:
+    def __init__(self, tmp_path):
+        self.template_filler = TemplateFiller({'SOAP_OUTPUT_DIR': str(tmp_path)})
+        self.matches = []
+        self.keyword_extractor = SimpleNamespace(extract_keywords=self.extract_keywords)
+        self.template_matcher = SimpleNamespace(find_matching_template=self.find_matching_template)
+        
+    def extract_keywords(self, text):
+        return [
+            {"text": term, "label": "PROBLEM", "score": 1.0, "start": text.index(term), "end": text.index(term) + len(term)}
+            for term in ("pain", "swelling", "stiffness") if term in text
+        ]
+        
+    def find_matching_template(self, keywords):
+        self.matches.append(len(keywords))
+        return KNEE
+        
+    def run_stages(self, transcription):
+        keywords = self.extract_keywords(transcription)
+        note = self.template_filler.fill_template(KNEE, transcription, keywords)
+        return {"keywords": keywords, "template": KNEE, "soap_note": note}, {}
+
+def test_segments_publish_versioned_changed_sections(tmp_path):
+    pipeline = FakePipeline(tmp_path)
+    updates = []
+    session = StreamingSession(pipeline, updates.append)
+    
+    first = session.add_segment("My knee has pain.")
+    assert first["version"] == 1
+    assert set(first["changed"]) == {"subjective", "objective", "plan"}
+    assert session.keywords[0]["start"] == 12
+    
+    # Nothing the template uses changed
+    assert session.add_segment("It is worse in the morning.") is None
+    
+    second = session.add_segment("Vital signs: stable. Some swelling too.")
+    assert second["version"] == 2
+    assert second["changed"] == {"subjective": "Patient reports pain and swelling.", "objective": "Vitals: stable."}
+    assert session.keywords[-1]["start"] == session.text.index("swelling")
+    
+    final = session.finish(save=False)
+    assert updates[-1]["final"] and updates[-1]["version"] == 3
+    assert final["subjective"] == "Patient reports pain and swelling."
+
+def test_templates_rematch_only_on_material_keyword_change(tmp_path):
+    pipeline = FakePipeline(tmp_path)
+    session = StreamingSession(pipeline, config={'STREAM_REMATCH_JACCARD': 0.6})
+    session.add_segment("Knee pain.")
+    session.add_segment("The pain is sharp.")
+    assert pipeline.matches == [1]
+    session.add_segment("Swelling and stiffness.")
+    assert len(pipeline.matches) == 2
+    
+    assert jaccard({"pain"}, {"pain", "swelling"}) == 0.5
+    assert jaccard(set(), set()) == 1.0
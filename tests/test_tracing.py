@@ -0,0 +1,87 @@
+"""
+Tests for encounter tracing and the Chrome trace export.
+"""
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from src.nlp.stage_graph import Stage, StageGraph
+from src.utils.tracing import chrome_trace, configure_tracing, encounter_span, span
+
+@pytest.fixture
+def trace_dir(tmp_path):
+    configure_tracing({'TRACE_DIR': str(tmp_path), 'TRACE_ID_SALT': 'test'})
+    yield tmp_path
+    configure_tracing({})
+
+def read_spans(trace_dir):
+    with open(trace_dir / "spans.jsonl", 'r', encoding='utf-8') as f:
+        return {record["name"]: record for record in map(json.loads, f)}
+
+def test_stage_spans_nest_under_the_encounter(trace_dir):
+    graph = StageGraph([
+        Stage("keywords", str.upper, ("transcription",), "thread"),
+        Stage("soap_note", lambda keywords: f"note: {keywords}", ("keywords",), "thread"),
+    ])
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        with encounter_span("patient-42", "20240105"):
+            with span("io.read"):
+                pass
+            graph.run({"transcription": "knee"}, pool)
+            
+    spans = read_spans(trace_dir)
+    root = spans["encounter"]
+    assert root["parent_id"] is None
+    for name in ("io.read", "nlp.keywords", "nlp.soap_note"):
+        assert spans[name]["parent_id"] == root["span_id"]
+        assert spans[name]["trace_id"] == root["trace_id"]
+    assert spans["nlp.keywords"]["thread"] != spans["encounter"]["thread"]
+    
+    # Patient ids never reach the trace files
+    assert root["attributes"]["patient"] != "patient-42"
+    assert len(root["attributes"]["patient"]) == 16
+    assert "patient-42" not in (trace_dir / "spans.jsonl").read_text(encoding='utf-8')
+
+def test_errors_are_recorded_and_disabled_tracing_writes_nothing(trace_dir, tmp_path):
+    with pytest.raises(ValueError):
+        with span("nlp.fill"):
+            raise ValueError("bad template")
+    assert read_spans(trace_dir)["nlp.fill"]["error"] == "ValueError: bad template"
+    
+    configure_tracing({})
+    with span("nlp.fill") as opened:
+        assert opened is None
+
+def test_chrome_trace_groups_spans_by_encounter(trace_dir, tmp_path):
+    for patient in ("a", "b"):
+        with encounter_span(patient):
+            with span("asr.transcribe"):
+                pass
+                
+    output = tmp_path / "trace.json"
+    assert chrome_trace([trace_dir / "spans.jsonl"], output) == 4
+    events = json.loads(output.read_text(encoding='utf-8'))["traceEvents"]
+    spans = [event for event in events if event["ph"] == "X"]
+    assert {event["pid"] for event in spans} == {1, 2}
+    assert all(event["dur"] >= 0 for event in spans)
+    assert sum(1 for event in events if event["ph"] == "M") == 2
+
+def test_unsalted_tracing_generates_and_keeps_a_private_salt(tmp_path):
+    try:
+        tracer = configure_tracing({'TRACE_DIR': str(tmp_path)})
+        salt_file = tmp_path / "trace_salt"
+        
+        assert tracer.enabled
+        assert len(tracer.salt) == 64
+        assert salt_file.read_text(encoding='utf-8') == tracer.salt
+        assert salt_file.stat().st_mode & 0o077 == 0
+        first = tracer.surrogate("patient-42")
+        assert first != hashlib.sha256(b":patient-42").hexdigest()[:16]
+        
+        # Surrogates stay stable across restarts
+        assert configure_tracing({'TRACE_DIR': str(tmp_path)}).surrogate("patient-42") == first
+        
+        salt_file.write_text("", encoding='utf-8')
+        assert not configure_tracing({'TRACE_DIR': str(tmp_path)}).enabled
+    finally:
+        configure_tracing({})
@@ -0,0 +1,46 @@
+"""
+Tests for structured vital sign extraction.
+"""
+from src.nlp.vitals import VitalsParser, parse_number
+
+def test_parse_spoken_numbers():
+    assert parse_number("one twenty") == 120
+    assert parse_number("ninety eight point six") == 98.6
+    assert parse_number("one hundred and ten") == 110
+    assert parse_number("seventy-two") == 72
+    assert parse_number("88") == 88
+
+def test_parse_common_vital_forms():
+    text = (
+        "BP one twenty over eighty. Pulse of seventy two beats per minute. "
+        "Sats 94% on room air. Temp 37.2 C. RR 16. Weighs 180 pounds. Pain is seven out of ten."
+    )
+    found = VitalsParser.first_by_kind(VitalsParser().parse(text))
+    
+    assert found["blood_pressure"].value == (120, 80)
+    assert found["heart_rate"].value == 72
+    assert found["spo2"].value == 94
+    assert found["spo2"].context == "room air"
+    assert found["temperature"].value == 99.0
+    assert found["respiratory_rate"].value == 16
+    assert found["weight"].value == 81.6
+    assert found["pain"].value == 7
+
+def test_spans_point_into_text():
+    text = "Your blood pressure is 128/82, heart rate is 76, and temperature is normal."
+    vitals = VitalsParser().parse(text)
+    assert [v.kind for v in vitals] == ["blood_pressure", "heart_rate"]
+    assert text[vitals[0].start:vitals[0].end] == "blood pressure is 128/82"
+    assert VitalsParser.format(vitals) == "BP 128/82, HR 76"
+
+def test_dates_and_implausible_values_are_ignored():
+    vitals = VitalsParser().parse("Seen on 08/10/24. Heart rate 900.")
+    assert vitals == []
+
+def test_pain_scores_need_a_pain_cue():
+    parse = lambda text: [(v.kind, v.value) for v in VitalsParser().parse(text)]
+    
+    assert parse("For the headache pain, they rate it at 7/10.") == [("pain", 7)]
+    assert parse("She reports 6/10 low back pain.") == [("pain", 6)]
+    assert parse("Pain is seven out of ten.") == [("pain", 7)]
+    assert parse("He scored 3/10 on the quiz and slept 5/10 days.") == []